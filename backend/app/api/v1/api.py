@@ -2,12 +2,14 @@
 from fastapi import APIRouter
 from app.api.v1.endpoints import auth, search, filters, crm, requests, users, suggest, gosts, counterparties, excel, suppliers, contracts, calc, docs, departments, statistics
 from app.api.v1.endpoints import auth, search, filters, crm, requests, users, suggest, gosts, counterparties, excel, suppliers, contracts, calc, docs, oauth, gmail, yandex_mail
+from app.api.v1.endpoints import prices, parsers
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, tags=["auth"])
 api_router.include_router(search.router, tags=["search"])
 api_router.include_router(filters.router, tags=["filters"])
+api_router.include_router(prices.router, tags=["prices"])
 api_router.include_router(crm.router, tags=["crm"])
 api_router.include_router(users.router, tags=["users"])
 api_router.include_router(requests.router, tags=["requests"])
@@ -21,6 +23,7 @@ api_router.include_router(calc.router, tags=["calc"])
 api_router.include_router(docs.router, tags=["docs"])
 api_router.include_router(departments.router, tags=["departments"])
 api_router.include_router(statistics.router, tags=["statistics"])
+api_router.include_router(parsers.router, tags=["parsers"])
 api_router.include_router(oauth.router, prefix="/oauth", tags=["oauth"])
 api_router.include_router(gmail.router, prefix="/gmail", tags=["gmail"])
 api_router.include_router(yandex_mail.router, prefix="/yandex-mail", tags=["yandex_mail"])
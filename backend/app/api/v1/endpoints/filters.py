@@ -1,57 +1,85 @@
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import Column, Select, func, select
+from sqlalchemy import Column, Select, exists, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
 from app.models.metal import Metal
+from app.models.metal_facet import MetalFacet
+from app.models.parser_run import ParserRun
 from app.models.warehouse import Warehouse
+from app.parsers.telemetry import STATUS_PROMOTED
 
 router = APIRouter()
 
 
-def _get_base_query_with_filters(
+# Те же поля в самом каталоге: из него отвечаем, пока metal_facets ещё не собрана
+CATALOG_COLUMNS = {
+    "supplier": Warehouse.supplier,
+    "city": Warehouse.city,
+    "category": Metal.category,
+    "stamp": Metal.stamp,
+    "state_standard": Metal.state_standard,
+}
+
+# Таблица фасетов после первой сборки пустой не бывает (пересборка идёт одной транзакцией)
+_facets_ready = False
+
+
+def build_facet_values_query(
+    column: Column,
+    *,
     supplier: Optional[str] = None,
     category: Optional[str] = None,
     stamp: Optional[str] = None,
     gost: Optional[str] = None,
     city: Optional[str] = None,
+    from_catalog: bool = False,
 ) -> Select:
-    """Строит базовый запрос SQLAlchemy с учетом переданных фильтров."""
-    query = select(Metal.id).join(Warehouse, Metal.warehouse_id == Warehouse.id)
+    """
+    Уникальные значения колонки metal_facets среди сочетаний под фильтры
+    (его же проверяет scripts/explain_queries.py). from_catalog — то же по metal + warehouse.
+    """
+    if from_catalog:
+        columns = CATALOG_COLUMNS
+    else:
+        columns = {name: getattr(MetalFacet, name) for name in CATALOG_COLUMNS}
+    target = columns[column.key]
+    query = select(target).where(target.isnot(None))
+    if from_catalog:
+        query = query.select_from(Metal).join(Warehouse, Metal.warehouse_id == Warehouse.id)
     if supplier:
-        query = query.where(Warehouse.supplier == supplier)
+        query = query.where(columns["supplier"] == supplier)
     if category:
-        query = query.where(Metal.category == category)
+        query = query.where(columns["category"] == category)
     if stamp:
-        query = query.where(Metal.stamp == stamp)
+        query = query.where(columns["stamp"] == stamp)
     if gost:
-        query = query.where(Metal.state_standard == gost)
+        query = query.where(columns["state_standard"] == gost)
     if city:
-        query = query.where(Warehouse.city == city)
-    return query
+        query = query.where(columns["city"] == city)
 
-async def _get_distinct_values(
-    db: AsyncSession, column: Column, base_query: Select
-) -> List[str]:
-    """
-    Получает уникальные значения для указанной колонки,
-    ограничиваясь результатами из базового запроса.
-    """
-    # Создаем основной запрос для получения уникальных значений из нужной колонки
-    main_query = select(column).where(Metal.id.in_(base_query.subquery()))
+    # Уникальные значения, отсортированные по возрастанию
+    return query.distinct().order_by(target.asc())
 
-    # Если колонка из Warehouse, нам нужно добавить JOIN, чтобы SQLAlchemy знала, как связать таблицы
-    if column.table.name == "warehouse":
-        main_query = main_query.join_from(Metal, Warehouse)
 
-    # Получаем уникальные, не-null значения и сортируем их
-    final_query = main_query.distinct().order_by(column.asc())
+async def _facets_built(db: AsyncSession) -> bool:
+    global _facets_ready
+    if not _facets_ready:
+        _facets_ready = bool(await db.scalar(select(exists().select_from(MetalFacet))))
+    return _facets_ready
 
-    result = await db.execute(final_query)
-    values = [row[0] for row in result.all() if row[0]]
-    return values
+
+async def _get_facet_values(db: AsyncSession, column: Column, **filters: Optional[str]) -> List[str]:
+    """
+    Значения для выпадающего списка: читается небольшая таблица metal_facets,
+    которую run_parsers.py пересобирает после каждого запуска, а не весь каталог metal.
+    Пока она не собрана (база до появления таблицы), значения берутся из каталога.
+    """
+    from_catalog = not await _facets_built(db)
+    result = await db.execute(build_facet_values_query(column, from_catalog=from_catalog, **filters))
+    return [row[0] for row in result.all() if row[0]]
 
 
 @router.get("/suppliers", response_model=List[str], tags=["filters"])
@@ -66,27 +94,7 @@ async def get_suppliers(
     Получает список уникальных поставщиков, с возможностью фильтрации
     по другим параметрам для динамической подгрузки в форму поиска.
     """
-
-    query = select(Warehouse.supplier).join(
-        Metal, Warehouse.id == Metal.warehouse_id
-    )
-
-    # Применяем фильтры, если они были переданы
-    if category:
-        query = query.where(Metal.category == category)
-    if stamp:
-        query = query.where(Metal.stamp == stamp)
-    if gost:
-        query = query.where(Metal.state_standard == gost)
-    if city:
-        query = query.where(Warehouse.city == city)
-
-    # Получаем уникальные значения и сортируем их
-    query = query.distinct().order_by(Warehouse.supplier)
-
-    result = await db.execute(query)
-    suppliers = [row[0] for row in result.all() if row[0]]
-    return suppliers
+    return await _get_facet_values(db, MetalFacet.supplier, category=category, stamp=stamp, gost=gost, city=city)
 
 
 
@@ -99,8 +107,7 @@ async def get_categories(
     city: Optional[str] = Query(None),
 ):
     """Получение списка уникальных категорий с учетом фильтров."""
-    base_query = _get_base_query_with_filters(supplier=supplier, stamp=stamp, gost=gost, city=city)
-    return await _get_distinct_values(db, Metal.category, base_query)
+    return await _get_facet_values(db, MetalFacet.category, supplier=supplier, stamp=stamp, gost=gost, city=city)
 
 
 @router.get("/stamps", response_model=List[str], tags=["filters"])
@@ -112,8 +119,7 @@ async def get_stamps(
     city: Optional[str] = Query(None),
 ):
     """Получение списка уникальных марок стали с учетом фильтров."""
-    base_query = _get_base_query_with_filters(supplier=supplier, category=category, gost=gost, city=city)
-    return await _get_distinct_values(db, Metal.stamp, base_query)
+    return await _get_facet_values(db, MetalFacet.stamp, supplier=supplier, category=category, gost=gost, city=city)
 
 
 @router.get("/gosts", response_model=List[str], tags=["filters"])
@@ -125,8 +131,7 @@ async def get_gosts(
     city: Optional[str] = Query(None),
 ):
     """Получение списка уникальных ГОСТов с учетом фильтров."""
-    base_query = _get_base_query_with_filters(supplier=supplier, category=category, stamp=stamp, city=city)
-    return await _get_distinct_values(db, Metal.state_standard, base_query)
+    return await _get_facet_values(db, MetalFacet.state_standard, supplier=supplier, category=category, stamp=stamp, city=city)
 
 
 @router.get("/cities", response_model=List[str], tags=["filters"])
@@ -140,27 +145,7 @@ async def get_cities(
     """
     Получает список уникальных городов, с возможностью фильтрации.
     """
-    # Выбираем колонку 'city' из таблицы Warehouse и соединяем с Metal
-    query = select(Warehouse.city).join(
-        Metal, Warehouse.id == Metal.warehouse_id
-    )
-
-    # Применяем фильтры, если они переданы
-    if category:
-        query = query.where(Metal.category == category)
-    if stamp:
-        query = query.where(Metal.stamp == stamp)
-    if gost:
-        query = query.where(Metal.state_standard == gost)
-    if supplier:
-        query = query.where(Warehouse.supplier == supplier)
-
-    # Получаем уникальные непустые значения и сортируем их
-    query = query.distinct().order_by(Warehouse.city)
-
-    result = await db.execute(query)
-    cities = [row[0] for row in result.all() if row[0]]
-    return cities
+    return await _get_facet_values(db, MetalFacet.city, category=category, stamp=stamp, gost=gost, supplier=supplier)
 
 
 @router.get("/last-update-time", response_model=dict, tags=["filters"])
@@ -169,7 +154,13 @@ async def get_last_update_time(db: AsyncSession = Depends(get_db)):
     if not hasattr(Metal, "price_updated_at"):
         return {"last_update": None, "error": "В модели Metal отсутствует поле updated_at"}
 
-    query = select(func.max(Metal.price_updated_at))
-    last_update = (await db.execute(query)).scalar_one_or_none()
+    # price_updated_at меняется только у изменившихся позиций, поэтому время обновления
+    # берём из журнала запусков парсеров, а по цене — только если журнал пуст
+    last_update = (await db.execute(
+        select(func.max(ParserRun.created_at)).where(ParserRun.status == STATUS_PROMOTED)
+    )).scalar_one_or_none()
+    if last_update is None:
+        query = select(func.max(Metal.price_updated_at))
+        last_update = (await db.execute(query)).scalar_one_or_none()
     return {"last_update": last_update}
 
@@ -0,0 +1,91 @@
+import time
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, get_current_user
+from app.models.parser_run import ParserRun
+from app.models.user import User
+from app.parsers.telemetry import STATUS_FAILED, render_prometheus
+from app.schemas.parser_run import ParserRunSummary
+
+router = APIRouter()
+
+
+async def _latest_run_ids(db: AsyncSession, limit: int, supplier: Optional[str] = None) -> List[str]:
+    query = select(ParserRun.run_id)
+    if supplier:
+        query = query.where(ParserRun.supplier == supplier)
+    query = query.group_by(ParserRun.run_id).order_by(func.max(ParserRun.created_at).desc()).limit(limit)
+    return list((await db.execute(query)).scalars().all())
+
+
+@router.get("/parsers/runs", response_model=List[ParserRunSummary], summary="Latest parser runs")
+async def get_parser_runs(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(5, ge=1, le=100),
+    run_id: Optional[str] = Query(None),
+    supplier: Optional[str] = Query(None),
+):
+    """
+    Последние запуски run_parsers.py (новые первыми): по каждой паре (поставщик, город) статус,
+    время загрузки, разбора, записи в green и переноса в blue, позиции, байты, повторы и ошибки.
+    Только для вошедших пользователей; текст ошибки сокращён до первой строки без ссылок.
+    """
+    run_ids = [run_id] if run_id else await _latest_run_ids(db, limit, supplier)
+    if not run_ids:
+        return []
+
+    query = select(ParserRun).where(ParserRun.run_id.in_(run_ids))
+    if supplier:
+        query = query.where(ParserRun.supplier == supplier)
+    rows = (await db.execute(query.order_by(ParserRun.supplier, ParserRun.city))).scalars().all()
+
+    by_run: Dict[str, List[ParserRun]] = {}
+    for row in rows:
+        by_run.setdefault(row.run_id, []).append(row)
+
+    summaries = []
+    for rid in run_ids:
+        items = by_run.get(rid)
+        if not items:
+            continue
+        summaries.append({
+            "run_id": rid,
+            "finished_at": max((r.created_at for r in items if r.created_at), default=None),
+            "targets_total": len(items),
+            "targets_failed": sum(1 for r in items if r.status == STATUS_FAILED),
+            "rows_parsed": sum(r.rows_parsed or 0 for r in items),
+            "bytes_downloaded": sum(r.bytes_downloaded or 0 for r in items),
+            "retries": sum(r.retries or 0 for r in items),
+            "errors": sum(r.errors or 0 for r in items),
+            "targets": items,
+        })
+    return summaries
+
+
+@router.get("/parsers/metrics", response_class=PlainTextResponse, summary="Latest parser run in Prometheus format")
+async def get_parser_metrics(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Метрики последнего запуска в текстовом формате Prometheus (то же, что run_parsers.py пишет в файл).
+    Только для вошедших пользователей; без входа метрики собирает textfile collector из файла.
+    """
+    run_ids = await _latest_run_ids(db, 1)
+    if not run_ids:
+        return PlainTextResponse("", media_type="text/plain; version=0.0.4")
+    rows = (await db.execute(
+        select(ParserRun).where(ParserRun.run_id == run_ids[0]).order_by(ParserRun.supplier, ParserRun.city)
+    )).scalars().all()
+    finished_at = max((r.created_at for r in rows if r.created_at), default=None)
+    timestamp = finished_at.timestamp() if finished_at else time.time()
+    return PlainTextResponse(
+        render_prometheus(rows, timestamp=timestamp),
+        media_type="text/plain; version=0.0.4",
+    )
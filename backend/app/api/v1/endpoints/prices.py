@@ -0,0 +1,113 @@
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
+from app.models.metal import Metal
+from app.models.price_history import MetalPriceDaily, MetalPriceHistory
+from app.schemas.price_history import PriceHistory
+
+router = APIRouter()
+
+
+def carry_forward_days(rows, opening, first: Optional[date], last: date) -> List[dict]:
+    """
+    Дополняет дневной срез (в базе только дни с изменениями цены) днями без изменений:
+    в них переносится close_price предыдущего дня с samples = 0. Дни после исчезновения
+    позиции (close_price = NULL) не дополняются. opening — последняя строка до first.
+    """
+    points = []
+    previous = opening
+    day = first if first and opening else (rows[0]["day"] if rows else None)
+    for row in [*rows, None]:
+        until = row["day"] if row else last + timedelta(days=1)
+        if previous is not None and previous["close_price"] is not None:
+            while day < until:
+                price = previous["close_price"]
+                points.append({
+                    "day": day, "min_price": price, "avg_price": price, "max_price": price,
+                    "close_price": price, "samples": 0,
+                })
+                day += timedelta(days=1)
+        if row is None:
+            break
+        points.append(dict(row))
+        previous = row
+        day = row["day"] + timedelta(days=1)
+    return points
+
+
+@router.get("/prices/history", response_model=PriceHistory, summary="Price history of one product")
+async def get_price_history(
+    db: AsyncSession = Depends(get_db),
+    # Позиция: либо id из /search, либо ключ (склад, content_hash) — он переживает удаление позиции
+    metal_id: Optional[int] = Query(None),
+    warehouse_id: Optional[int] = Query(None),
+    content_hash: Optional[str] = Query(None, min_length=32, max_length=32),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    granularity: Literal["raw", "daily"] = Query("raw"),
+):
+    """
+    История цены позиции склада. raw — каждое изменение цены, daily — срез на каждый день,
+    когда позиция была в прайсе: min/avg/max и цена на конец дня. В базе хранятся только дни
+    с изменениями, остальные дни дополняются переносом цены при чтении.
+    Ряд читается одним диапазонным сканом по первичному ключу (warehouse_id, content_hash, время).
+    """
+    if metal_id is not None:
+        row = (await db.execute(
+            select(Metal.warehouse_id, Metal.content_hash).where(Metal.id == metal_id)
+        )).first()
+        if not row or not row.content_hash:
+            raise HTTPException(status_code=404, detail="Позиция не найдена или ещё не имеет истории цен")
+        warehouse_id, content_hash = row.warehouse_id, row.content_hash
+    elif warehouse_id is None or content_hash is None:
+        raise HTTPException(status_code=400, detail="Укажите metal_id или пару warehouse_id и content_hash")
+
+    result = {"warehouse_id": warehouse_id, "content_hash": content_hash, "granularity": granularity}
+
+    if granularity == "daily":
+        columns = (
+            MetalPriceDaily.day,
+            MetalPriceDaily.min_price,
+            MetalPriceDaily.avg_price,
+            MetalPriceDaily.max_price,
+            MetalPriceDaily.close_price,
+            MetalPriceDaily.samples,
+        )
+        position = (
+            MetalPriceDaily.warehouse_id == warehouse_id,
+            MetalPriceDaily.content_hash == content_hash,
+        )
+        query = select(*columns).where(*position)
+        if date_from:
+            query = query.where(MetalPriceDaily.day >= date_from.date())
+        if date_to:
+            query = query.where(MetalPriceDaily.day <= date_to.date())
+        rows = (await db.execute(query.order_by(MetalPriceDaily.day))).mappings().all()
+        opening = None
+        if date_from:
+            # Цена на начало периода — с последнего дня с изменениями до него
+            opening = (await db.execute(
+                select(*columns).where(*position, MetalPriceDaily.day < date_from.date())
+                .order_by(MetalPriceDaily.day.desc()).limit(1)
+            )).mappings().first()
+        first = date_from.date() if date_from else None
+        last = min(date_to.date(), date.today()) if date_to else date.today()
+        result["daily"] = carry_forward_days(rows, opening, first, last)
+        return result
+
+    query = select(MetalPriceHistory.recorded_at, MetalPriceHistory.price).where(
+        MetalPriceHistory.warehouse_id == warehouse_id,
+        MetalPriceHistory.content_hash == content_hash,
+    )
+    if date_from:
+        query = query.where(MetalPriceHistory.recorded_at >= date_from)
+    if date_to:
+        query = query.where(MetalPriceHistory.recorded_at <= date_to)
+    rows = (await db.execute(query.order_by(MetalPriceHistory.recorded_at))).mappings().all()
+    result["points"] = rows
+    return result
@@ -1,36 +1,107 @@
-from typing import Optional
+import base64
+import binascii
+import json
+import math
+import time
+from typing import Any, Dict, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Select, and_, func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
 from app.models.metal import Metal
 from app.models.warehouse import Warehouse
 from app.schemas.search import SearchResult
+from app.services.catalog_search import DIMENSIONS, build_tsquery, dimension_condition, search_condition, search_rank
 
 router = APIRouter()
 
+# Ключи сортировки для курсора; второй ключ всегда Metal.id, так что порядок однозначен.
+# Сортировка relevance (по умолчанию при q) идёт по рассчитанной оценке и листается через offset
+SORT_COLUMNS = {
+    "id": Metal.id,
+    "price": Metal.price,
+}
 
-@router.get("/search", response_model=SearchResult, summary="Search for metal products")
-async def search_metal(
-    db: AsyncSession = Depends(get_db),
-    # Параметры фильтрации
-    supplier: Optional[str] = Query(None),
-    category: Optional[str] = Query(None),
-    stamp: Optional[str] = Query(None),
-    state_standard: Optional[str] = Query(None),
-    city: Optional[str] = Query(None),
-    thickness: Optional[float] = Query(None),
-    length: Optional[float] = Query(None),
-    width: Optional[float] = Query(None),
-    diameter: Optional[float] = Query(None),
-    # Параметры пагинации
-    limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-):
+# Точные COUNT по одинаковым фильтрам между запусками парсеров не меняются
+COUNT_CACHE_TTL = 600  # секунд
+COUNT_CACHE_MAX_SIZE = 1024
+_count_cache: Dict[Tuple[Any, ...], Tuple[float, int]] = {}
+
+PHASE_VALUES = "value"
+PHASE_NULLS = "null"
+
+# (min, max, допуск) для одного размера
+DimensionRange = Tuple[Optional[float], Optional[float], Optional[float]]
+
+
+def _encode_cursor(sort: str, row) -> str:
+    # Фаза: ещё идут непустые значения ключа или уже хвост NULL (NULLS LAST)
+    phase = PHASE_NULLS if row[sort] is None else PHASE_VALUES
+    payload = json.dumps({"s": sort, "p": phase, "v": row[sort], "id": row["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Metal.id — integer; больший id из подделанного курсора уронил бы запрос в базе
+MAX_CURSOR_ID = 2**31 - 1
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[str, Any, int]:
+    # Курсор приходит от клиента: всё, что не мог выдать _encode_cursor, — 400, а не ошибка базы
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        phase, value, last_id = payload["p"], payload["v"], payload["id"]
+        if payload["s"] != sort or not isinstance(phase, str) or phase not in (PHASE_VALUES, PHASE_NULLS):
+            raise ValueError
+        if isinstance(last_id, bool) or not isinstance(last_id, int) or not 0 <= last_id <= MAX_CURSOR_ID:
+            raise ValueError
+        if phase == PHASE_VALUES and not _is_number(value):
+            raise ValueError
+        if phase == PHASE_NULLS and value is not None:
+            raise ValueError
+        return phase, value, last_id
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор: получите его заново из ответа /search с теми же параметрами")
+
+
+def _after_cursor(sort: str, phase: str, value: Any, last_id: int):
     """
-    Поиск металлопродукции по различным фильтрам с пагинацией.
+    Условие «строго после (value, last_id)» для ORDER BY col ASC NULLS LAST, id ASC.
+    В фазе непустых значений — только сравнение кортежей: это диапазон по индексу (col, id),
+    NULL он не захватывает, хвост дочитывается отдельно (см. search_metal).
+    В хвосте NULL — col IS NULL AND id > last_id, тоже диапазон по тому же индексу.
+    """
+    if sort == "id":
+        return Metal.id > last_id
+    column = SORT_COLUMNS[sort]
+    if phase == PHASE_NULLS:
+        return and_(column.is_(None), Metal.id > last_id)
+    return tuple_(column, Metal.id) > tuple_(value, last_id)
+
+
+def build_search_query(
+    *,
+    q: Optional[str] = None,
+    supplier: Optional[str] = None,
+    category: Optional[str] = None,
+    stamp: Optional[str] = None,
+    state_standard: Optional[str] = None,
+    city: Optional[str] = None,
+    thickness: Optional[float] = None,
+    length: Optional[float] = None,
+    width: Optional[float] = None,
+    diameter: Optional[float] = None,
+    ranges: Optional[Dict[str, DimensionRange]] = None,
+) -> Select:
+    """
+    Запрос /search с фильтрами, без сортировки и пагинации (его же проверяет scripts/explain_queries.py).
+    При q добавляются условие свободного поиска и колонка score (app/services/catalog_search.py).
+    ranges — (min, max, допуск) по размерам; размеры сравниваются в целых микрометрах (Metal.*_um).
     """
     # Базовый запрос, который объединяет Metal и Warehouse
     query = (
@@ -63,22 +134,175 @@ async def search_metal(
         query = query.where(Metal.stamp == stamp)
     if state_standard:
         query = query.where(Metal.state_standard == state_standard)
-    if thickness:
-        query = query.where(Metal.thickness == thickness)
-    if length:
-        query = query.where(Metal.length == length)
-    if width:
-        query = query.where(Metal.width == width)
-    if diameter:
-        query = query.where(Metal.diameter == diameter)
+    values = {"thickness": thickness, "diameter": diameter, "width": width, "length": length}
+    ranges = ranges or {}
+    for dimension in DIMENSIONS:
+        minimum, maximum, tolerance = ranges.get(dimension, (None, None, None))
+        condition = dimension_condition(dimension, values[dimension], minimum, maximum, tolerance)
+        if condition is not None:
+            query = query.where(condition)
+    if q:
+        tsquery = build_tsquery(q)
+        query = query.add_columns(search_rank(q, tsquery).label("score")).where(search_condition(q, tsquery))
+    return query
+
 
+def order_search_query(query: Select, sort: str) -> Select:
+    if sort == "relevance":
+        return query.order_by(query.selected_columns.score.desc(), Metal.id)
+    if sort == "id":
+        return query.order_by(Metal.id)
+    return query.order_by(SORT_COLUMNS[sort].asc().nulls_last(), Metal.id)
+
+
+async def _exact_total(db: AsyncSession, query: Select) -> int:
     count_query = select(func.count()).select_from(query.order_by(None).subquery())
-    total = (await db.execute(count_query)).scalar_one_or_none() or 0
-    
-    query = query.order_by(Metal.id).limit(limit).offset(offset)
+    return (await db.execute(count_query)).scalar_one_or_none() or 0
+
+
+async def _estimated_total(db: AsyncSession, query: Select) -> int:
+    """Оценка числа строк из статистики планировщика (EXPLAIN без выполнения запроса)."""
+    conn = await db.connection()
+    # Значения фильтров подставлены литералами диалекта; exec_driver_sql не ищет в строке :параметры
+    compiled = query.order_by(None).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _cached_total(db: AsyncSession, query: Select, filters: Tuple[Any, ...]) -> int:
+    """
+    Точный COUNT, закэшированный в процессе по набору фильтров. Ключ включает сумму Warehouse.data_version:
+    её увеличивает каждый перенос в blue, менявший позиции, в той же транзакции, что и сами изменения,
+    так что после коммита переноса старое значение из кэша уже не берётся.
+    """
+    data_version = (await db.execute(select(func.sum(Warehouse.data_version)))).scalar_one_or_none()
+    key = (data_version, *filters)
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = await _exact_total(db, query)
+    if len(_count_cache) >= COUNT_CACHE_MAX_SIZE:
+        _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+
+@router.get("/search", response_model=SearchResult, summary="Search for metal products")
+async def search_metal(
+    db: AsyncSession = Depends(get_db),
+    # Свободный поиск: слова в любом порядке, сокращения (г/к, х/к) и опечатки в наименовании
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    # Параметры фильтрации
+    supplier: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    stamp: Optional[str] = Query(None),
+    state_standard: Optional[str] = Query(None),
+    city: Optional[str] = Query(None),
+    # Размеры: толщина и диаметр в мм, длина и ширина в м.
+    # Точное значение, диапазон *_min/*_max и допуск *_tol в тех же единицах
+    thickness: Optional[float] = Query(None),
+    thickness_min: Optional[float] = Query(None),
+    thickness_max: Optional[float] = Query(None),
+    thickness_tol: Optional[float] = Query(None, ge=0),
+    length: Optional[float] = Query(None),
+    length_min: Optional[float] = Query(None),
+    length_max: Optional[float] = Query(None),
+    length_tol: Optional[float] = Query(None, ge=0),
+    width: Optional[float] = Query(None),
+    width_min: Optional[float] = Query(None),
+    width_max: Optional[float] = Query(None),
+    width_tol: Optional[float] = Query(None, ge=0),
+    diameter: Optional[float] = Query(None),
+    diameter_min: Optional[float] = Query(None),
+    diameter_max: Optional[float] = Query(None),
+    diameter_tol: Optional[float] = Query(None, ge=0),
+    # Параметры пагинации
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа (вместо offset)"),
+    sort: Optional[Literal["relevance", "id", "price"]] = Query(None, description="По умолчанию relevance при q, иначе id"),
+    count: Literal["exact", "estimate", "cached", "none"] = Query(
+        "exact", description="Как считать total: точно, оценкой планировщика, точно с кэшем или не считать"
+    ),
+):
+    """
+    Поиск металлопродукции по различным фильтрам с пагинацией.
+    q — свободный поиск по наименованию, категории, марке и ГОСТу с ранжированием (поле score).
+    Страницы по курсору (next_cursor) читаются по индексу с места остановки и не замедляются с глубиной,
+    в отличие от offset. Для листания дальше первой страницы total обычно не нужен: count=none.
+    """
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Укажите либо cursor, либо offset")
+    sort = sort or ("relevance" if q else "id")
+    if sort == "relevance" and not q:
+        raise HTTPException(status_code=400, detail="Сортировка relevance возможна только вместе с q")
+    if sort == "relevance" and cursor:
+        raise HTTPException(status_code=400, detail="При сортировке relevance листайте через offset")
+
+    ranges = {
+        "thickness": (thickness_min, thickness_max, thickness_tol),
+        "length": (length_min, length_max, length_tol),
+        "width": (width_min, width_max, width_tol),
+        "diameter": (diameter_min, diameter_max, diameter_tol),
+    }
+    values = {"thickness": thickness, "length": length, "width": width, "diameter": diameter}
+    for dimension, (minimum, maximum, _) in ranges.items():
+        if values[dimension] is not None and (minimum is not None or maximum is not None):
+            raise HTTPException(status_code=400, detail=f"Укажите либо {dimension}, либо {dimension}_min/{dimension}_max")
+
+    query = build_search_query(
+        q=q,
+        supplier=supplier,
+        category=category,
+        stamp=stamp,
+        state_standard=state_standard,
+        city=city,
+        thickness=thickness,
+        length=length,
+        width=width,
+        diameter=diameter,
+        ranges=ranges,
+    )
+
+    total_is_estimate = False
+    if count == "exact":
+        total = await _exact_total(db, query)
+    elif count == "estimate":
+        total = await _estimated_total(db, query)
+        total_is_estimate = True
+    elif count == "cached":
+        filters = (
+            q, supplier, city, category, stamp, state_standard, thickness, length, width, diameter,
+            *sorted(ranges.items()),
+        )
+        total = await _cached_total(db, query, filters)
+    else:
+        total = None
 
-    result = await db.execute(query)
-    items = result.mappings().all()
+    page_query = order_search_query(query, sort)
+    phase = None
+    if cursor:
+        phase, value, last_id = _decode_cursor(cursor, sort)
+        page_query = page_query.where(_after_cursor(sort, phase, value, last_id))
+    else:
+        page_query = page_query.offset(offset)
 
-    return {"items": items, "total": total}
+    # Одна лишняя строка показывает, есть ли следующая страница
+    result = await db.execute(page_query.limit(limit + 1))
+    items = list(result.mappings().all())
+    if phase == PHASE_VALUES and sort != "id" and len(items) <= limit:
+        # Непустые значения кончились: страницу дополняет начало хвоста NULL
+        tail_query = order_search_query(query, sort).where(SORT_COLUMNS[sort].is_(None))
+        items += (await db.execute(tail_query.limit(limit + 1 - len(items)))).mappings().all()
+    has_more = len(items) > limit
+    next_cursor = _encode_cursor(sort, items[limit - 1]) if has_more and sort != "relevance" else None
 
+    return {
+        "items": items[:limit],
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": next_cursor,
+    }
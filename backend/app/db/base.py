@@ -1,6 +1,7 @@
 from app.db.base_class import Base
 from app.models.crm import Chat, ChatParticipant, ChatMessage, Email
 from app.models.metal import Metal, MetalGreen
+from app.models.metal_facet import MetalFacet
 from app.models.warehouse import Warehouse, WarehouseGreen
 from app.models.gost import Gost, SteelGrade, gost_grade_association
 from app.models.request import Request, RequestItem
@@ -11,3 +12,5 @@ from app.models.offer_token import OfferToken
 from app.models.organization import Organization
 from app.models.oauth_account import OAuthAccount
 from app.models.contract import Contract
+from app.models.parser_run import ParserRun
+from app.models.price_history import MetalPriceHistory, MetalPriceDaily
@@ -1,8 +1,11 @@
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 from app.db.base import Base
+from app.models.metal import METAL_SEARCH_VECTOR_SQL, dimension_um_sql
+from app.services.catalog_facets import ensure_metal_facets
 
 # Создаем асинхронный движок SQLAlchemy
 engine = create_async_engine(settings.DATABASE_URL, pool_pre_ping=True)
@@ -16,10 +19,56 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+# Расширения, без которых create_all не создаст индексы моделей (GIN gin_trgm_ops на metal.name).
+# pg_trgm в Postgres 13+ доверенное: хватает прав владельца базы
+SCHEMA_PREREQUISITES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+]
+
+# create_all не добавляет колонки и индексы в уже существующие таблицы —
+# всё, что появилось в моделях позже, догоняем идемпотентным DDL
+SCHEMA_UPGRADES = [
+    "ALTER TABLE metal ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)",
+    "ALTER TABLE metal_green ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_warehouse_content_hash ON metal (warehouse_id, content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_green_warehouse_content_hash ON metal_green (warehouse_id, content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_price_id ON metal (price, id)",
+    # Индексы под фильтры /search и /filters/* (см. app/models/metal.py)
+    "CREATE INDEX IF NOT EXISTS ix_metal_warehouse_category_stamp ON metal (warehouse_id, category, stamp)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_category_stamp_search ON metal (category, stamp, id) "
+    "INCLUDE (warehouse_id, name, state_standard, thickness, length, width, diameter, price, material)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_state_standard ON metal (state_standard)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_name_trgm ON metal USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_warehouse_supplier ON warehouse (supplier)",
+    # Версия данных склада: ключ кэша COUNT в /search (app/api/v1/endpoints/search.py)
+    "ALTER TABLE warehouse ADD COLUMN IF NOT EXISTS data_version INTEGER NOT NULL DEFAULT 0",
+    # Полнотекстовый поиск /search?q= (колонка вычисляется из описания позиции; добавление перепишет таблицу один раз)
+    f"ALTER TABLE metal ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({METAL_SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_metal_search_vector ON metal USING gin (search_vector)",
+    # Размеры в микрометрах для фильтров /search по диапазону
+    f"ALTER TABLE metal ADD COLUMN IF NOT EXISTS thickness_um BIGINT GENERATED ALWAYS AS ({dimension_um_sql('thickness')}) STORED",
+    f"ALTER TABLE metal ADD COLUMN IF NOT EXISTS diameter_um BIGINT GENERATED ALWAYS AS ({dimension_um_sql('diameter')}) STORED",
+    f"ALTER TABLE metal ADD COLUMN IF NOT EXISTS width_um BIGINT GENERATED ALWAYS AS ({dimension_um_sql('width')}) STORED",
+    f"ALTER TABLE metal ADD COLUMN IF NOT EXISTS length_um BIGINT GENERATED ALWAYS AS ({dimension_um_sql('length')}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_metal_thickness_um ON metal (thickness_um)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_diameter_um ON metal (diameter_um)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_width_um ON metal (width_um)",
+    "CREATE INDEX IF NOT EXISTS ix_metal_length_um ON metal (length_um)",
+]
+
+
 async def create_tables():
     async with engine.begin() as conn:
+        for statement in SCHEMA_PREREQUISITES:
+            await conn.execute(text(statement))
         # Создаем таблицы, если они не существуют
         await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+    # Фасеты фильтров для базы, где каталог уже есть, а таблица metal_facets только что появилась
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await ensure_metal_facets(session)
     print("Таблицы успешно созданы (если не существовали).")
 
 async def get_db():
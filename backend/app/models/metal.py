@@ -1,7 +1,31 @@
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import BigInteger, Column, Computed, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 from app.db.base_class import Base
 
+# Документ полнотекстового поиска позиции (/search?q=, app/services/catalog_search.py):
+# наименование важнее категории и марки, те — важнее ГОСТа и материала
+METAL_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(category, '') || ' ' || coalesce(stamp, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(state_standard, '') || ' ' || coalesce(material, '')), 'C')"
+)
+
+# Размеры позиции в целых микрометрах для фильтров /search (точное равенство и диапазоны по индексу).
+# Толщина и диаметр хранятся в мм, длина и ширина — в м: к метрам их приводит загрузка
+# (app/services/price_loader.py по единицам поставщика из реестра парсеров)
+DIMENSION_UM_FACTORS = {
+    "thickness": 1000,
+    "diameter": 1000,
+    "width": 1000000,
+    "length": 1000000,
+}
+
+
+def dimension_um_sql(column: str) -> str:
+    """Выражение генерируемой колонки <column>_um (её же повторяет catalog_search.dimension_um)."""
+    return f"round({column} * {DIMENSION_UM_FACTORS[column]})::bigint"
+
 
 class Metal(Base):
     __tablename__ = 'metal'
@@ -20,6 +44,39 @@ class Metal(Base):
     price_updated_at = Column(DateTime, nullable=True) #дата и время, когда были обновлены данные
     comments = Column(String, nullable=True) #все для чего нет поля
     warehouse_id = Column(Integer, ForeignKey('warehouse.id'), nullable=False) #айди склада и связь с ним
+    content_hash = Column(String(32), nullable=True) #хэш ключа позиции (price_loader.HASH_COLUMNS) для инкрементального обновления
+    search_vector = Column(TSVECTOR, Computed(METAL_SEARCH_VECTOR_SQL, persisted=True)) #считает сама БД при вставке
+    # Размеры в микрометрах, тоже считает БД при вставке (dimension_um_sql)
+    thickness_um = Column(BigInteger, Computed(dimension_um_sql("thickness"), persisted=True))
+    diameter_um = Column(BigInteger, Computed(dimension_um_sql("diameter"), persisted=True))
+    width_um = Column(BigInteger, Computed(dimension_um_sql("width"), persisted=True))
+    length_um = Column(BigInteger, Computed(dimension_um_sql("length"), persisted=True))
+
+    # Индексы под фильтры /search и /filters/* (проверка планов: python -m scripts.explain_queries).
+    # Для существующих баз те же индексы создаёт SCHEMA_UPGRADES в app/db/session.py
+    __table_args__ = (
+        Index('ix_metal_warehouse_content_hash', 'warehouse_id', 'content_hash'),
+        Index('ix_metal_price_id', 'price', 'id'), # страницы /search по курсору при sort=price
+        # Фильтр по поставщику/городу (склады) вместе с категорией и маркой; DISTINCT категорий и марок склада
+        Index('ix_metal_warehouse_category_stamp', 'warehouse_id', 'category', 'stamp'),
+        # Покрывающий индекс /search по категории и марке: страница читается без обращения к таблице
+        Index(
+            'ix_metal_category_stamp_search', 'category', 'stamp', 'id',
+            postgresql_include=[
+                'warehouse_id', 'name', 'state_standard', 'thickness', 'length', 'width', 'diameter',
+                'price', 'material',
+            ],
+        ),
+        Index('ix_metal_state_standard', 'state_standard'),
+        # Поиск по подстроке наименования (нужно расширение pg_trgm)
+        Index('ix_metal_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_metal_search_vector', 'search_vector', postgresql_using='gin'),
+        # Равенство и диапазоны размеров (/search?thickness_min=...); с категорией складываются через BitmapAnd
+        Index('ix_metal_thickness_um', 'thickness_um'),
+        Index('ix_metal_diameter_um', 'diameter_um'),
+        Index('ix_metal_width_um', 'width_um'),
+        Index('ix_metal_length_um', 'length_um'),
+    )
 
 class MetalGreen(Base):
     __tablename__ = 'metal_green'
@@ -38,3 +95,6 @@ class MetalGreen(Base):
     price_updated_at = Column(DateTime, nullable=True)
     comments = Column(String, nullable=True)
     warehouse_id = Column(Integer, ForeignKey('warehouse_green.id'), nullable=False)
+    content_hash = Column(String(32), nullable=True)
+
+    __table_args__ = (Index('ix_metal_green_warehouse_content_hash', 'warehouse_id', 'content_hash'),)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Index, Integer, String
+
+from app.db.base_class import Base
+
+
+class MetalFacet(Base):
+    """
+    Уникальные сочетания (поставщик, город, категория, марка, ГОСТ) позиций blue-каталога
+    с числом позиций. Из неё отвечают выпадающие списки /filters/*; пересобирается целиком
+    после каждого запуска парсеров (app/services/catalog_facets.py).
+    """
+    __tablename__ = 'metal_facets'
+    id = Column(Integer, primary_key=True)
+    supplier = Column(String, nullable=True)
+    city = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    stamp = Column(String, nullable=True)
+    state_standard = Column(String, nullable=True) # ГОСТ/ТУ
+    positions = Column(Integer, nullable=False, default=0) # позиций metal с таким сочетанием
+
+    __table_args__ = (
+        Index('ix_metal_facets_category_stamp', 'category', 'stamp'),
+        Index('ix_metal_facets_supplier_city', 'supplier', 'city'),
+    )
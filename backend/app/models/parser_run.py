@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class ParserRun(Base):
+    __tablename__ = 'parser_runs'
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, index=True) # общий идентификатор запуска run_parsers.py
+    supplier = Column(String, nullable=False)
+    city = Column(String, nullable=False)
+    status = Column(String, nullable=False) # статус пары в запуске (app/parsers/telemetry.py)
+    inserted = Column(Integer, nullable=False, default=0) # новые позиции
+    updated = Column(Integer, nullable=False, default=0) # позиции с изменившейся ценой
+    deleted = Column(Integer, nullable=False, default=0) # позиции, пропавшие из прайса
+    unchanged = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer) # строки прайса с повторяющимся ключом позиции (в каталог идёт самая дешёвая)
+    # Время этапов, секунды
+    fetch_seconds = Column(Float)
+    parse_seconds = Column(Float)
+    green_seconds = Column(Float)
+    promote_seconds = Column(Float)
+    rows_parsed = Column(Integer)
+    bytes_downloaded = Column(BigInteger)
+    retries = Column(Integer)
+    errors = Column(Integer)
+    error = Column(Text) # последняя ошибка
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
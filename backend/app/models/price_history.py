@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String
+
+from app.db.base_class import Base
+
+
+class MetalPriceHistory(Base):
+    """
+    Журнал изменений цен: строка пишется только когда цена позиции склада поменялась,
+    позиция появилась (цена) или пропала из прайса (price = NULL).
+    Позиция определяется парой (warehouse_id, content_hash). Таблица секционирована по месяцам.
+    """
+    __tablename__ = 'metal_price_history'
+    warehouse_id = Column(Integer, primary_key=True)
+    content_hash = Column(String(32), primary_key=True)
+    recorded_at = Column(DateTime, primary_key=True)
+    price = Column(Float, nullable=True)
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (recorded_at)'}
+
+
+class MetalPriceDaily(Base):
+    """
+    Дневной срез цен: строка только на дни, когда цена позиции склада менялась, с min/avg/max
+    за день (включая цену на его начало) и ценой на конец дня. Дни без изменений не хранятся:
+    /prices/history переносит в них close_price последнего дня с изменениями.
+    """
+    __tablename__ = 'metal_price_daily'
+    warehouse_id = Column(Integer, primary_key=True)
+    content_hash = Column(String(32), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_price = Column(Float, nullable=True)
+    avg_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+    close_price = Column(Float, nullable=True) # цена на конец дня; NULL — позиция пропала из прайса
+    samples = Column(Integer, nullable=False, default=0) # изменений цены за день
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import Column, Index, Integer, String, UniqueConstraint
 
 from app.db.base_class import Base
 
@@ -11,8 +11,13 @@ class Warehouse(Base):
     email = Column(String, nullable=True) #email
     legal_entity = Column(String, nullable=True) #Юр. лицо
     working_hours = Column(String, nullable=True) #Время работы
+    data_version = Column(Integer, nullable=False, server_default='0') #Счётчик переносов из green, менявших позиции склада
 
-    __table_args__ = (UniqueConstraint('city', 'supplier', name='_city_supplier_uc'),)
+    # Уникальный (city, supplier) обслуживает фильтр по городу; фильтр по одному поставщику — свой индекс
+    __table_args__ = (
+        UniqueConstraint('city', 'supplier', name='_city_supplier_uc'),
+        Index('ix_warehouse_supplier', 'supplier'),
+    )
     
 class WarehouseGreen(Base):
     __tablename__ = 'warehouse_green'
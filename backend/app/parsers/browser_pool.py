@@ -0,0 +1,173 @@
+# app/parsers/browser_pool.py
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from playwright.async_api import Browser, BrowserContext, Page, Request, Response, Route
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Картинки, шрифты и медиа парсерам не нужны ни на одном сайте
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+# Стили можно резать только там, где не проверяется видимость элементов (страницы mc.ru)
+BLOCKED_RESOURCE_TYPES_WITH_STYLES = BLOCKED_RESOURCE_TYPES | {"stylesheet"}
+# Счётчики и виджеты: их скрипты грузятся долго и держат событие load
+BLOCKED_HOSTS: Tuple[str, ...] = (
+    "mc.yandex.ru",
+    "yandex.ru/metrika",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "top-fwz1.mail.ru",
+    "vk.com",
+    "jivosite.com",
+    "bitrix24.ru",
+)
+
+
+@dataclass
+class BrowserPoolMetrics:
+    """Счётчики пула браузерных контекстов за прогон."""
+    contexts_created: int = 0
+    contexts_recycled: int = 0
+    pages_opened: int = 0
+    requests_blocked: int = 0
+    # Размер ответа на прерванный запрос неизвестен (он не скачивался), поэтому считаются только запросы по типам
+    blocked_by_type: Dict[str, int] = field(default_factory=dict)
+    # Что реально пришло по незаблокированным запросам (по Content-Length ответа)
+    bytes_loaded: int = 0
+    download_waits: int = 0
+    download_wait_seconds: float = 0.0
+
+    def record_download_wait(self, seconds: float) -> None:
+        self.download_waits += 1
+        self.download_wait_seconds += seconds
+
+    def record_blocked(self, kind: str) -> None:
+        self.requests_blocked += 1
+        self.blocked_by_type[kind] = self.blocked_by_type.get(kind, 0) + 1
+
+    def report(self, title: str) -> None:
+        avg_wait = self.download_wait_seconds / self.download_waits if self.download_waits else 0.0
+        print(
+            f"[Браузер] {title}: контекстов {self.contexts_created} (пересоздано {self.contexts_recycled}), "
+            f"вкладок {self.pages_opened}, заблокировано запросов {self.requests_blocked} {self.blocked_by_type} "
+            f"загружено {self.bytes_loaded / 1024 / 1024:.1f} МБ, "
+            f"ожидание скачивания {self.download_wait_seconds:.1f} c (в среднем {avg_wait:.1f} c)"
+        )
+
+
+@dataclass
+class _Slot:
+    context: BrowserContext
+    page: Page
+    uses: int = 0
+
+
+class BrowserPool:
+    """
+    Пул браузерных контекстов поверх одного Browser: каждый контекст со своей вкладкой и перехватом запросов
+    (картинки/шрифты/медиа и счётчики не загружаются).
+    - контексты создаются заранее (prewarm) и переиспользуются между задачами;
+    - после max_uses задач или после ошибки контекст закрывается и создаётся заново;
+    - share_storage: куки и localStorage успешной задачи (регион, согласие с куки) переносятся в новые контексты.
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        size: int,
+        *,
+        max_uses: int = 20,
+        prewarm: Optional[int] = None,
+        blocked_types: frozenset = BLOCKED_RESOURCE_TYPES,
+        blocked_hosts: Tuple[str, ...] = BLOCKED_HOSTS,
+        share_storage: bool = False,
+        context_options: Optional[Dict[str, Any]] = None,
+    ):
+        self._browser = browser
+        self._size = size
+        self._max_uses = max_uses
+        self._prewarm = size if prewarm is None else min(prewarm, size)
+        self._blocked_types = blocked_types
+        self._blocked_hosts = blocked_hosts
+        self._share_storage = share_storage
+        self._context_options = {"user_agent": DEFAULT_USER_AGENT, "accept_downloads": True, **(context_options or {})}
+        self._storage_state: Optional[Dict[str, Any]] = None
+        self._sem = asyncio.Semaphore(size)
+        self._idle: List[_Slot] = []
+        self.metrics = BrowserPoolMetrics()
+
+    async def start(self) -> None:
+        """Заранее поднимает prewarm контекстов, чтобы первые задачи не ждали запуска вкладок."""
+        slots = await asyncio.gather(*(self._new_slot() for _ in range(self._prewarm)))
+        self._idle.extend(slots)
+
+    def _is_blocked(self, request: Request) -> bool:
+        if request.resource_type in self._blocked_types:
+            return True
+        parts = urlsplit(request.url)
+        target = parts.netloc + parts.path
+        return any(host in target for host in self._blocked_hosts)
+
+    async def _route(self, route: Route) -> None:
+        request = route.request
+        if self._is_blocked(request):
+            self.metrics.record_blocked(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_response(self, response: Response) -> None:
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.metrics.bytes_loaded += int(length)
+
+    async def _new_slot(self) -> _Slot:
+        options = dict(self._context_options)
+        if self._storage_state is not None:
+            options["storage_state"] = self._storage_state
+        context = await self._browser.new_context(**options)
+        await context.route("**/*", self._route)
+        context.on("response", self._on_response)
+        page = await context.new_page()
+        self.metrics.contexts_created += 1
+        self.metrics.pages_opened += 1
+        return _Slot(context=context, page=page)
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._sem:
+            slot = self._idle.pop() if self._idle else await self._new_slot()
+            healthy = False
+            try:
+                yield slot.page
+                healthy = not slot.page.is_closed()
+            finally:
+                slot.uses += 1
+                if healthy and self._share_storage:
+                    try:
+                        self._storage_state = await slot.context.storage_state()
+                    except Exception:
+                        pass
+                if healthy and slot.uses < self._max_uses:
+                    self._idle.append(slot)
+                else:
+                    if healthy:
+                        self.metrics.contexts_recycled += 1
+                    await self._close_slot(slot)
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._close_slot(self._idle.pop())
@@ -0,0 +1,130 @@
+# app/parsers/common.py
+"""Общие для всех парсеров поставщиков помощники и формат позиции прайса."""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+# Поля позиции в порядке колонок COPY (см. app/services/price_loader.PRODUCT_COLUMNS)
+PRODUCT_FIELDS: Tuple[str, ...] = (
+    "name",
+    "state_standard",
+    "category",
+    "stamp",
+    "diameter",
+    "thickness",
+    "width",
+    "length",
+    "material",
+    "price",
+    "unit",
+    "comments",
+)
+
+
+# Единицы длины и ширины в прайсе поставщика (SupplierParser.length_unit). В каталоге длина
+# и ширина хранятся в метрах, толщина и диаметр — в мм у всех поставщиков
+LENGTH_UNIT_M = "m"
+LENGTH_UNIT_MM = "mm"
+METRES_PER_LENGTH_UNIT: Dict[str, float] = {LENGTH_UNIT_M: 1.0, LENGTH_UNIT_MM: 0.001}
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """Позиция прайса, как её отдаёт любой парсер поставщика. Поля — в порядке PRODUCT_FIELDS."""
+    name: Optional[str] = None
+    state_standard: Optional[str] = None
+    category: Optional[str] = None
+    stamp: Optional[str] = None
+    diameter: Optional[float] = None
+    thickness: Optional[float] = None
+    width: Optional[float] = None
+    length: Optional[float] = None
+    material: Optional[str] = None
+    price: Optional[float] = None
+    unit: Optional[str] = None
+    comments: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProductRecord":
+        """Из словаря парсера; лишние ключи (например, height у МС) отбрасываются."""
+        return cls(*(data.get(name) for name in PRODUCT_FIELDS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in PRODUCT_FIELDS}
+
+
+@dataclass
+class ParsedPrice:
+    """Результат разбора одного источника: позиции (можно генератором) и контакты склада."""
+    records: Iterable[ProductRecord]
+    contacts: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    def materialize(self) -> "ParsedPrice":
+        """Дочитывает генератор позиций (в том же потоке, где идёт разбор)."""
+        if not isinstance(self.records, list):
+            self.records = list(self.records)
+        return self
+
+
+WHITESPACE_RE = re.compile(r"\s+")
+FIRST_NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)?)")
+
+
+def capitalize_category(s: Optional[str]) -> Optional[str]:
+    """Приводит строку к виду 'Первая заглавная, остальные строчные'."""
+    if not s or not isinstance(s, str):
+        return s
+    return s.strip().capitalize()
+
+
+def clean_text(s: Optional[str]) -> str:
+    """Очищает строку от лишних пробелов и переносов."""
+    if not s:
+        return ""
+    return WHITESPACE_RE.sub(" ", s).strip()
+
+
+def parse_float(s: Optional[str]) -> Optional[float]:
+    """Преобразует строку в float, заменяя запятую на точку; None, если не разбирается."""
+    if not s:
+        return None
+    s = str(s).replace(",", ".").strip()
+    try:
+        return float(s)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_price(s: Optional[str]) -> Optional[float]:
+    """Первое число в ячейке цены (пробелы-разделители тысяч убираются)."""
+    if not s:
+        return None
+    s = str(s).replace(" ", "").replace("\u00a0", "")
+    m = FIRST_NUMBER_RE.search(s)
+    if not m:
+        return None
+    return float(m.group(1).replace(",", "."))
+
+
+# --- Векторный разбор колонок pandas ---
+
+def str_to_float(value) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float("nan")
+
+
+def to_float(strings: pd.Series, convert: Callable[[Any], float] = str_to_float) -> pd.Series:
+    """
+    float() по колонке строк; то, что не разбирается, становится NaN.
+    pd.to_numeric не подходит: на длинных дробях он расходится с float() в последнем знаке.
+    """
+    return strings.map(convert, na_action="ignore").astype(float)
+
+
+def as_list(series: pd.Series) -> list:
+    """Значения колонки как обычные python-объекты, NaN -> None."""
+    return series.astype(object).where(series.notna(), None).tolist()
@@ -0,0 +1,119 @@
+# app/parsers/download_cache.py
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import aiofiles
+import httpx
+
+CACHE_DIR = os.path.join("downloads", "cache")
+
+
+@dataclass
+class CachedFile:
+    """Файл прайса из кэша и признак того, что его содержимое ещё не было загружено в БД."""
+    url: str
+    path: str
+    sha256: str
+    changed: bool
+    not_modified: bool  # сервер ответил 304, тело не скачивалось
+
+
+class DownloadCache:
+    """
+    Постоянный кэш скачанных прайсов по URL (downloads/cache/index.json).
+    Для каждого URL хранит ETag, Last-Modified, sha256 файла на диске и отметку последней
+    версии, которая успешно дошла до blue-таблиц: sha256 файла вместе с loader_version —
+    версией загрузчика, которой файл был загружен. Запросы идут с If-None-Match/If-Modified-Since,
+    так что неизменившийся прайс стоит одного короткого ответа 304.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, loader_version: str = ""):
+        self.cache_dir = cache_dir
+        self.loader_version = loader_version
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index: Dict[str, dict] = self._load_index()
+        # (поставщик, город) -> (url, sha256), ждут подтверждения после переноса в blue
+        self._pending: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _processed_key(self, digest: str) -> str:
+        return f"{self.loader_version}:{digest}"
+
+    def _path_for(self, url: str) -> str:
+        ext = os.path.splitext(url.split("?")[0])[1] or ".bin"
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> CachedFile:
+        """Условно скачивает url; при 304 возвращает файл из кэша без загрузки тела."""
+        entry = self._index.get(url) or {}
+        headers = {}
+        if entry.get("path") and os.path.exists(entry["path"]):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await client.get(url, headers=headers, follow_redirects=True)
+        if response.status_code == 304 and headers:
+            return CachedFile(
+                url=url,
+                path=entry["path"],
+                sha256=entry["sha256"],
+                changed=self._processed_key(entry["sha256"]) != entry.get("processed"),
+                not_modified=True,
+            )
+        response.raise_for_status()
+
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path_for(url)
+        if digest != entry.get("sha256") or not os.path.exists(path):
+            async with aiofiles.open(path, "wb") as f:
+                await f.write(content)
+
+        entry.update(
+            path=path,
+            sha256=digest,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self._index[url] = entry
+        self._save_index()
+        return CachedFile(
+            url=url,
+            path=path,
+            sha256=digest,
+            changed=self._processed_key(digest) != entry.get("processed"),
+            not_modified=False,
+        )
+
+    def mark_pending(self, supplier: str, city: str, cached: CachedFile) -> None:
+        """Файл записан в green; считать его обработанным можно только после переноса в blue."""
+        self._pending.setdefault((supplier, city), []).append((cached.url, cached.sha256))
+
+    def confirm(self, supplier: str, city: str) -> None:
+        """Вызывается после успешного переноса (поставщик, город) в blue."""
+        pending = self._pending.pop((supplier, city), None)
+        if not pending:
+            return
+        for url, digest in pending:
+            entry = self._index.get(url)
+            if entry is not None:
+                entry["processed"] = self._processed_key(digest)
+        self._save_index()
@@ -1,13 +1,10 @@
 import pandas as pd
 import re
 import os
-from typing import Optional
+from typing import List, Optional
+
+from app.parsers.common import ParsedPrice, ProductRecord, as_list, capitalize_category, to_float
 
-def capitalize_category(s: Optional[str]) -> Optional[str]:
-    """Приводит строку к виду 'Первая заглавная, остальные строчные'."""
-    if not s or not isinstance(s, str):
-        return s
-    return s.strip().capitalize()
 
 def parse_dimension(value):
     """Преобразует строковое значение размера в число, удаляя 'мм' и заменяя ',' на '.'."""
@@ -63,6 +60,101 @@ def parse_thickness_from_name(name_string):
         return parse_dimension(last_match)
     return None
 
+# Те же регулярные выражения, что в parse_price / parse_thickness_from_name, для векторного разбора колонок
+PRICE_PER_TON_RE = re.compile(r'(\d+(?:[\s\u00A0]\d+)*)\s*за\s*1\s*т', flags=re.IGNORECASE)
+PRICE_NUMBER_RE = re.compile(r'\d+(?:[\s\u00A0]\d+)*')
+NAME_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def parse_text_column(col: pd.Series) -> list:
+    """Колоночный аналог str(value).strip() с заменой пустых и NaN на None."""
+    text = col.astype(str).str.strip()
+    return as_list(text.where(col.notna() & (text != '')))
+
+
+def parse_dimension_column(col: pd.Series) -> pd.Series:
+    """Колоночный аналог parse_dimension."""
+    text = col.astype(str)
+    cleaned = text.str.replace(r'[^\d,.]', '', regex=True).str.replace(',', '.', regex=False)
+    has_digit = col.notna() & text.str.contains(r'\d', regex=True)
+    return to_float(cleaned.where(has_digit))
+
+
+def parse_price_column(col: pd.Series) -> pd.Series:
+    """Колоночный аналог parse_price: сначала 'NNN за 1 т', иначе последнее число в ячейке."""
+    text = col.astype(str).str.strip()
+    per_ton = text.str.extract(PRICE_PER_TON_RE, expand=False)
+    last_number = text.str.findall(PRICE_NUMBER_RE).str[-1].astype(object)
+    raw = per_ton.where(per_ton.notna(), last_number).where(col.notna())
+    return to_float(raw.astype(str).str.replace(r'[ \u00A0]', '', regex=True).where(raw.notna()))
+
+
+def parse_thickness_column(names: pd.Series) -> pd.Series:
+    """Колоночный аналог parse_thickness_from_name: последнее число в названии."""
+    text = names.astype(str)
+    last_number = text.str.findall(NAME_NUMBER_RE).str[-1].astype(object)
+    last_number = last_number.where(names.notna() & last_number.notna())
+    return to_float(last_number.astype(str).str.replace(',', '.', regex=False).where(last_number.notna()))
+
+
+def find_header_row(df: pd.DataFrame, title: str = 'Номенклатура') -> int:
+    """Индекс первой строки, где есть ячейка с текстом title, или -1."""
+    found = df.eq(title).any(axis=1).to_numpy()
+    return int(found.argmax()) if found.any() else -1
+
+
+def sheet_products(data_df: pd.DataFrame, final_col_map: dict, price_col, category_name: Optional[str]) -> List[ProductRecord]:
+    """
+    Собирает позиции листа целиком по колонкам, без iterrows.
+    final_col_map: поле -> номер колонки в data_df; price_col: номер колонки с ценой или None.
+    """
+    name_raw = data_df.iloc[:, final_col_map['name']]
+    # Строки без названия и строки-разделители (заполнена только первая колонка) пропускаем
+    keep = name_raw.notna() & ~(data_df.iloc[:, 0].notna() & data_df.iloc[:, 1].isna())
+    data_df = data_df[keep.to_numpy()]
+    if data_df.empty:
+        return []
+
+    columns = {}
+    for field, position in final_col_map.items():
+        col = data_df.iloc[:, position]
+        if field in ['name', 'state_standard', 'stamp']:
+            columns[field] = parse_text_column(col)
+        else:
+            columns[field] = as_list(parse_dimension_column(col))
+
+    count = len(data_df)
+    if price_col is not None:
+        prices = as_list(parse_price_column(data_df.iloc[:, price_col]))
+    else:
+        prices = [None] * count
+    names = pd.Series(columns['name'], dtype=object)
+    thicknesses = as_list(parse_thickness_column(names))
+
+    empty = [None] * count
+    return [
+        ProductRecord(
+            name=name,
+            state_standard=gost,
+            category=category_name,
+            stamp=stamp,
+            thickness=thickness,
+            width=width,
+            length=length,
+            price=price,
+        )
+        for name, gost, stamp, thickness, width, length, price in zip(
+            columns['name'],
+            columns.get('state_standard', empty),
+            columns.get('stamp', empty),
+            thicknesses,
+            columns.get('width', empty),
+            columns.get('length', empty),
+            prices,
+        )
+    ]
+
+
 def extract_contacts(df):
     """Извлекает телефон и email из ячейки C1 (строка 0, колонка 2)."""
     contacts = {'phone': None, 'email': None}
@@ -88,7 +180,7 @@ def extract_contacts(df):
 def process_excel_file(file_path):
     """
     Извлекает данные о металлоконструкциях и контакты из Excel-файла.
-    Возвращает кортеж: (список товаров, словарь с контактами).
+    Возвращает кортеж: (список позиций ProductRecord, словарь с контактами).
     """
     all_products = []
     warehouse_contacts = {}
@@ -105,12 +197,7 @@ def process_excel_file(file_path):
                     print(f"  - Найденные контакты: {warehouse_contacts}")
                     is_first_sheet = False
 
-                header_row_index = -1
-                for i in range(len(df)):
-                    if 'Номенклатура' in df.iloc[i].astype(str).values:
-                        header_row_index = i
-                        break
-                
+                header_row_index = find_header_row(df)
                 if header_row_index == -1:
                     print(f"  - Не удалось найти заголовок 'Номенклатура' на листе '{sheet_name}'. Пропускаю.")
                     continue
@@ -135,35 +222,37 @@ def process_excel_file(file_path):
                 price_col = None
                 min_volume_cols = []
 
-                for col in data_df.columns:
+                for position, col in enumerate(data_df.columns):
                     h1, h2 = str(col[0]).lower(), str(col[1]).lower()
                     
                     # Ищем колонки с ценой за 1 т в разных объемах
                     if 'цена за 1 т' in h2:
                         if 'до 0,1 т' in h1:
-                            min_volume_cols.append((0.1, col))
+                            min_volume_cols.append((0.1, position))
                         elif 'до 0,25 т' in h1 or '0,1 - 0,25 т' in h1:
-                            min_volume_cols.append((0.25, col))
+                            min_volume_cols.append((0.25, position))
                         elif '0,25 - 0,5 т' in h1:
-                            min_volume_cols.append((0.5, col))
+                            min_volume_cols.append((0.5, position))
                         elif '0,5 - 1 т' in h1:
-                            min_volume_cols.append((1.0, col))
+                            min_volume_cols.append((1.0, position))
                         elif 'от 1 т' in h1:
-                            min_volume_cols.append((999.0, col))  # Самый большой объем
+                            min_volume_cols.append((999.0, position))  # Самый большой объем
                      
                     # Маппинг остальных колонок
                     for key, val in column_map.items():
                         if val.lower() in h1 or val.lower() in h2:
-                            final_col_map[key] = col
+                            final_col_map[key] = position
                 
                 # Выбираем колонку с минимальным объемом
                 if min_volume_cols:
                     min_volume_cols.sort(key=lambda x: x[0])  # Сортируем по объему
                     price_col = min_volume_cols[0][1]
-                    print(f"  - Выбрана колонка с ценой: ('{price_col[0]}', '{price_col[1]}') - объем {min_volume_cols[0][0]} т")
+                    h1, h2 = data_df.columns[price_col]
+                    print(f"  - Выбрана колонка с ценой: ('{h1}', '{h2}') - объем {min_volume_cols[0][0]} т")
                 
-                if price_col:
-                    print(f"  - Найдена колонка с ценой: ('{price_col[0]}', '{price_col[1]}')")
+                if price_col is not None:
+                    h1, h2 = data_df.columns[price_col]
+                    print(f"  - Найдена колонка с ценой: ('{h1}', '{h2}')")
                 else:
                     print("  - ВНИМАНИЕ: Колонка с ценой ('до 0,1 т', 'Цена за 1 т') не найдена.")
 
@@ -171,42 +260,17 @@ def process_excel_file(file_path):
                     print(f"  - Не удалось определить колонку 'Номенклатура'. Пропускаю лист.")
                     continue
                 
-                for _, row in data_df.iterrows():
-                    name_val = row.get(final_col_map['name'])
-                    if pd.isna(name_val):
-                        continue
-                    if pd.notna(row.iloc[0]) and pd.isna(row.iloc[1]):
-                        continue
-
-                    product_data = {}
-
-                    # Устанавливаем категорию и обнуляем материал
-                    product_data['category'] = category_name
-                    product_data['material'] = None 
-
-                    for field, col_name in final_col_map.items():
-                        if not col_name: continue
-                        raw_value = row.get(col_name)
-                        
-                        if field in ['name', 'state_standard', 'stamp']:
-                            value = str(raw_value).strip() if pd.notna(raw_value) else None
-                            product_data[field] = value if value else None
-                        elif field in ['length', 'width']:
-                             product_data[field] = parse_dimension(raw_value)
-                        else:
-                             product_data[field] = raw_value if pd.notna(raw_value) else None
-                    
-                    # Добавляем цену из найденной колонки
-                    product_data['price'] = parse_price(row.get(price_col)) if price_col else None
-                    
-                    product_data['thickness'] = parse_thickness_from_name(product_data.get('name'))
-                    product_data['comments'] = None
-                    
-                    all_products.append(product_data)
+                all_products.extend(sheet_products(data_df, final_col_map, price_col, category_name))
 
     except Exception as e:
         print(f"Не удалось открыть или обработать Excel файл: {file_path}. Ошибка: {e}")
         return [], {}
     
     print(f"\nОбработка файла {os.path.basename(file_path)} завершена. Найдено товаров: {len(all_products)}")
-    return all_products, warehouse_contacts
\ No newline at end of file
+    return all_products, warehouse_contacts
+
+
+def parse_evraz_price(file_path: str) -> ParsedPrice:
+    """Прайс ЕВРАЗ в общем формате реестра парсеров (app/parsers/registry.py)."""
+    products, contacts = process_excel_file(file_path)
+    return ParsedPrice(products, contacts or {})
@@ -1,10 +1,15 @@
 # app/mc_ru_parser.py
 import asyncio
 import re
-from typing import Dict, List, Optional, Tuple
-from bs4 import BeautifulSoup
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Tuple
+import httpx
+from lxml import etree
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 
+from app.parsers.common import ParsedPrice, ProductRecord, capitalize_category, clean_text, parse_float, parse_price
+from app.parsers.resilience import RetryPolicy, retry_async
+
 # Простейший маппинг из русских заголовков в наши поля
 # Всё, чего нет — складываем в comment
 # Колонки на сайтах МС бывают в разных регистрах/вариантах — нормализуем по lower()
@@ -37,178 +42,214 @@ COL_MAP = {
 
 GOST_RE = re.compile(r"((?:ГОСТ|ТУ)\s*[\d.\-]+(?:-[\d]{2,4})?)", re.IGNORECASE)
 
-def capitalize_category(s: Optional[str]) -> Optional[str]:
-    """Приводит строку к виду 'Первая заглавная, остальные строчные'."""
-    if not s or not isinstance(s, str):
-        return s
-    return s.strip().capitalize()
+def _split_diameters(s: str) -> List[str]:
+    # пример: "14 ; 18; 20; 22; 25" -> ["14","18","20","22","25"]
+    parts = re.split(r"[;,/]|(?:\s+\u2022\s+)", s)
+    return [p.strip() for p in parts if p.strip()]
 
 
-def _clean_text(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+MC_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+}
 
+# Ответы, после которых страницу имеет смысл открыть в настоящем браузере
+BOT_PROTECTION_STATUSES = {401, 403, 429, 503}
+BOT_PROTECTION_MARKERS = (
+    "captcha", "ddos-guard", "__qrator", "cf-chl", "challenge-platform",
+    "проверка браузера", "доступ ограничен",
+)
 
-def _parse_dimension(s: Optional[str]) -> Optional[float]:
-    if not s:
-        return None
-    s = s.replace(",", ".").strip()
-    try:
-        return float(s)
-    except (ValueError, TypeError):
-        return None
 
+class BotProtectionError(Exception):
+    """mc.ru отдал страницу антибот-защиты вместо прайса."""
 
-def _parse_price(s: str) -> Optional[float]:
-    s = s.replace(" ", "").replace("\u00a0", "")
-    m = re.search(r"(\d+(?:[.,]\d+)?)", s)
-    if not m:
-        return None
-    return float(m.group(1).replace(",", "."))
 
+# Повторы загрузки страницы в браузере (таймаут 5 с на попытку)
+BROWSER_PAGE_RETRY = RetryPolicy(attempts=3, base_delay=5.0)
 
-def _split_diameters(s: str) -> List[str]:
-    # пример: "14 ; 18; 20; 22; 25" -> ["14","18","20","22","25"]
-    parts = re.split(r"[;,/]|(?:\s+\u2022\s+)", s)
-    return [p.strip() for p in parts if p.strip()]
+
+def create_mc_client(max_connections: int) -> httpx.AsyncClient:
+    """HTTP/2-клиент для mc.ru: одно соединение мультиплексирует параллельные запросы города."""
+    return httpx.AsyncClient(
+        http2=True,
+        headers=MC_HEADERS,
+        timeout=30.0,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
 
 
-async def process_mc_page_with_page(page: Page, url: str, category_hint: Optional[str] = None) -> Tuple[List[dict], Optional[Dict[str, str]]]:
+def _looks_like_bot_protection(status_code: int, html: str) -> bool:
+    if status_code in BOT_PROTECTION_STATUSES:
+        return True
+    lowered = html.lower()
+    # Слово "captcha" бывает и в формах обратной связи на обычной странице, поэтому смотрим только страницы без таблиц
+    return "<table" not in lowered and any(marker in lowered for marker in BOT_PROTECTION_MARKERS)
+
+
+def _decode_mc_body(body: bytes) -> str:
+    # Сайт mc.ru может отдавать контент в UTF-8, но с неверным meta-тегом charset=windows-1251.
+    # Чтобы избежать проблем с кодировкой, читаем сырые байты и принудительно декодируем как UTF-8.
+    return body.decode('utf-8', errors='replace')
+
+
+async def fetch_mc_html(client: httpx.AsyncClient, url: str) -> str:
     """
-    Загружает страницу Металлсервиса в переданный Playwright Page, парсит <tbody> с прайсом.
-    Возвращает список products и (пока) None для контактов.
+    Загружает страницу Металлсервиса обычным HTTP-запросом (таблицы на mc.ru статичны).
+    Бросает BotProtectionError, если вместо прайса пришла антибот-заглушка.
     """
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Используем 'domcontentloaded', т.к. таблицы статичны. Это быстрее и надежнее.
-            response = await page.goto(url, wait_until="domcontentloaded", timeout=5_000)
-            break  # Успех, выходим из цикла
-        except PlaywrightTimeoutError as e:
-            print(f"  - Таймаут при загрузке {url} (попытка {attempt + 1}/{max_retries}). Повторяю...")
-            if attempt + 1 == max_retries:
-                raise e  # Если все попытки провалились, пробрасываем исключение
-            await asyncio.sleep(5 * (attempt + 1))  # Ожидание перед повторной попыткой
+    response = await client.get(url)
+    html = _decode_mc_body(response.content)
+    if _looks_like_bot_protection(response.status_code, html):
+        raise BotProtectionError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    return html
+
 
+async def fetch_mc_html_with_page(page: Page, url: str) -> str:
+    """
+    Загружает страницу Металлсервиса в переданный Playwright Page и возвращает её HTML.
+    Используется, когда обычный HTTP-запрос упёрся в антибот-защиту.
+    """
+    # Используем 'domcontentloaded', т.к. таблицы статичны. Это быстрее и надежнее.
+    response = await retry_async(
+        lambda: page.goto(url, wait_until="domcontentloaded", timeout=5_000),
+        BROWSER_PAGE_RETRY,
+        retryable=lambda e: isinstance(e, PlaywrightTimeoutError),
+        label=url,
+    )
     if not response:
-        raise PlaywrightTimeoutError(f"Failed to get a response from {url} after {max_retries} retries.")
+        raise PlaywrightTimeoutError(f"Failed to get a response from {url}.")
+
+    return _decode_mc_body(await response.body())
+
+
+async def process_mc_page_with_page(page: Page, url: str, category_hint: Optional[str] = None) -> Tuple[List[ProductRecord], Optional[Dict[str, str]]]:
+    """Загружает страницу Металлсервиса в браузере (fetch_mc_html_with_page) и разбирает её (parse_mc_html)."""
+    html = await fetch_mc_html_with_page(page, url)
+    # Разбор — чистый CPU, уводим из event loop
+    return await asyncio.to_thread(parse_mc_html, html, category_hint)
+
+
+# Текст этих тегов BeautifulSoup.get_text не возвращал; вырезаем их заранее, чтобы itertext давал то же самое
+_NON_TEXT_TAGS = ("script", "style")
 
-    # Сайт mc.ru может отдавать контент в UTF-8, но с неверным meta-тегом charset=windows-1251.
-    # Чтобы избежать проблем с кодировкой, читаем сырые байты и принудительно декодируем как UTF-8.
-    body = await response.body()
-    html = body.decode('utf-8', errors='replace')
-    soup = BeautifulSoup(html, "lxml")
 
-    # Категория — из <th colspan> или из заголовка блока, можно взять первый <th colspan> в таблице
-    products: List[dict] = []
-    contacts: Optional[Dict[str, str]] = None
+def _cell_text(el) -> str:
+    return clean_text(" ".join(el.itertext()))
+
+
+def _table_headers(thead, rows: list) -> List[str]:
+    if thead is not None:
+        return [_cell_text(th) for th in thead.iterdescendants("th")]
+    # Иногда заголовок таблицы хранится во второй строке tbody (первая — название категории)
+    if len(rows) > 1 and rows[1].find(".//th") is not None:
+        return [_cell_text(th) for th in rows[1].iterdescendants("th")]
+    if len(rows) > 0 and rows[0].find(".//th") is not None:
+        return [_cell_text(th) for th in rows[0].iterdescendants("th")]
+    return []
+
+
+def iter_mc_html(html: str, category_hint: Optional[str] = None) -> Iterator[ProductRecord]:
+    """
+    Потоково отдаёт позиции из <tbody> всех таблиц страницы Металлсервиса.
+    Дерево строит парсер HTML из lxml; заголовки таблицы сопоставляются с COL_MAP один раз на таблицу.
+    """
+    if not html or not html.strip():
+        return
+    # Кодировку задаём явно: meta-тег на mc.ru врёт (windows-1251), а текст уже декодирован как UTF-8
+    root = etree.fromstring(html.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+    if root is None:
+        return
+    etree.strip_elements(root, *_NON_TEXT_TAGS, with_tail=False)
 
     # На страницах МС часто много секций таблиц. Берём все <table> и ищем в них thead/tbody.
-    for tbl in soup.find_all("table"):
-        thead = tbl.find("thead")
-        tbody = tbl.find("tbody")
-        if not tbody:
+    for tbl in root.iter("table"):
+        tbody = tbl.find(".//tbody")
+        if tbody is None:
             continue
+        thead = tbl.find(".//thead")
+        rows = list(tbody.iterdescendants("tr"))
 
-        # Заголовок категории — ближайший предыдущий <tr><th colspan>
+        # Категория — из единственного <th colspan> первой строки tbody, иначе из параметра вызова
         category = None
-        # иногда в tbody первой строкой идёт <tr><th colspan=...>НАЗВАНИЕ</th></tr>
-        first_row = tbody.find("tr")
-        if first_row:
-            ths = first_row.find_all("th")
+        if rows:
+            ths = rows[0].findall(".//th")
             if len(ths) == 1:
-                category = _clean_text(ths[0].get_text(" "))
-        if not category:
-            # Фолбэк: из параметра вызова
-            category = category_hint
-        
-        # Приводим категорию к единому виду
-        capitalized_category = capitalize_category(category)
-
-        # Построим карту колонок
-        headers = []
-        if thead:
-            for th in thead.find_all("th"):
-                headers.append(_clean_text(th.get_text(" ")))
-        else:
-            # Иногда заголовок таблицы хранится во второй строке tbody (первая — название категории)
-            rows = tbody.find_all("tr")
-            if len(rows) > 1 and rows[1].find_all("th"):
-                headers = [_clean_text(th.get_text(" ")) for th in rows[1].find_all("th")]
-            elif len(rows) > 0 and rows[0].find_all("th"):
-                headers = [_clean_text(th.get_text(" ")) for th in rows[0].find_all("th")]
+                category = _cell_text(ths[0])
+        capitalized_category = capitalize_category(category or category_hint)
 
+        headers = _table_headers(thead, rows)
         if not headers:
             continue
 
-        # Индексы полезных колонок
-        cols_norm = [h.lower() for h in headers]
+        # Поле для каждой колонки (None — колонка уходит в comments)
+        keys = [COL_MAP.get(h.lower()) for h in headers]
 
-        # Перебираем строки данных
-        for tr in tbody.find_all("tr"):
+        for tr in rows:
+            tds = list(tr.iterdescendants("td"))
             # пропустим строки, где только TH (заголовок/категория)
-            if tr.find("th") and not tr.find("td"):
-                continue
-
-            tds = tr.find_all("td")
             if not tds:
                 continue
 
-            row: dict = {
-                "category": capitalized_category,
-                "name": None,
-                "stamp": None,
-                "diameter": None,
-                "thickness": None,
-                "width": None,
-                "length": None,
-                "material": None,
-                "unit": None,
-                "price": None,
-                "comments": None,
-                "state_standard": None,
-            }
-
+            row = ProductRecord(category=capitalized_category)
+            diameter_text = None
             extras: Dict[str, str] = {}
 
             for idx, td in enumerate(tds):
-                val = _clean_text(td.get_text(" "))
-                hdr = cols_norm[idx] if idx < len(cols_norm) else f"col{idx}"
-                key = COL_MAP.get(hdr, None)
+                val = _cell_text(td)
+                key = keys[idx] if idx < len(keys) else None
 
                 if key == "price":
-                    row["price"] = _parse_price(val)
+                    row.price = parse_price(val)
                 elif key == "diameter":
-                    row["diameter"] = val
+                    diameter_text = val
                 elif key in {"thickness", "width", "length"}:
-                    row[key] = _parse_dimension(val)
+                    setattr(row, key, parse_float(val))
                 elif key in {"stamp", "name", "unit", "material", "state_standard"}:
-                    row[key] = val
-                else:
-                    if val:
-                        extras[headers[idx] if idx < len(headers) else f"col{idx}"] = val
+                    setattr(row, key, val)
+                elif val:
+                    extras[headers[idx] if idx < len(headers) else f"col{idx}"] = val
 
             # Если в строке нет явного наименования, используем категорию (название таблицы) как имя
-            if not row["name"]:
-                row["name"] = capitalized_category
+            if not row.name:
+                row.name = capitalized_category
 
             # Ищем ГОСТ/ТУ в наименовании, переносим в отдельное поле и очищаем наименование
-            if row.get("name") and isinstance(row["name"], str):
-                match = GOST_RE.search(row["name"])
+            if row.name and isinstance(row.name, str):
+                match = GOST_RE.search(row.name)
                 if match:
-                    gost_or_tu = match.group(1).strip()
-                    if not row.get("state_standard"):
-                        row["state_standard"] = gost_or_tu
-                    row["name"] = GOST_RE.sub("", row["name"]).strip()
+                    if not row.state_standard:
+                        row.state_standard = match.group(1).strip()
+                    row.name = GOST_RE.sub("", row.name).strip()
 
-            # Склей комментарий
             if extras:
-                row["comments"] = "; ".join(f"{k}: {v}" for k, v in extras.items())
+                row.comments = "; ".join(f"{k}: {v}" for k, v in extras.items())
+
+            # Если в ячейке диаметров было несколько значений — разнесём; копия записи нужна только в этом случае
+            diams = _split_diameters(diameter_text) if diameter_text else [None]
+            if len(diams) == 1:
+                row.diameter = parse_float(diams[0])
+                yield row
+            else:
+                for d in diams:
+                    yield replace(row, diameter=parse_float(d))
+
+
+def parse_mc_html(html: str, category_hint: Optional[str] = None) -> Tuple[List[ProductRecord], Optional[Dict[str, str]]]:
+    """
+    Парсит <tbody> с прайсом из HTML страницы Металлсервиса.
+    Возвращает список products и (пока) None для контактов.
+    """
+    return list(iter_mc_html(html, category_hint)), None
 
-            # Если в ячейке диаметров было несколько значений — разнесём
-            diams = _split_diameters(row["diameter"]) if row.get("diameter") else [None]
-            for d in diams:
-                new_row = dict(row)
-                new_row["diameter"] = _parse_dimension(d)
-                products.append(new_row)
 
-    return products, contacts
+def parse_mc_price(html: str) -> ParsedPrice:
+    """Страница Металлсервиса в общем формате реестра парсеров; позиции отдаются генератором."""
+    return ParsedPrice(iter_mc_html(html))
@@ -1,9 +1,16 @@
 # app/metallotorg_parser.py
+import functools
+import multiprocessing
+import os
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pdfplumber
 
+from app.parsers.common import ParsedPrice, ProductRecord, capitalize_category, clean_text, parse_float, parse_price
+
 # Регулярное выражение для ГОСТ/ТУ, как в других парсерах
 GOST_RE = re.compile(r"((?:ГОСТ|ТУ)\s*[\d.\-]+(?:-[\d]{2,4})?)", re.IGNORECASE)
 
@@ -24,141 +31,134 @@ KNOWN_CATEGORIES = sorted([
     'Шестигранник калибр', 'Шестигранник'
 ], key=len, reverse=True)
 
-def capitalize_category(s: Optional[str]) -> Optional[str]:
-    """Приводит строку к виду 'Первая заглавная, остальные строчные'."""
-    if not s or not isinstance(s, str):
-        return s
-    return s.strip().capitalize()
-
+# Мусорные слова в марке и строке ГОСТов
+JUNK_WORDS = [
+    'ЗГП', '2ГП', '3ГП', 'гп', 'ГП', 'АША', 'ММК', 'НЛМК', 'ОМЗ', 'УС', 'КТЗ',
+    'Алчевск', 'Алч', 'Северсталь', 'СеверСталь', 'Китай', 'Иран',
+    'ОГ', 'СА', 'МТ', 'УЗК', 'Д/О', 'Wi', 'сп5', 'р', 'с',
+    'в прутках', 'калиброванный', 'отож', 'оц', 'г/к', 'х/к', 'н/лег', 'рифл', 'ПВЛ',
+    'с просечкой', 'ЧАСТЬ', 'ПОЛОВИНА', 'Т/О', 'уценка', 'КЛАСС Покрытия 1'
+]
+# Удаляет мусорные слова, если перед ними не буква (т.е. начало строки, пробел, цифра, пунктуация)
+JUNK_RE = re.compile(r'(?<![a-zA-Zа-яА-Я])(' + '|'.join(re.escape(w) for w in JUNK_WORDS) + r')\b', re.IGNORECASE)
+# Блок стандартов начинается с префикса (ГОСТ, ТУ) или с паттерна "число-число"
+GOST_BLOCK_RE = re.compile(r'\b((?:ГОСТ|ТУ|ТС|ОСТ)|(?:\d{2,}-\d{2,}))', re.IGNORECASE)
+EDGE_PUNCT_RE = re.compile(r'^[,\-~./\s_()\[\]]+|[,\-~./\s_()\[\]]+$')
+MULTI_SPACE_RE = re.compile(r'\s{2,}')
+SLASH_RE = re.compile(r'\s*/\s*')
+LETTER_RE = re.compile(r'[a-zA-Zа-яА-Я]')
+
+
+class CategoryTrie:
+    """Префиксное дерево категорий: самая длинная категория в начале строки за один проход по символам."""
+
+    def __init__(self, categories: List[str]):
+        self._root: Dict[str, Any] = {}
+        for cat in categories:
+            node = self._root
+            for ch in cat.lower():
+                node = node.setdefault(ch, {})
+            node[None] = len(cat)
+
+    def longest_prefix(self, text: str) -> Optional[int]:
+        """Длина самой длинной известной категории, с которой начинается text (без учёта регистра)."""
+        node = self._root
+        found = None
+        for ch in text.lower():
+            node = node.get(ch)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+class NameClassifier:
+    """
+    Разбор ячейки "Наименование" на полное имя, категорию, марку и ГОСТ.
+    Категории ищутся по префиксному дереву, регулярные выражения собраны заранее,
+    а результаты запоминаются в LRU-кэше: в прайсе много строк с одинаковым наименованием.
+    """
 
-def _parse_float(s: Optional[str]) -> Optional[float]:
-    """Преобразует строку в float, очищая и заменяя запятую на точку."""
-    if not s:
-        return None
-    s = str(s).replace(",", ".").strip()
-    try:
-        return float(s)
-    except (ValueError, TypeError):
-        return None
+    def __init__(self, categories: List[str], cache_size: int = 8192):
+        self._trie = CategoryTrie(categories)
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def _clean_part(s: str) -> str:
+        s = JUNK_RE.sub('', s)
+        s = EDGE_PUNCT_RE.sub('', s)
+        return MULTI_SPACE_RE.sub(' ', s).strip()
+
+    def _classify(self, name_cell: str) -> Tuple[str, str, Optional[str], Optional[str]]:
+        """
+        Логика:
+        1. Категория определяется по списку известных категорий в начале строки.
+        2. ГОСТ/ТУ/ТС ищутся по регулярному выражению.
+        3. Марка - это всё, что осталось после удаления категории и ГОСТов.
+        """
+        if not name_cell:
+            return "", "", None, None
+
+        full_name = clean_text(name_cell).replace('ё', 'е')
+
+        # 1. Категория; регистр сохраняем из исходной строки
+        cat_len = self._trie.longest_prefix(full_name)
+        if cat_len:
+            category = full_name[:cat_len]
+            details_string = full_name[cat_len:].strip()
+        else:
+            # Fallback: если не нашли категорию в списке, берем первое слово.
+            parts = full_name.split(maxsplit=1)
+            category = parts[0]
+            details_string = parts[1] if len(parts) > 1 else ""
 
+        # 2. Точка раздела между маркой и блоком стандартов
+        stamp_string = details_string
+        gost_string = None
+        gost_block_start_match = GOST_BLOCK_RE.search(details_string)
+        if gost_block_start_match:
+            split_point = gost_block_start_match.start()
+            stamp_string = details_string[:split_point].strip()
+            gost_string = details_string[split_point:].strip()
 
-def _parse_price(s: Optional[str]) -> Optional[float]:
-    """Извлекает числовое значение цены из строки."""
-    if not s:
-        return None
-    s = str(s).replace(" ", "").replace("\u00a0", "")
-    m = re.search(r"(\d+(?:[.,]\d+)?)", s)
-    if not m:
-        return None
-    return float(m.group(1).replace(",", "."))
+        # 3. Очищаем марку и строку ГОСТов от "мусора"
+        cleaned_stamp = self._clean_part(stamp_string)
+        if cleaned_stamp:
+            cleaned_stamp = SLASH_RE.sub('/', cleaned_stamp)
+        stamp = cleaned_stamp if cleaned_stamp else None
 
+        cleaned_gost = self._clean_part(gost_string) if gost_string else gost_string
+        gost = cleaned_gost if cleaned_gost else None
 
-def _clean_text(s: Optional[str]) -> str:
-    """Очищает строку от лишних пробелов и переносов."""
-    if not s:
-        return ""
-    return re.sub(r"\s+", " ", s).strip()
+        # 4. Если марка не содержит букв (напр. "100*100" для сетки), считаем ее частью категории
+        if stamp and not LETTER_RE.search(stamp):
+            category = f"{category} {stamp}".strip()
+            stamp = None
 
+        return full_name, capitalize_category(category), stamp, gost
 
-def _parse_name_and_category(name_cell: str) -> Tuple[str, str, Optional[str], Optional[str]]:
-    """
-    Извлекает из ячейки "Наименование" полное имя, категорию, марку и ГОСТ.
-    Логика:
-    1. Категория определяется по списку известных категорий в начале строки.
-    2. ГОСТ/ТУ/ТС ищутся по регулярному выражению.
-    3. Марка - это всё, что осталось после удаления категории и ГОСТов.
-    """
-    if not name_cell:
-        return "", "", None, None
 
-    full_name = _clean_text(name_cell).replace('ё', 'е')
+NAME_CLASSIFIER = NameClassifier(KNOWN_CATEGORIES)
 
-    # 1. Extract Category
-    category = None
-    details_string = full_name
 
-    for cat in KNOWN_CATEGORIES:
-        if full_name.lower().startswith(cat.lower()):
-            # Найдена известная категория. Берем ее и остаток строки.
-            # Сохраняем регистр из исходной строки.
-            category = full_name[:len(cat)]
-            details_string = full_name[len(cat):].strip()
-            break
-
-    if not category:
-        # Fallback: если не нашли категорию в списке, берем первое слово.
-        parts = full_name.split(maxsplit=1)
-        category = parts[0]
-        details_string = parts[1] if len(parts) > 1 else ""
-
-    # 2. Ищем точку раздела между маркой и блоком стандартов
-    # Блок стандартов может начинаться с префикса (ГОСТ, ТУ) или с паттерна "число-число"
-    gost_block_start_match = re.search(
-        r'\b((?:ГОСТ|ТУ|ТС|ОСТ)|(?:\d{2,}-\d{2,}))',
-        details_string,
-        re.IGNORECASE
-    )
-
-    stamp_string = details_string
-    gost_string = None
-
-    if gost_block_start_match:
-        split_point = gost_block_start_match.start()
-        stamp_string = details_string[:split_point].strip()
-        gost_string = details_string[split_point:].strip()
-
-    # 3. Очищаем марку и строку ГОСТов от "мусора"
-    JUNK_WORDS = [
-        'ЗГП', '2ГП', '3ГП', 'гп', 'ГП', 'АША', 'ММК', 'НЛМК', 'ОМЗ', 'УС', 'КТЗ',
-        'Алчевск', 'Алч', 'Северсталь', 'СеверСталь', 'Китай', 'Иран',
-        'ОГ', 'СА', 'МТ', 'УЗК', 'Д/О', 'Wi', 'сп5', 'р', 'с',
-        'в прутках', 'калиброванный', 'отож', 'оц', 'г/к', 'х/к', 'н/лег', 'рифл', 'ПВЛ',
-        'с просечкой', 'ЧАСТЬ', 'ПОЛОВИНА', 'Т/О', 'уценка', 'КЛАСС Покрытия 1'
-    ]
-    # Этот regex удаляет мусорные слова, если перед ними не буква (т.е. начало строки, пробел, цифра, пунктуация)
-    junk_re = r'(?<![a-zA-Zа-яА-Я])(' + '|'.join(re.escape(w) for w in JUNK_WORDS) + r')\b'
-
-
-    # --- Очистка марки ---
-    cleaned_stamp = re.sub(junk_re, '', stamp_string, flags=re.IGNORECASE)
-    cleaned_stamp = re.sub(r'^[,\-~./\s_()\[\]]+|[,\-~./\s_()\[\]]+$', '', cleaned_stamp)
-    cleaned_stamp = re.sub(r'\s{2,}', ' ', cleaned_stamp).strip()
-    if cleaned_stamp:
-        cleaned_stamp = re.sub(r'\s*/\s*', '/', cleaned_stamp)
-
-    stamp = cleaned_stamp if cleaned_stamp else None
-
-    # --- Очистка ГОСТа ---
-    cleaned_gost = gost_string
-    if cleaned_gost:
-        cleaned_gost = re.sub(junk_re, '', cleaned_gost, flags=re.IGNORECASE)
-        cleaned_gost = re.sub(r'^[,\-~./\s_()\[\]]+|[,\-~./\s_()\[\]]+$', '', cleaned_gost)
-        cleaned_gost = re.sub(r'\s{2,}', ' ', cleaned_gost).strip()
-
-    gost = cleaned_gost if cleaned_gost else None
-
-    # 4. Пост-обработка для особых случаев
-    # Если марка не содержит букв (напр. "100*100" для сетки), считаем ее частью категории
-    if stamp and not re.search(r'[a-zA-Zа-яА-Я]', stamp):
-        category = f"{category} {stamp}".strip()
-        stamp = None
-
-    return full_name, capitalize_category(category), stamp, gost
+def _parse_name_and_category(name_cell: str) -> Tuple[str, str, Optional[str], Optional[str]]:
+    """Извлекает из ячейки "Наименование" полное имя, категорию, марку и ГОСТ (см. NameClassifier)."""
+    return NAME_CLASSIFIER.classify(name_cell)
 
 
 def _parse_dimensions(size_cell: str, len_cell: str, category: Optional[str]) -> Dict[str, Any]:
     """Извлекает размеры из соответствующих колонок."""
     d: Dict[str, Any] = {"diameter": None, "thickness": None, "width": None, "length": None, "comments": []}
 
-    size_cell = _clean_text(size_cell)
-    len_cell = _clean_text(len_cell)
+    size_cell = clean_text(size_cell)
+    len_cell = clean_text(len_cell)
 
     # --- Обработка колонки "Размер" ---
     if size_cell:
         if "*" in size_cell or "х" in size_cell:
             d["comments"].append(f"Размер: {size_cell}")
         else:
-            val = _parse_float(size_cell)
+            val = parse_float(size_cell)
             if val:
                 # Эвристика для определения, диаметр это или толщина
                 is_round = category and any(k in category.lower() for k in ["круг", "труба", "проволока", "катанка", "арматура"])
@@ -175,8 +175,8 @@ def _parse_dimensions(size_cell: str, len_cell: str, category: Optional[str]) ->
         elif "*" in len_cell or "х" in len_cell:
             dims = re.findall(r"(\d+(?:[.,]\d+)?)", len_cell)
             if len(dims) >= 2:
-                w = _parse_float(dims[0])
-                l = _parse_float(dims[1])
+                w = parse_float(dims[0])
+                l = parse_float(dims[1])
                 d["width"] = w / 1000 if w and w > 100 else w
                 d["length"] = l / 1000 if l and l > 100 else l
             else:
@@ -184,10 +184,10 @@ def _parse_dimensions(size_cell: str, len_cell: str, category: Optional[str]) ->
         elif "м+нд" in len_cell_lower:
             m = re.match(r"(\d+(?:[.,]\d+)?)", len_cell)
             if m:
-                d["length"] = _parse_float(m.group(1))
+                d["length"] = parse_float(m.group(1))
         else:
             cleaned_len = re.sub(r'[^\d,.]', '', len_cell)
-            length_val = _parse_float(cleaned_len)
+            length_val = parse_float(cleaned_len)
             if length_val:
                 d["length"] = length_val
             elif len_cell.strip():
@@ -197,72 +197,148 @@ def _parse_dimensions(size_cell: str, len_cell: str, category: Optional[str]) ->
     return d
 
 
-def parse_metallotorg_pdf(file_path: str) -> List[Dict[str, Any]]:
+# Страниц на одну задачу пула: каждый процесс открывает PDF заново, поэтому страницы раздаются пачками
+PAGES_PER_TASK = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Общий на все города пул процессов для extract_table (создаётся при первом обращении)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, а не fork: парсер вызывается из потоков работающего event loop
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    """Останавливает пул процессов разбора PDF (в конце прогона парсеров)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _extract_tables(file_path: str, page_numbers: List[int]) -> List[Optional[List[List[Optional[str]]]]]:
+    """Таблицы указанных страниц, по одному extract_table() на страницу. Выполняется в процессе пула."""
+    with pdfplumber.open(file_path) as pdf:
+        return [pdf.pages[n].extract_table() for n in page_numbers]
+
+
+def _iter_page_tables(file_path: str, workers: Optional[int]) -> Iterator[Optional[List[List[Optional[str]]]]]:
+    """Таблицы всех страниц в порядке страниц; при workers != 0 страницы разбираются в пуле процессов."""
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        if workers == 0 or page_count <= PAGES_PER_TASK:
+            for page in pdf.pages:
+                yield page.extract_table()
+            return
+
+    chunks = [list(range(start, min(start + PAGES_PER_TASK, page_count))) for start in range(0, page_count, PAGES_PER_TASK)]
+    if workers is None:
+        pool, own_pool = _get_pool(), False
+    else:
+        pool, own_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")), True
+    futures = [pool.submit(_extract_tables, file_path, chunk) for chunk in chunks]
+    try:
+        # Забираем результаты по порядку страниц, остальные пачки тем временем считаются
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+
+
+def _find_header_indexes(table: List[List[Optional[str]]]) -> Optional[Tuple[int, int, int, int]]:
+    """Индексы колонок (наименование, размер, длина, цена 1-5 т) по строке заголовка таблицы."""
+    for row in table:
+        if row and row[0] and "Наименование" in row[0]:
+            header = [clean_text(cell) for cell in row]
+            try:
+                return (
+                    header.index("Наименование"),
+                    header.index("Размер"),
+                    header.index("Длина"),
+                    next(i for i, col in enumerate(header) if "Цена" in col and "1-5" in col),
+                )
+            except (ValueError, StopIteration):
+                return None
+    return None
+
+
+def _table_products(table: List[List[Optional[str]]], indexes: Tuple[int, int, int, int]) -> Iterator[ProductRecord]:
+    """Позиции одной страницы; строки до заголовка (если он есть на странице) пропускаются."""
+    name_idx, size_idx, len_idx, price_idx = indexes
+    start_row = 0
+    for i, row in enumerate(table):
+        if row and row[0] and "Наименование" in row[0]:
+            start_row = i + 1
+            break
+
+    for row_data in table[start_row:]:
+        if not row_data or len(row_data) <= max(indexes):
+            continue
+
+        name_cell = row_data[name_idx]
+        if not name_cell or "---" in name_cell:
+            continue
+
+        full_name, category, stamp, gost = _parse_name_and_category(name_cell)
+        dims = _parse_dimensions(row_data[size_idx], row_data[len_idx], category)
+
+        yield ProductRecord(
+            name=full_name, category=category, stamp=stamp, state_standard=gost,
+            price=parse_price(row_data[price_idx]), unit="т",
+            **dims
+        )
+
+
+def iter_metallotorg_pdf(file_path: str, workers: Optional[int] = None) -> Iterator[ProductRecord]:
+    """
+    Потоково отдаёт позиции PDF-прайса Металлоторга в порядке страниц.
+    Каждая страница извлекается один раз (extract_table — основная стоимость), страницы раздаются
+    по процессам общего пула. workers=0 — всё в текущем процессе, число — отдельный пул такого размера.
+    Заголовок берётся с первой страницы, где он распознаётся; страницы до неё ждут его в буфере.
+    """
+    indexes = None
+    waiting: List[List[List[Optional[str]]]] = []
+
+    for table in _iter_page_tables(file_path, workers):
+        if not table:
+            continue
+        if indexes is None:
+            waiting.append(table)
+            indexes = _find_header_indexes(table)
+            if indexes is None:
+                continue
+            for pending in waiting:
+                yield from _table_products(pending, indexes)
+            waiting = []
+            continue
+        yield from _table_products(table, indexes)
+
+    if indexes is None:
+        print(f"Не удалось найти заголовок таблицы в файле {file_path}")
+
+
+def parse_metallotorg_pdf(file_path: str) -> List[ProductRecord]:
     """Основная функция для парсинга PDF-файла от Металлоторга."""
     products = []
     try:
-        with pdfplumber.open(file_path) as pdf:
-            header = None
-            name_idx, size_idx, len_idx, price_idx = -1, -1, -1, -1
-
-            # 1. Найти заголовок на первой подходящей странице
-            for page in pdf.pages:
-                table = page.extract_table()
-                if not table:
-                    continue
-
-                header_row_index = -1
-                for i, row in enumerate(table):
-                    if row and row[0] and "Наименование" in row[0]:
-                        header = [_clean_text(cell) for cell in row]
-                        header_row_index = i
-                        break
-                
-                if header:
-                    try:
-                        name_idx = header.index("Наименование")
-                        size_idx = header.index("Размер")
-                        len_idx = header.index("Длина")
-                        price_idx = next(i for i, col in enumerate(header) if "Цена" in col and "1-5" in col)
-                        break
-                    except (ValueError, StopIteration):
-                        header = None
-                        continue
-            
-            if not header:
-                print(f"Не удалось найти заголовок таблицы в файле {file_path}")
-                return []
-
-            # 2. Обработать все страницы, используя найденный заголовок
-            for page in pdf.pages:
-                table = page.extract_table()
-                if not table:
-                    continue
-
-                start_row = 0
-                for i, row in enumerate(table):
-                    if row and row[0] and "Наименование" in row[0]:
-                        start_row = i + 1
-                        break
-
-                for row_data in table[start_row:]:
-                    if not row_data or len(row_data) <= max(name_idx, size_idx, len_idx, price_idx):
-                        continue
-
-                    name_cell = row_data[name_idx]
-                    if not name_cell or "---" in name_cell:
-                        continue
-
-                    full_name, category, stamp, gost = _parse_name_and_category(name_cell)
-                    dims = _parse_dimensions(row_data[size_idx], row_data[len_idx], category)
-
-                    product = {
-                        "name": full_name, "category": category, "stamp": stamp, "state_standard": gost,
-                        "price": _parse_price(row_data[price_idx]), "unit": "т",
-                        **dims
-                    }
-                    products.append(product)
+        for product in iter_metallotorg_pdf(file_path):
+            products.append(product)
     except Exception as e:
         print(f"Ошибка при обработке PDF файла {file_path}: {e}")
 
-    return products
\ No newline at end of file
+    return products
+
+
+def parse_metallotorg_price(file_path: str) -> ParsedPrice:
+    """PDF-прайс Металлоторга в общем формате реестра парсеров; контактов в прайсе нет."""
+    return ParsedPrice(parse_metallotorg_pdf(file_path))
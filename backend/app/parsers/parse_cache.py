@@ -0,0 +1,116 @@
+# app/parsers/parse_cache.py
+import functools
+import glob
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+from app.parsers.common import PRODUCT_FIELDS, ParsedPrice, ProductRecord
+
+PARSE_CACHE_DIR = os.path.join("downloads", "parsed")
+
+
+@functools.lru_cache(maxsize=None)
+def _source_version(source_file: str) -> str:
+    with open(source_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+# Общие помощники разбора (parse_price, clean_text, to_float и т.п.), которые входят в версию любого парсера
+COMMON_MODULE = "app.parsers.common"
+
+
+def parser_version(parse_func: Callable) -> str:
+    """
+    Версия парсера — хэш исходников модуля, где он объявлен, и общих помощников (app/parsers/common.py).
+    Правка кода парсера или помощников меняет версию, и старые результаты перестают находиться в кэше;
+    правки остальных модулей пакета (загрузка, пулы, выключатели) кэш не сбрасывают.
+    """
+    digest = hashlib.sha256()
+    for name in sorted({parse_func.__module__, COMMON_MODULE}):
+        digest.update(f"{name}:{_source_version(inspect.getsourcefile(sys.modules[name]))}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_columns(records: List[ProductRecord]) -> Dict[str, list]:
+    return {name: [getattr(r, name) for r in records] for name in PRODUCT_FIELDS}
+
+
+def _from_columns(columns: Dict[str, list]) -> List[ProductRecord]:
+    return [ProductRecord(*values) for values in zip(*(columns[name] for name in PRODUCT_FIELDS))]
+
+
+def _json_default(value: Any):
+    # numpy-скаляры и прочие числа из pandas
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def cached_parse(
+    parse_func: Callable[[str], ParsedPrice],
+    file_path: str,
+    *,
+    sha256: Optional[str] = None,
+    cache_dir: str = PARSE_CACHE_DIR,
+) -> ParsedPrice:
+    """
+    Вызывает parse_func(file_path) (парсер из реестра app/parsers/registry.py) или возвращает сохранённый
+    результат для файла с тем же содержимым и той же версией парсера. Позиции в ответе всегда списком.
+    Результат хранится компактно по колонкам в {имя}-{версия}-{sha256}.json.gz; пустые результаты не кэшируются.
+    """
+    name = parse_func.__name__
+    version = parser_version(parse_func)
+    sha256 = sha256 or file_sha256(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{name}-{version}-{sha256}.json.gz")
+
+    try:
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        records = _from_columns(payload["columns"])
+        print(f"  - Результат разбора {os.path.basename(file_path)} взят из кэша ({len(records)} позиций).")
+        return ParsedPrice(records, payload["contacts"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    result = parse_func(file_path).materialize()
+    if not result.records:
+        return result
+
+    # Свой временный файл у каждого писателя: один и тот же прайс могут разбирать несколько городов сразу
+    with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=f"{name}-", suffix=".tmp", delete=False) as tmp:
+        tmp_path = tmp.name
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(
+                    {"contacts": result.contacts, "columns": _to_columns(result.records)},
+                    f, ensure_ascii=False, default=_json_default,
+                )
+        except BaseException:
+            tmp.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, cache_path)
+
+    # Результаты прошлых версий этого парсера больше не понадобятся
+    for stale in glob.glob(os.path.join(cache_dir, f"{name}-*.json.gz")):
+        if not os.path.basename(stale).startswith(f"{name}-{version}-"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return result
@@ -1,7 +1,15 @@
 import os
+import time
+from typing import Optional
+
 from playwright.async_api import Page, TimeoutError as PWTimeout
 
+from app.parsers.browser_pool import BrowserPoolMetrics
+from app.parsers.resilience import RetryPolicy, retry_async
+
 DOWNLOADS_DIR = "downloads"
+# Повторы клика по кнопке скачивания на уже открытой странице
+CLICK_RETRY = RetryPolicy(attempts=3, base_delay=2.0)
 
 
 async def select_moscow_if_needed(page: Page) -> None:
@@ -18,21 +26,31 @@ async def select_moscow_if_needed(page: Page) -> None:
         moscow_link = page.locator("a.evraz-location-city", has_text="Москва и МО").first
         await moscow_link.wait_for(state="visible", timeout=10_000)
         await moscow_link.click()
-        # дождаться перезагрузки
-        await page.wait_for_load_state("load")
+        # дождаться перезагрузки (картинки и счётчики заблокированы пулом, DOM достаточно)
+        await page.wait_for_load_state("domcontentloaded")
         await page.wait_for_timeout(1000)
     except Exception:
         # best-effort: если нет модалки — тихо продолжаем
         pass
 
 
-async def download_pricelist(page, city_code):
+async def download_pricelist(page, city_code, metrics: Optional[BrowserPoolMetrics] = None):
     """
     ТВОЙ «правильный» алгоритм:
       - ждём именно a.js-download--total-xlsx (visible)
       - кликаем с expect_download()
       - сохраняем файл как {city_code}_{suggested_filename}
+    Время от начала ожидания кнопки до сохранения файла пишется в metrics.
     """
+    started = time.perf_counter()
+    try:
+        return await _download_pricelist(page, city_code)
+    finally:
+        if metrics is not None:
+            metrics.record_download_wait(time.perf_counter() - started)
+
+
+async def _download_pricelist(page, city_code):
     download_button_selector = "a.js-download--total-xlsx"
     os.makedirs(DOWNLOADS_DIR, exist_ok=True)
 
@@ -41,27 +59,23 @@ async def download_pricelist(page, city_code):
     # Уменьшаем таймаут ожидания кнопки, чтобы быстрее падать, если ее нет
     await download_button.wait_for(state="visible", timeout=30_000)
 
-    # --- Новая логика с несколькими попытками клика ---
-    max_click_attempts = 3
-    for attempt in range(max_click_attempts):
-        print(f"  - Попытка скачивания файла {attempt + 1}/{max_click_attempts}...")
-        try:
-            # Уменьшаем таймаут ожидания самого скачивания
-            async with page.expect_download(timeout=45_000) as download_info:
-                # Кликаем с небольшим таймаутом на сам клик
-                await download_button.click(force=True, timeout=5_000)
+    async def click_and_save():
+        # Уменьшаем таймаут ожидания самого скачивания
+        async with page.expect_download(timeout=45_000) as download_info:
+            # Кликаем с небольшим таймаутом на сам клик
+            await download_button.click(force=True, timeout=5_000)
 
-            download = await download_info.value
-            suggested_filename = download.suggested_filename or "pricelist.xlsx"
-            file_path = os.path.join(DOWNLOADS_DIR, f"{city_code}_{suggested_filename}")
-            await download.save_as(file_path)
-            print(f"  - Файл успешно скачан и сохранен как: {file_path}")
-            return file_path  # Успех, выходим из функции
+        download = await download_info.value
+        suggested_filename = download.suggested_filename or "pricelist.xlsx"
+        file_path = os.path.join(DOWNLOADS_DIR, f"{city_code}_{suggested_filename}")
+        await download.save_as(file_path)
+        print(f"  - Файл успешно скачан и сохранен как: {file_path}")
+        return file_path
 
-        except PWTimeout:
-            print(f"    - Таймаут на попытке {attempt + 1}. Повторяю...")
-            if attempt + 1 < max_click_attempts:
-                await page.wait_for_timeout(2000)  # Небольшая пауза перед повторной попыткой
-            else:
-                print("  - Не удалось скачать файл после нескольких попыток клика.")
-                raise  # Пробрасываем исключение, чтобы сработал внешний retry для всего города
+    # После последнего таймаута исключение уходит выше: там повтор всего города и выключатель хоста
+    return await retry_async(
+        click_and_save,
+        CLICK_RETRY,
+        retryable=lambda e: isinstance(e, PWTimeout),
+        label="Скачивание прайса",
+    )
@@ -0,0 +1,83 @@
+# app/parsers/registry.py
+"""
+Реестр парсеров поставщиков. Каждый поставщик объявляет, откуда брать прайс (FetchStrategy),
+какие города/ссылки обходить и чем разбирать полученное — функцией, которая отдаёт ParsedPrice
+с позициями ProductRecord. Планирование, кэш разбора, повторы и загрузка в green-таблицы
+для всех поставщиков общие (run_parsers.py), новому поставщику достаточно записи в app/parsers/suppliers.py.
+"""
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from playwright.async_api import Page
+
+from app.parsers.common import LENGTH_UNIT_M, ParsedPrice
+
+
+class FetchStrategy(str, Enum):
+    # Страница в Playwright и кнопка скачивания прайса; файл временный
+    BROWSER_DOWNLOAD = "browser_download"
+    # Файл по прямой ссылке через кэш загрузок (ETag/Last-Modified): неизменившийся прайс не разбирается
+    HTTP_FILE = "http_file"
+    # HTML-страницы по HTTP/2, браузер — только для страниц за антибот-защитой
+    HTTP_PAGES = "http_pages"
+
+
+@dataclass(frozen=True)
+class Target:
+    """Одна задача поставщика: город и ссылки, из которых собирается его прайс."""
+    city: str
+    urls: Tuple[str, ...]
+    key: str  # короткий код для имён скачанных файлов
+
+
+@dataclass(frozen=True)
+class SupplierParser:
+    supplier: str
+    key: str  # латинский код поставщика (каталог фикстур в scripts/fixtures)
+    fetch: FetchStrategy
+    # Путь к файлу (BROWSER_DOWNLOAD, HTTP_FILE) или HTML страницы (HTTP_PAGES) -> ParsedPrice.
+    # Функция должна быть объявлена в модуле парсера: по его исходнику и app/parsers/common.py
+    # считается версия для кэша разбора.
+    parse: Callable[[str], ParsedPrice]
+    targets: Tuple[Target, ...]
+    # Сколько городов поставщика обрабатывается одновременно (вкладок браузера / скачиваний)
+    concurrency: int = 1
+    # Попыток на задачу города целиком
+    attempts: int = 1
+    # Ссылки цели независимы: ошибка одной не отменяет остальные (страницы МС)
+    skip_failed_sources: bool = False
+    # Действия на вкладке до перехода по ссылке (BROWSER_DOWNLOAD), например выбор региона
+    prepare: Optional[Callable[[Page, Target], Awaitable[None]]] = None
+    # Параметры BrowserPool поставщика (BROWSER_DOWNLOAD, HTTP_PAGES)
+    browser: Dict[str, Any] = field(default_factory=dict)
+    # Не чаще стольких запросов в секунду ко всем сайтам поставщика вместе (app/parsers/resilience.py)
+    rate_limit: Optional[float] = None
+    # В чём парсер отдаёт длину и ширину (LENGTH_UNIT_M / LENGTH_UNIT_MM); при загрузке переводятся в метры
+    length_unit: str = LENGTH_UNIT_M
+
+    @property
+    def uses_browser(self) -> bool:
+        return self.fetch in (FetchStrategy.BROWSER_DOWNLOAD, FetchStrategy.HTTP_PAGES)
+
+
+_REGISTRY: Dict[str, SupplierParser] = {}
+
+
+def register(parser: SupplierParser) -> SupplierParser:
+    if parser.supplier in _REGISTRY:
+        raise ValueError(f"Парсер поставщика '{parser.supplier}' уже зарегистрирован")
+    _REGISTRY[parser.supplier] = parser
+    return parser
+
+
+def get_parser(supplier: str) -> SupplierParser:
+    try:
+        return _REGISTRY[supplier]
+    except KeyError:
+        raise KeyError(f"Нет парсера для поставщика '{supplier}'") from None
+
+
+def registered_parsers() -> List[SupplierParser]:
+    """Все зарегистрированные парсеры в порядке регистрации."""
+    return list(_REGISTRY.values())
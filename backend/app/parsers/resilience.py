@@ -0,0 +1,211 @@
+# app/parsers/resilience.py
+"""
+Повторы и защита от недоступных сайтов поставщиков, общие для всех способов загрузки.
+
+- RetryPolicy / retry_async: экспоненциальная пауза между попытками со случайным разбросом,
+  чтобы параллельные города не били в сайт одновременно.
+- CircuitBreaker: после нескольких подряд сетевых ошибок сайт поставщика считается лежащим, и следующие
+  запросы к нему сразу падают CircuitOpenError, а не ждут свои таймауты; через reset_timeout
+  пропускается одна пробная попытка.
+- RateLimiter: не чаще rate запросов в секунду к поставщику.
+- Resilience: всё вместе по поставщикам (ключ реестра парсеров), через него идут загрузки в run_parsers.py.
+  Ключ — поставщик, а не хост: у ЕВРАЗа свой поддомен на каждый город, и по хосту выключатель
+  не набрал бы порог ни на одном из них.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+T = TypeVar("T")
+
+# Ответы, после которых имеет смысл повторить запрос позже
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Сайт поставщика недоступен: запрос не отправлялся."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 1.0  # пауза перед второй попыткой, дальше растёт в multiplier раз
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Пауза после неудачной попытки номер attempt (с нуля): половина фиксирована, половина случайна."""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+# Одна попытка: повторы делает внешний уровень (например, задача города целиком)
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Сетевые ошибки, таймауты и 5xx/429; ответы 4xx повторять бесполезно."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in TRANSIENT_STATUSES
+    return isinstance(exc, (httpx.TransportError, PlaywrightTimeoutError, asyncio.TimeoutError))
+
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    *,
+    retryable: Callable[[BaseException], bool] = is_transient,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    label: str = "",
+) -> T:
+    """
+    Вызывает func до policy.attempts раз. Повторяются только ошибки, для которых retryable() истинно;
+    CircuitOpenError не повторяется никогда. on_retry(attempt, exc, delay) — перед каждой паузой.
+    """
+    for attempt in range(policy.attempts):
+        try:
+            return await func()
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or not retryable(e) or attempt + 1 >= policy.attempts:
+                raise
+            delay = policy.delay(attempt)
+            print(f"  - {label or 'Запрос'}: ошибка на попытке {attempt + 1}/{policy.attempts} ({e}), "
+                  f"повтор через {delay:.1f} c")
+            if on_retry:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+    raise RuntimeError("retry_async: policy.attempts должно быть больше нуля")
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold подряд сетевых ошибок поставщика."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 120.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.rejected = 0  # сколько запросов отбито без обращения к сайту
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self) -> bool:
+        """Пропускает попытку или бросает CircuitOpenError. True — это пробная попытка после паузы."""
+        if self._opened_at is None:
+            return False
+        if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} недоступен ({self.failures} ошибок подряд), запрос не отправлен")
+        # Время вышло: пропускаем одну пробную попытку, остальные ждут её исхода
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                print(f"!!! {self.name}: {self.failures} ошибок подряд, запросы к поставщику временно не отправляются")
+            self._opened_at = time.monotonic()
+
+    def after_call(self, probe: bool) -> None:
+        """
+        Конец попытки, прошедшей before_call, при любом исходе — в том числе при отмене (CancelledError).
+        Пробная попытка заканчивается вместе с ней, иначе выключатель отбивал бы запросы до перезапуска.
+        """
+        if probe:
+            self._probing = False
+
+
+class RateLimiter:
+    """Равномерно разносит начала запросов: не чаще rate в секунду."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Resilience:
+    """Выключатели и ограничители по поставщикам одного запуска."""
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    def set_rate_limit(self, key: str, rate: Optional[float]) -> None:
+        if rate:
+            self._limiters[key] = RateLimiter(rate)
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(key, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    async def call(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[T]],
+        policy: RetryPolicy = NO_RETRY,
+        *,
+        retryable: Callable[[BaseException], bool] = is_transient,
+        on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    ) -> T:
+        """
+        func — одно обращение к сайту поставщика key. Каждая попытка проходит его выключатель и ограничитель;
+        сетевые ошибки (retryable) считаются выключателем, остальные означают, что сайт ответил.
+        """
+        breaker = self.breaker(key)
+        limiter = self._limiters.get(key)
+
+        async def attempt() -> T:
+            probe = breaker.before_call()
+            try:
+                if limiter:
+                    await limiter.acquire()
+                try:
+                    result = await func()
+                except Exception as e:
+                    if retryable(e):
+                        breaker.record_failure()
+                    else:
+                        # Сайт ответил (404, антибот-заглушка): для выключателя это успех
+                        breaker.record_success()
+                    raise
+                breaker.record_success()
+                return result
+            finally:
+                breaker.after_call(probe)
+
+        return await retry_async(attempt, policy, retryable=retryable, on_retry=on_retry, label=key)
+
+    def report(self) -> None:
+        """Печатает поставщиков, на которых срабатывал выключатель."""
+        tripped = [b for b in self._breakers.values() if b.is_open or b.rejected]
+        if not tripped:
+            return
+        print("Недоступные поставщики:")
+        for b in tripped:
+            state = "недоступен" if b.is_open else "восстановился"
+            print(f"  {b.name}: {state}, отбито запросов без обращения к сайту: {b.rejected}")
@@ -0,0 +1,82 @@
+# app/parsers/scheduler.py
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class JobResult:
+    """Итог одной задачи парсинга (поставщик, город)."""
+    supplier: str
+    city: str
+    ok: bool
+    elapsed: float
+    rows: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class _Job:
+    supplier: str
+    city: str
+    factory: Callable[[], Awaitable[Optional[int]]]
+
+
+class CityScheduler:
+    """
+    Запускает задачи по городам одновременно.
+    Для каждого поставщика свой лимит параллельных задач (asyncio.Semaphore),
+    чтобы не положить сайт поставщика и не упереться в память браузера.
+    """
+
+    def __init__(self, limits: Dict[str, int], default_limit: int = 1):
+        self._limits = dict(limits)
+        self._default_limit = default_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._jobs: List[_Job] = []
+
+    def add(self, supplier: str, city: str, factory: Callable[[], Awaitable[Optional[int]]]) -> None:
+        """factory — корутина без аргументов, возвращает число распарсенных позиций."""
+        self._jobs.append(_Job(supplier=supplier, city=city, factory=factory))
+
+    def _semaphore(self, supplier: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(supplier)
+        if sem is None:
+            sem = asyncio.Semaphore(self._limits.get(supplier, self._default_limit))
+            self._semaphores[supplier] = sem
+        return sem
+
+    async def _run_one(self, job: _Job) -> JobResult:
+        async with self._semaphore(job.supplier):
+            started = time.perf_counter()
+            try:
+                rows = await job.factory()
+                return JobResult(job.supplier, job.city, True, time.perf_counter() - started, rows or 0)
+            except Exception as e:
+                print(f"!!! ОШИБКА {job.supplier} / {job.city}: {e}")
+                return JobResult(job.supplier, job.city, False, time.perf_counter() - started, error=str(e))
+
+    async def run(self) -> List[JobResult]:
+        jobs, self._jobs = self._jobs, []
+        return list(await asyncio.gather(*(self._run_one(job) for job in jobs)))
+
+
+def print_report(results: List[JobResult]) -> None:
+    """Печатает время выполнения каждой задачи и сводку по поставщикам."""
+    print("\n" + "=" * 50)
+    print("Время выполнения задач:")
+    for r in sorted(results, key=lambda r: r.elapsed, reverse=True):
+        status = "OK  " if r.ok else "FAIL"
+        print(f"  {status} {r.elapsed:8.1f} c  {r.rows:6d} поз.  {r.supplier} / {r.city}")
+
+    totals: Dict[str, List[JobResult]] = {}
+    for r in results:
+        totals.setdefault(r.supplier, []).append(r)
+    print("Итого по поставщикам:")
+    for supplier, items in totals.items():
+        failed = sum(1 for r in items if not r.ok)
+        rows = sum(r.rows for r in items)
+        longest = max(r.elapsed for r in items)
+        print(f"  {supplier}: задач {len(items)}, ошибок {failed}, позиций {rows}, самая долгая {longest:.1f} c")
+    print("=" * 50)
@@ -0,0 +1,291 @@
+# app/parsers/suppliers.py
+"""Поставщики, которых обходит run_parsers.py: ссылки по городам и запись каждого в реестре парсеров."""
+from playwright.async_api import Page
+
+from app.parsers.browser_pool import BLOCKED_RESOURCE_TYPES_WITH_STYLES
+from app.parsers.common import LENGTH_UNIT_MM
+from app.parsers.excel_processor import parse_evraz_price
+from app.parsers.mc_ru_parser import parse_mc_price
+from app.parsers.metallotorg_parser import parse_metallotorg_price
+from app.parsers.parser import select_moscow_if_needed
+from app.parsers.registry import FetchStrategy, SupplierParser, Target, register
+from app.parsers.uralskaya_parser import parse_uralskaya_price
+
+EVRAZ_SUPPLIER = "ЕВРАЗ"
+MC_SUPPLIER = "Металлсервис"
+METALLOTORG_SUPPLIER = "Металлоторг"
+URALSKAYA_SUPPLIER = "Уральская металлобаза"
+
+# ====== EVRAZ ======
+CITIES = {
+    "msk": "https://evraz.market/pricelist/?city=103",
+    "barnaul": "https://barnaul.evraz.market/pricelist/",
+    "belgorod": "https://belgorod.evraz.market/pricelist/",
+    "biisk": "https://biisk.evraz.market/pricelist/", 
+    "bryansk": "https://bryansk.evraz.market/pricelist/",
+    "vladivostok": "https://vladivostok.evraz.market/pricelist/", 
+    "vladimir": "https://vladimir.evraz.market/pricelist/",
+    "volgograd": "https://volgograd.evraz.market/pricelist/", 
+    "vrn": "https://vrn.evraz.market/pricelist/",
+    "ekb": "https://ekb.evraz.market/pricelist/", 
+    "irk": "https://irk.evraz.market/pricelist/",
+    "kzn": "https://kzn.evraz.market/pricelist/", 
+    "kirov": "https://kirov.evraz.market/pricelist/",
+    "krasnodar": "https://krasnodar.evraz.market/pricelist/", 
+    "krsk": "https://krsk.evraz.market/pricelist/",
+    "lipetsk": "https://lipetsk.evraz.market/pricelist/", 
+    "magnitogorsk": "https://magnitogorsk.evraz.market/pricelist/",
+    "minvody": "https://minvody.evraz.market/pricelist/", 
+    "chelny": "https://chelny.evraz.market/pricelist/",
+    "nn": "https://nn.evraz.market/pricelist/", 
+    "nizhniy-tagil": "https://nizhniy-tagil.evraz.market/pricelist/",
+    "novokuznetsk": "https://novokuznetsk.evraz.market/pricelist/", 
+    "nsk": "https://nsk.evraz.market/pricelist/",
+    "omsk": "https://omsk.evraz.market/pricelist/", 
+    "ornb": "https://ornb.evraz.market/pricelist/",
+    "penza": "https://penza.evraz.market/pricelist/", 
+    "prm": "https://prm.evraz.market/pricelist/",
+    "rostov": "https://rostov.evraz.market/pricelist/", 
+    "sam": "https://sam.evraz.market/pricelist/",
+    "spb": "https://spb.evraz.market/pricelist/", 
+    "saransk": "https://saransk.evraz.market/pricelist/",
+    "saratov": "https://saratov.evraz.market/pricelist/", 
+    "sochi": "https://sochi.evraz.market/pricelist/",
+    "oskol": "https://oskol.evraz.market/pricelist/", 
+    "taganrog": "https://taganrog.evraz.market/pricelist/",
+    "tula": "https://tula.evraz.market/pricelist/", 
+    "ulianovsk": "https://ulianovsk.evraz.market/pricelist/",
+    "ufa": "https://ufa.evraz.market/pricelist/", 
+    "khabarovsk": "https://khabarovsk.evraz.market/pricelist/",
+    "chel": "https://chel.evraz.market/pricelist/", 
+    "chita": "https://chita.evraz.market/pricelist/",
+    "sakhalinsk": "https://sakhalinsk.evraz.market/pricelist/",
+}
+
+CITY_CODES_TO_RUSSIAN = {
+    "msk": "Москва",
+    "barnaul": "Барнаул",
+    "belgorod": "Белгород",
+    "biisk": "Бийск",
+    "bryansk": "Брянск",
+    "vladivostok": "Владивосток",
+    "vladimir": "Владимир",
+    "volgograd": "Волгоград",
+    "vrn": "Воронеж",
+    "ekb": "Екатеринбург",
+    "irk": "Иркутск",
+    "kzn": "Казань",
+    "kirov": "Киров",
+    "krasnodar": "Краснодар",
+    "krsk": "Красноярск",
+    "lipetsk": "Липецк",
+    "magnitogorsk": "Магнитогорск",
+    "minvody": "Минеральные Воды",
+    "chelny": "Набережные Челны",
+    "nn": "Нижний Новгород",
+    "nizhniy-tagil": "Нижний Тагил",
+    "novokuznetsk": "Новокузнецк",
+    "nsk": "Новосибирск",
+    "omsk": "Омск",
+    "ornb": "Оренбург",
+    "penza": "Пенза",
+    "prm": "Пермь",
+    "rostov": "Ростов-на-Дону",
+    "sam": "Самара",
+    "spb": "Санкт-Петербург",
+    "saransk": "Саранск",
+    "saratov": "Саратов",
+    "sochi": "Сочи",
+    "oskol": "Старый Оскол",
+    "taganrog": "Таганрог",
+    "tula": "Тула",
+    "ulianovsk": "Ульяновск",
+    "ufa": "Уфа",
+    "khabarovsk": "Хабаровск",
+    "chel": "Челябинск",
+    "chita": "Чита",
+    "sakhalinsk": "Южно-Сахалинск",
+}
+
+# ====== Металлсервис ======
+MC_LINKS_BY_CITY: dict[str, list[str]] = {
+    #Москва и область (основные разделы MC + локальные страницы)
+    "Москва": [
+        "https://mc.ru/prices/kachestvst.htm?v=2",
+        "https://mc.ru/prices/sortovojprokat.htm?v=2",
+        "https://mc.ru/prices/listovojprokat.htm?v=2",
+        "https://mc.ru/prices/truby.htm?v=2",
+        "https://mc.ru/prices/metizy.htm?v=2",
+        "https://mc.ru/prices/cvetmet.htm?v=2",
+        "https://mc.ru/prices/engineering.htm?v=2",
+        "https://mc.ru/prices/krepezh.htm?v=2",
+        "https://mc.ru/prices/list_nerzh_sht.htm?v=2",
+        "https://mc.ru/prices/nerzhaveika.htm?v=2",
+        "https://mc.ru/prices/price_gaz.htm?v=2",
+        "https://mc.ru/prices/profnastil.htm?v=2",
+        "https://mc.ru/prices/price_noginsk.htm?v=2",
+        "https://mc.ru/prices/price_balash.htm?v=2",
+    ],
+
+    "Санкт-Петербург": [
+        "https://mc.ru/prices/filials/price_piter_ch.htm",
+        "https://mc.ru/prices/filials/price_piter_cvet.htm",
+    ],
+
+    "Нижний Новгород": [
+        "https://mc.ru/prices/filials/price_nnovgorod.htm",
+        "https://mc.ru/prices/filials/profnastil_nnovgorod.htm",
+        "https://mc.ru/prices/filials/price_nnovgorod_konovalova.htm",
+    ],
+
+    "Балаково": ["https://mc.ru/prices/filials/price_balakovo.htm"],
+    "Пенза": ["https://mc.ru/prices/filials/price_penza.htm"],
+    "Самара": ["https://mc.ru/prices/filials/price_samara.htm"],
+
+    "Чебоксары": [
+        "https://mc.ru/prices/filials/price_cheboksary.htm",
+        "https://mc.ru/prices/filials/price_cheboksary1.htm",
+    ],
+
+    "Брянск": ["https://mc.ru/prices/filials/price_br.htm"],
+    "Курск": ["https://mc.ru/prices/filials/price_kursk.htm"],
+    "Белгород": ["https://mc.ru/prices/filials/price_belgorod.htm"],
+    "Краснодар": ["https://mc.ru/prices/filials/price_krasnodar.htm"],
+    "Таганрог": ["https://mc.ru/prices/filials/price_taganrog.htm"],
+    "Юг": ["https://mc.ru/prices/filials/price_ug.htm"],
+
+    "Екатеринбург": [
+        "https://mc.ru/prices/filials/price_ekaterinburg.htm",
+        "https://mc.ru/prices/filials/price_ekat_prof.htm",
+    ],
+    "Пермь": ["https://mc.ru/prices/filials/price_perm.htm"],
+    "Челябинск": [
+        "https://mc.ru/prices/filials/price_chelyabinsk_pr.htm",
+        "https://mc.ru/prices/filials/price_chelyabinsk_prof.htm",
+    ],
+
+    "Кемерово": ["https://mc.ru/prices/filials/price_kemerovo.htm"],
+    "Барнаул": ["https://mc.ru/prices/filials/price_barnaul.htm"],
+    "Омск": ["https://mc.ru/prices/filials/price_omsk.htm"],
+    "Красноярск": ["https://mc.ru/prices/filials/price_krasnoyarsk.htm"],
+    "Сибирь": ["https://mc.ru/prices/filials/price_sib.htm"],
+
+    "Хабаровск": ["https://mc.ru/prices/filials/price_hab.htm"],
+}
+
+# ====== Металлоторг ======
+METALLOTORG_LINKS_BY_CITY: dict[str, str] = {
+    "Белгород": "https://metallotorg.su/images/price/pdf/price-metall-belgorod-kreida.pdf",
+    "Брянск": "https://metallotorg.su/images/price/pdf/price-metall-bryansk.pdf",
+    "Владикавказ": "https://metallotorg.su/images/price/pdf/price-metall-vladikavkaz.pdf",
+    "Владимир": "https://metallotorg.su/images/price/pdf/price-metall-vladimir.pdf",
+    "Волгоград": "https://metallotorg.su/images/price/pdf/price-metall-volgograd.pdf",
+    "Воронеж": "https://metallotorg.su/images/price/pdf/price-metall-voronezh.pdf",
+    "Екатеринбург": "https://metallotorg.su/images/price/pdf/price-metall-ekaterinburg.pdf",
+    "Ижевск": "https://metallotorg.su/images/price/pdf/price-metall-izhevsk.pdf",
+    "Казань": "https://metallotorg.su/images/price/pdf/price-metall-kazan.pdf",
+    "Калуга": "https://metallotorg.su/images/price/pdf/price-metall-kaluga.pdf",
+    "Кемерово": "https://metallotorg.su/images/price/pdf/price-metall-kemerovo.pdf",
+    "Киров": "https://metallotorg.su/images/price/pdf/price-metall-kirov.pdf",
+    "Краснодар": "https://metallotorg.su/images/price/pdf/price-metall-titarovka.pdf",
+    "Курск": "https://metallotorg.su/images/price/pdf/price-metall-kursk.pdf",
+    "Липецк": "https://metallotorg.su/images/price/pdf/price-metall-lipeck.pdf",
+    "Лобня": "https://metallotorg.su/images/price/pdf/price-metall-lobnya.pdf",
+    "Махачкала": "https://metallotorg.su/images/price/pdf/price-metall-mahachkala.pdf",
+    "Набережные Челны": "https://metallotorg.su/images/price/pdf/price-metall-chelny.pdf",
+    "Нальчик": "https://metallotorg.su/images/price/pdf/price-metall-nalchik.pdf",
+    "Нижний Новгород": "https://metallotorg.su/images/price/pdf/price-metall-niznij-novgorod.pdf",
+    "Новокузнецк": "https://metallotorg.su/images/price/pdf/price-metall-novokuzneck.pdf",
+    "Новосибирск": "https://metallotorg.su/images/price/pdf/price-metall-novosibirsk.pdf",
+    "Новочеркасск": "https://metallotorg.su/images/price/pdf/price-metall-novocherkassk.pdf",
+    "Орел": "https://metallotorg.su/images/price/pdf/price-metall-orel.pdf",
+    "Оренбург": "https://metallotorg.su/images/price/pdf/price-metall-orenburg.pdf",
+    "Пенза": "https://metallotorg.su/images/price/pdf/price-metall-penza.pdf",
+    "Пермь": "https://metallotorg.su/images/price/pdf/price-metall-perm.pdf",
+    "Пятигорск": "https://metallotorg.su/images/price/pdf/price-metall-pyatigorsk.pdf",
+    "Ростов-на-Дону": "https://metallotorg.su/images/price/pdf/price-metall-rostov.pdf",
+    "Рязань": "https://metallotorg.su/images/price/pdf/price-metall-ryazan.pdf",
+    "Самара": "https://metallotorg.su/images/price/pdf/price-metall-samara.pdf",
+    "Санкт-Петербург": "https://metallotorg.su/images/price/pdf/price-metall-fornosovo-peterburg.pdf",
+    "Саранск": "https://metallotorg.su/images/price/pdf/price-metall-saransk.pdf",
+    "Саратов": "https://metallotorg.su/images/price/pdf/price-metall-saratov.pdf",
+    "Ставрополь": "https://metallotorg.su/images/price/pdf/price-metall-stavropol.pdf",
+    "Старый Оскол": "https://metallotorg.su/images/price/pdf/price-metall-staryi-oskol.pdf",
+    "Сызрань": "https://metallotorg.su/images/price/pdf/price-metall-syzran.pdf",
+    "Тверь": "https://metallotorg.su/images/price/pdf/price-metall-tver.pdf",
+    "Тула": "https://metallotorg.su/images/price/pdf/price-metall-tula-plehanovo.pdf",
+    "Тюмень": "https://metallotorg.su/images/price/pdf/price-metall-tumen.pdf",
+    "Ульяновск": "https://metallotorg.su/images/price/pdf/price-metall-ulyanovsk.pdf",
+    "Уфа": "https://metallotorg.su/images/price/pdf/price-metall-ufa.pdf",
+    "Чебоксары": "https://metallotorg.su/images/price/pdf/price-metall-cheboksary.pdf",
+    "Челябинск": "https://metallotorg.su/images/price/pdf/price-metall-chelyabinsk.pdf",
+    "Череповец": "https://metallotorg.su/images/price/pdf/price-metall-cherepovec.pdf",
+    "Чехов": "https://metallotorg.su/images/price/pdf/price-metall-chekhov.pdf",
+    "Электроугли": "https://metallotorg.su/images/price/pdf/price-metall-electrougli.pdf",
+    "Ярославль": "https://metallotorg.su/images/price/pdf/price-metall-yaroslavl.pdf",
+}
+
+# ====== Уральская металлобаза ======
+URALSKAYA_LINK = "https://pmsmk.ru/f/nalichie_td_uralskaya_metallobaza.xls"
+
+
+async def select_evraz_region(page: Page, target: Target) -> None:
+    """Москву ЕВРАЗ отдаёт только после ручного выбора региона на общей странице прайса."""
+    if target.key != "msk":
+        return
+    print("  - Перехожу на https://evraz.market/pricelist/ и выбираю Москву вручную")
+    await page.goto("https://evraz.market/pricelist/", wait_until="domcontentloaded", timeout=45_000)
+    await select_moscow_if_needed(page)
+
+
+register(SupplierParser(
+    supplier=EVRAZ_SUPPLIER,
+    key="evraz",
+    fetch=FetchStrategy.BROWSER_DOWNLOAD,
+    parse=parse_evraz_price,
+    targets=tuple(
+        Target(CITY_CODES_TO_RUSSIAN.get(code, code.capitalize()), (url,), code)
+        for code, url in CITIES.items()
+    ),
+    concurrency=4,
+    attempts=2,
+    prepare=select_evraz_region,
+    # Куки (регион, согласия) переезжают между городами; стили не режем — кнопку ищем по видимости
+    browser={"share_storage": True},
+    rate_limit=1.0,
+))
+
+register(SupplierParser(
+    supplier=MC_SUPPLIER,
+    key="mc",
+    fetch=FetchStrategy.HTTP_PAGES,
+    parse=parse_mc_price,
+    targets=tuple(Target(city, tuple(urls), city) for city, urls in MC_LINKS_BY_CITY.items()),
+    concurrency=6,
+    skip_failed_sources=True,
+    # Браузер нужен только для страниц за антибот-защитой, поэтому контексты не прогреваем
+    browser={"prewarm": 0, "blocked_types": BLOCKED_RESOURCE_TYPES_WITH_STYLES},
+    rate_limit=5.0,
+    length_unit=LENGTH_UNIT_MM,
+))
+
+register(SupplierParser(
+    supplier=METALLOTORG_SUPPLIER,
+    key="metallotorg",
+    fetch=FetchStrategy.HTTP_FILE,
+    parse=parse_metallotorg_price,
+    targets=tuple(Target(city, (url,), city) for city, url in METALLOTORG_LINKS_BY_CITY.items()),
+    concurrency=8,
+    rate_limit=4.0,
+))
+
+register(SupplierParser(
+    supplier=URALSKAYA_SUPPLIER,
+    key="uralskaya",
+    fetch=FetchStrategy.HTTP_FILE,
+    parse=parse_uralskaya_price,
+    targets=(Target("Екатеринбург", (URALSKAYA_LINK,), "ekb"),),
+    concurrency=1,
+    # Размеры из строки вида «2х1250х2500» — в мм
+    length_unit=LENGTH_UNIT_MM,
+))
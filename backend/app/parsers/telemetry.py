@@ -0,0 +1,149 @@
+# app/parsers/telemetry.py
+"""
+Телеметрия запуска run_parsers.py по каждой паре (поставщик, город): время этапов
+(загрузка, разбор, запись в green, перенос в blue), позиции, скачанные байты, повторы и ошибки.
+Итог запуска пишется в таблицу parser_runs и в текстовый файл в формате Prometheus
+(его подхватывает textfile collector node_exporter); тот же текст отдаёт /api/v1/parsers/metrics.
+"""
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+STAGES = ("fetch", "parse", "green", "promote")
+
+# Статусы пары (поставщик, город) в parser_runs
+STATUS_PENDING = "pending"  # задача ещё не завершилась
+STATUS_UNCHANGED = "unchanged"  # прайс не изменился на сервере, разбор пропущен
+STATUS_EMPTY = "empty"  # источники получены, но позиций нет
+STATUS_PARSED = "parsed"  # позиции в green, перенос в blue не дошёл
+STATUS_PROMOTED = "promoted"  # blue обновлён
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class TargetStats:
+    """Метрики одной пары (поставщик, город). Поля совпадают с колонками ParserRun."""
+    supplier: str
+    city: str
+    status: str = STATUS_PENDING
+    fetch_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    green_seconds: float = 0.0
+    promote_seconds: float = 0.0
+    rows_parsed: int = 0
+    bytes_downloaded: int = 0
+    retries: int = 0
+    errors: int = 0
+    error: Optional[str] = None  # последняя ошибка
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    duplicates: int = 0  # строк прайса с повторяющимся ключом позиции
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Добавляет время блока к этапу name (повторные попытки суммируются)."""
+        if name not in STAGES:
+            raise ValueError(f"Неизвестный этап '{name}'")
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            attr = f"{name}_seconds"
+            setattr(self, attr, getattr(self, attr) + time.perf_counter() - started)
+
+    def fail(self, error: Any) -> None:
+        self.errors += 1
+        self.error = str(error)[:1000]
+
+    def as_row(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class RunTelemetry:
+    """Метрики всех пар одного запуска."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self._targets: Dict[Tuple[str, str], TargetStats] = {}
+
+    def target(self, supplier: str, city: str) -> TargetStats:
+        stats = self._targets.get((supplier, city))
+        if stats is None:
+            stats = self._targets[(supplier, city)] = TargetStats(supplier, city)
+        return stats
+
+    def targets(self) -> List[TargetStats]:
+        return list(self._targets.values())
+
+    def to_prometheus(self) -> str:
+        return render_prometheus(self.targets(), timestamp=time.time())
+
+
+# (имя метрики, описание, атрибут строки, дополнительные метки)
+_METRICS = [
+    *(
+        ("parser_stage_duration_seconds", "Длительность этапа обработки пары (поставщик, город)",
+         f"{stage}_seconds", {"stage": stage})
+        for stage in STAGES
+    ),
+    ("parser_rows_parsed", "Позиций разобрано из прайса", "rows_parsed", {}),
+    *(
+        ("parser_rows_changed", "Изменения в blue при переносе", change, {"change": change})
+        for change in ("inserted", "updated", "deleted", "unchanged")
+    ),
+    ("parser_rows_duplicate", "Строк прайса с тем же ключом позиции, что у другой строки", "duplicates", {}),
+    ("parser_bytes_downloaded", "Скачано байт (ответы 304 не считаются)", "bytes_downloaded", {}),
+    ("parser_retries", "Повторных попыток загрузки и задачи", "retries", {}),
+    ("parser_errors", "Ошибок за запуск, включая пропущенные страницы", "errors", {}),
+]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def render_prometheus(rows: Iterable[Any], *, timestamp: float) -> str:
+    """
+    Текстовый формат Prometheus для строк запуска: TargetStats или ParserRun из БД
+    (в старых строках parser_runs новых колонок нет — None выводится как 0).
+    """
+    rows = list(rows)
+    lines: List[str] = []
+    emitted = set()
+    for name, help_text, attr, extra in _METRICS:
+        if name not in emitted:
+            emitted.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+        for row in rows:
+            labels = _labels({"supplier": row.supplier, "city": row.city, **extra})
+            value = getattr(row, attr) or 0
+            lines.append(f"{name}{{{labels}}} {round(value, 3) if isinstance(value, float) else value}")
+
+    lines.append("# HELP parser_status Статус пары в последнем запуске (1 у текущего статуса)")
+    lines.append("# TYPE parser_status gauge")
+    for row in rows:
+        labels = _labels({"supplier": row.supplier, "city": row.city, "status": row.status or STATUS_PROMOTED})
+        lines.append(f"parser_status{{{labels}}} 1")
+
+    lines.append("# HELP parser_last_run_timestamp_seconds Время завершения последнего запуска (unix)")
+    lines.append("# TYPE parser_last_run_timestamp_seconds gauge")
+    lines.append(f"parser_last_run_timestamp_seconds {timestamp:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(text: str, path: str) -> None:
+    """Атомарно перезаписывает файл метрик: сборщик не должен прочитать его наполовину."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,53 @@
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, field_validator
+
+# Текст ошибки в ответе API: первая строка без адресов, не длиннее ERROR_MAX_LENGTH символов
+ERROR_MAX_LENGTH = 200
+URL_RE = re.compile(r"\w+://\S+")
+
+
+class ParserRunTarget(BaseModel):
+    """Одна пара (поставщик, город) запуска run_parsers.py."""
+    supplier: str
+    city: str
+    status: str
+    fetch_seconds: Optional[float] = None
+    parse_seconds: Optional[float] = None
+    green_seconds: Optional[float] = None
+    promote_seconds: Optional[float] = None
+    rows_parsed: Optional[int] = None
+    bytes_downloaded: Optional[int] = None
+    retries: Optional[int] = None
+    errors: Optional[int] = None
+    error: Optional[str] = None
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    duplicates: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('error')
+    def short_error(cls, v):
+        # В parser_runs.error лежит полный текст исключения: ссылки, пути, ответы сайтов
+        if not v:
+            return v
+        line = URL_RE.sub("<url>", v.strip().splitlines()[0])
+        return line if len(line) <= ERROR_MAX_LENGTH else line[:ERROR_MAX_LENGTH - 1] + "…"
+
+
+class ParserRunSummary(BaseModel):
+    run_id: str
+    finished_at: Optional[datetime] = None
+    targets_total: int = 0
+    targets_failed: int = 0
+    rows_parsed: int = 0
+    bytes_downloaded: int = 0
+    retries: int = 0
+    errors: int = 0
+    targets: List[ParserRunTarget] = []
@@ -0,0 +1,25 @@
+from datetime import date, datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class PricePoint(BaseModel):
+    recorded_at: datetime
+    price: Optional[float] = None  # None — позиция пропала из прайса
+
+
+class DailyPricePoint(BaseModel):
+    day: date
+    min_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    max_price: Optional[float] = None
+    close_price: Optional[float] = None  # None — к концу дня позиция пропала из прайса
+    samples: int = 0  # изменений за день; 0 — цена действовала без изменений
+
+
+class PriceHistory(BaseModel):
+    warehouse_id: int
+    content_hash: str
+    granularity: str
+    points: List[PricePoint] = []
+    daily: List[DailyPricePoint] = []
@@ -15,10 +15,13 @@ class SearchResultItem(BaseModel):
     price: Optional[float] = None
     supplier: Optional[str]
     material: Optional[str] = None
+    score: Optional[float] = None  # релевантность при поиске по q
 
     class SomeSchema(BaseModel):
         model_config = ConfigDict(from_attributes=True)
 
 class SearchResult(BaseModel):
     items: List[SearchResultItem]
-    total: int
+    total: Optional[int] = None  # None при count=none
+    total_is_estimate: bool = False  # total — оценка планировщика (count=estimate)
+    next_cursor: Optional[str] = None  # передать в cursor за следующей страницей; None — страниц больше нет
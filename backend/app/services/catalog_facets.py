@@ -0,0 +1,42 @@
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.metal import Metal
+from app.models.metal_facet import MetalFacet
+from app.models.warehouse import Warehouse
+
+
+async def rebuild_metal_facets(session: AsyncSession) -> int:
+    """
+    Пересобирает metal_facets по текущему blue-каталогу: DELETE + INSERT ... SELECT ... GROUP BY
+    в транзакции вызывающего, так что /filters/* до коммита видят прежний набор целиком.
+    Возвращает число сочетаний.
+    """
+    grouped = (
+        select(
+            Warehouse.supplier,
+            Warehouse.city,
+            Metal.category,
+            Metal.stamp,
+            Metal.state_standard,
+            func.count(),
+        )
+        .join(Warehouse, Metal.warehouse_id == Warehouse.id)
+        .group_by(Warehouse.supplier, Warehouse.city, Metal.category, Metal.stamp, Metal.state_standard)
+    )
+    await session.execute(delete(MetalFacet))
+    result = await session.execute(
+        insert(MetalFacet).from_select(
+            ["supplier", "city", "category", "stamp", "state_standard", "positions"], grouped
+        )
+    )
+    return result.rowcount
+
+
+async def ensure_metal_facets(session: AsyncSession) -> None:
+    """Собирает metal_facets, если таблица пуста, а каталог нет (первый запуск после обновления схемы)."""
+    if await session.scalar(select(exists().select_from(MetalFacet))):
+        return
+    if await session.scalar(select(exists().select_from(Metal))):
+        rows = await rebuild_metal_facets(session)
+        print(f"Фасеты фильтров собраны по текущему каталогу: {rows} сочетаний.")
@@ -0,0 +1,116 @@
+# app/services/catalog_search.py
+"""
+Свободный поиск по каталогу (/search?q=): полнотекстовый индекс metal.search_vector
+(русская конфигурация Postgres) плюс триграммная похожесть наименования для опечаток и обрывков слов.
+
+Сокращения из прайсов («г/к», «х/к», «б/ш», …) раскрываются на стороне запроса: каждое слово
+ищется вместе со своими синонимами, поэтому «Лист г/к» находит и «Лист горячекатаный», и наоборот.
+
+Фильтры по размерам сравнивают целые микрометры (Metal.<размер>_um), а не float:
+значение из запроса переводится в микрометры по тем же правилам, что и генерируемые колонки.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, and_, cast, func, literal, literal_column, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.metal import DIMENSION_UM_FACTORS, Metal
+
+SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+# Взаимозаменяемые написания в наименованиях поставщиков
+SYNONYM_GROUPS: Tuple[Tuple[str, ...], ...] = (
+    ("г/к", "гк", "горячекатаный"),
+    ("х/к", "хк", "холоднокатаный"),
+    ("б/ш", "бесшовный"),
+    ("э/с", "эсв", "электросварной"),
+    ("оцинк", "оц", "оцинкованный"),
+    ("н/ж", "нерж", "нержавеющий"),
+    ("проф", "профильный"),
+    ("арм", "арматура"),
+)
+SYNONYMS: Dict[str, Tuple[str, ...]] = {word: group for group in SYNONYM_GROUPS for word in group}
+
+# Слово запроса: буквы, цифры и дробь внутри сокращений (г/к)
+TOKEN_RE = re.compile(r"\w+(?:/\w+)*")
+MAX_TOKENS = 10
+
+DIMENSIONS = ("thickness", "diameter", "width", "length")
+
+
+def tokenize(q: str) -> List[str]:
+    return TOKEN_RE.findall(q.lower())[:MAX_TOKENS]
+
+
+def _word_query(word: str, prefix: bool) -> ColumnElement:
+    # Слова из TOKEN_RE не содержат кавычек и операторов tsquery, так что кавычки ниже безопасны
+    return func.to_tsquery(SEARCH_CONFIG, f"'{word}'" + (":*" if prefix else ""))
+
+
+def build_tsquery(q: str) -> Optional[ColumnElement]:
+    """
+    tsquery для строки запроса: все слова обязательны (&&), каждое — любым из синонимов (||).
+    Последнее слово ищется по префиксу: строка может быть недопечатана (поиск по мере ввода).
+    """
+    words = tokenize(q)
+    if not words:
+        return None
+    query = None
+    for n, word in enumerate(words):
+        prefix = n == len(words) - 1
+        term = None
+        for variant in SYNONYMS.get(word, (word,)):
+            variant_query = _word_query(variant, prefix and variant == word)
+            term = variant_query if term is None else term.op("||")(variant_query)
+        query = term if query is None else query.op("&&")(term)
+    return query
+
+
+def search_condition(q: str, tsquery: Optional[ColumnElement]) -> ColumnElement:
+    """Совпадение по полнотекстовому индексу или триграммная похожесть q на слово из наименования."""
+    fuzzy = literal(q).op("<%")(Metal.name)
+    if tsquery is None:
+        return fuzzy
+    return or_(Metal.search_vector.op("@@")(tsquery), fuzzy)
+
+
+def search_rank(q: str, tsquery: Optional[ColumnElement]) -> ColumnElement:
+    """Релевантность: ранг полнотекстового совпадения (наименование весомее марки и ГОСТа) + похожесть наименования."""
+    similarity = cast(func.word_similarity(q, func.coalesce(Metal.name, "")), Float)
+    if tsquery is None:
+        return similarity
+    return cast(func.ts_rank_cd(Metal.search_vector, tsquery), Float) + similarity
+
+
+def dimension_um(dimension: str, value: float, tolerance: float = 0) -> int:
+    """
+    value + tolerance в микрометрах, как в колонке Metal.<dimension>_um (app/models/metal.dimension_um_sql).
+    Толщина и диаметр — в мм, длина и ширина — в м, допуск в тех же единицах.
+    """
+    return round((value + tolerance) * DIMENSION_UM_FACTORS[dimension])
+
+
+def dimension_condition(
+    dimension: str,
+    value: Optional[float] = None,
+    minimum: Optional[float] = None,
+    maximum: Optional[float] = None,
+    tolerance: Optional[float] = None,
+) -> Optional[ColumnElement]:
+    """
+    Условие на размер по Metal.<dimension>_um: value ± tolerance либо [minimum - tolerance, maximum + tolerance].
+    Без допуска value — точное равенство микрометров.
+    """
+    column = getattr(Metal, f"{dimension}_um")
+    tolerance = tolerance or 0
+    if value is not None:
+        if not tolerance:
+            return column == dimension_um(dimension, value)
+        minimum = maximum = value
+    conditions = []
+    if minimum is not None:
+        conditions.append(column >= dimension_um(dimension, minimum, -tolerance))
+    if maximum is not None:
+        conditions.append(column <= dimension_um(dimension, maximum, tolerance))
+    return and_(*conditions) if conditions else None
@@ -0,0 +1,119 @@
+from datetime import date, datetime, time, timedelta
+from typing import List
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.price_history import MetalPriceDaily, MetalPriceHistory
+
+# Сколько дней назад досчитывать свёртку после перерыва в запусках или в изменениях цен
+MAX_ROLLUP_GAP_DAYS = 31
+
+
+def _month_start(moment: date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def _next_month(moment: date) -> date:
+    return date(moment.year + 1, 1, 1) if moment.month == 12 else date(moment.year, moment.month + 1, 1)
+
+
+async def ensure_history_partition(session: AsyncSession, moment: date) -> None:
+    """Создаёт месячную секцию журнала цен для даты moment, если её ещё нет."""
+    start = _month_start(moment)
+    end = _next_month(start)
+    name = f"{MetalPriceHistory.__tablename__}_{start:%Y_%m}"
+    await session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {MetalPriceHistory.__tablename__} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+async def append_price_changes(session: AsyncSession, *, green_sql: str, params: dict, now: datetime) -> int:
+    """
+    Дописывает в журнал только изменения blue-склада относительно green-набора green_sql:
+    новые позиции и позиции с новой ценой — с ценой из green, пропавшие — с price = NULL.
+    Должна вызываться до применения разницы к metal.
+    """
+    changed = await session.execute(
+        text(
+            f"INSERT INTO {MetalPriceHistory.__tablename__} (warehouse_id, content_hash, recorded_at, price) "
+            f"SELECT CAST(:blue_id AS integer), g.content_hash, g.price_updated_at, g.price FROM ({green_sql}) g "
+            "LEFT JOIN metal m ON m.warehouse_id = :blue_id AND m.content_hash = g.content_hash "
+            "WHERE m.id IS NULL OR m.price IS DISTINCT FROM g.price "
+            "ON CONFLICT DO NOTHING"
+        ),
+        params,
+    )
+    gone = await session.execute(
+        text(
+            f"INSERT INTO {MetalPriceHistory.__tablename__} (warehouse_id, content_hash, recorded_at, price) "
+            "SELECT DISTINCT m.warehouse_id, m.content_hash, CAST(:now AS timestamp), CAST(NULL AS double precision) FROM metal m "
+            "WHERE m.warehouse_id = :blue_id AND m.content_hash IS NOT NULL AND NOT EXISTS ("
+            "SELECT 1 FROM metal_green g WHERE g.warehouse_id = :green_id AND g.content_hash = m.content_hash) "
+            "ON CONFLICT DO NOTHING"
+        ),
+        {**params, "now": now},
+    )
+    return changed.rowcount + gone.rowcount
+
+
+async def ensure_history_partitions(session: AsyncSession, first: date, last: date) -> None:
+    """Месячные секции журнала цен для всех месяцев с first по last включительно."""
+    month = _month_start(first)
+    while month <= last:
+        await ensure_history_partition(session, month)
+        month = _next_month(month)
+
+
+async def rollup_days(session: AsyncSession, today: date) -> List[date]:
+    """
+    Дни, за которые нужна свёртка: вчера и сегодня (запуск может перейти через полночь)
+    и все дни после последнего дня со свёрткой (не дальше MAX_ROLLUP_GAP_DAYS): дни без
+    изменений строк не дают, поэтому последний свёрнутый день может быть и давним.
+    """
+    start = today - timedelta(days=1)
+    last = await session.scalar(select(func.max(MetalPriceDaily.day)))
+    if last is not None and last < start:
+        start = max(last + timedelta(days=1), today - timedelta(days=MAX_ROLLUP_GAP_DAYS))
+    return [start + timedelta(days=n) for n in range((today - start).days + 1)]
+
+
+async def rollup_daily_prices(session: AsyncSession, day: date) -> int:
+    """
+    Пересчитывает дневной срез цен за день day (upsert по ключу позиции и дню). Строки пишутся только
+    для позиций, у которых в этот день были события журнала: дни без изменений не хранятся,
+    их цену /prices/history?granularity=daily переносит с последнего дня с изменениями при чтении.
+    min/avg/max — по цене на начало дня (последнее событие до него) и изменениям за день,
+    close_price — цена на конец дня (NULL, если позиция пропала), samples — число изменений за день.
+    """
+    start = datetime.combine(day, time.min)
+    params = {"day": day, "start": start, "end": start + timedelta(days=1)}
+    day_events = (
+        f"SELECT warehouse_id, content_hash, recorded_at, price FROM {MetalPriceHistory.__tablename__} "
+        "WHERE recorded_at >= :start AND recorded_at < :end"
+    )
+    opening = (
+        "SELECT DISTINCT ON (h.warehouse_id, h.content_hash) h.warehouse_id, h.content_hash, h.recorded_at, h.price "
+        f"FROM {MetalPriceHistory.__tablename__} h "
+        f"JOIN (SELECT DISTINCT warehouse_id, content_hash FROM ({day_events}) d) k "
+        "ON k.warehouse_id = h.warehouse_id AND k.content_hash = h.content_hash "
+        "WHERE h.recorded_at < :start "
+        "ORDER BY h.warehouse_id, h.content_hash, h.recorded_at DESC"
+    )
+    result = await session.execute(
+        text(
+            f"INSERT INTO {MetalPriceDaily.__tablename__} "
+            "(warehouse_id, content_hash, day, min_price, avg_price, max_price, close_price, samples) "
+            "SELECT warehouse_id, content_hash, CAST(:day AS date), MIN(price), AVG(price), MAX(price), "
+            "(array_agg(price ORDER BY recorded_at DESC))[1], COUNT(*) FILTER (WHERE recorded_at >= :start) "
+            f"FROM ({opening} UNION ALL {day_events}) e "
+            "GROUP BY warehouse_id, content_hash "
+            "HAVING COUNT(price) > 0 "
+            "ON CONFLICT (warehouse_id, content_hash, day) DO UPDATE SET "
+            "min_price = EXCLUDED.min_price, avg_price = EXCLUDED.avg_price, max_price = EXCLUDED.max_price, "
+            "close_price = EXCLUDED.close_price, samples = EXCLUDED.samples"
+        ),
+        params,
+    )
+    return result.rowcount
@@ -0,0 +1,233 @@
+import hashlib
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.metal import MetalGreen
+from app.parsers.common import LENGTH_UNIT_M, METRES_PER_LENGTH_UNIT, PRODUCT_FIELDS, ProductRecord
+from app.services.price_history import append_price_changes
+
+# Колонки, которые парсеры заполняют для каждой позиции (в порядке COPY)
+PRODUCT_COLUMNS: Tuple[str, ...] = PRODUCT_FIELDS
+_FLOAT_COLUMNS = {"diameter", "thickness", "width", "length", "price"}
+# Колонки в единицах длины поставщика, в каталоге — в метрах
+_LENGTH_COLUMNS = {"width", "length"}
+
+# Идентичность позиции: наименование, марка, ГОСТ, размеры и единица измерения. По этим полям
+# позиция узнаётся между запусками (и в журнале цен). comments у МС собирает все нераспознанные
+# колонки, поэтому в ключ не входит, как и category/material: их правка обновляет позицию на месте.
+HASH_COLUMNS: Tuple[str, ...] = (
+    "name", "stamp", "state_standard", "diameter", "thickness", "width", "length", "unit",
+)
+# Описание позиции вне ключа: обновляется вместе с ценой
+DETAIL_COLUMNS: Tuple[str, ...] = tuple(
+    col for col in PRODUCT_COLUMNS if col not in HASH_COLUMNS and col != "price"
+)
+
+GREEN_COPY_COLUMNS: Tuple[str, ...] = PRODUCT_COLUMNS + ("content_hash", "price_updated_at", "warehouse_id")
+
+# Версия приведения позиций при загрузке (единицы длины и ширины, ключ content_hash). Входит в отметку
+# «файл загружен» кэша скачиваний (app/parsers/download_cache.py): после её смены каждый прайс
+# загружается заново, даже если сам файл не менялся. 2 — длина и ширина в метрах у всех поставщиков.
+# Состав HASH_COLUMNS входит в версию сам, менять номер при его правке не нужно
+LOADER_VERSION = "2:" + hashlib.md5(",".join(HASH_COLUMNS).encode("utf-8")).hexdigest()[:8]
+
+
+@dataclass
+class DiffStats:
+    """Сколько позиций склада добавилось, изменилось, пропало и осталось как было; сколько строк прайса — дубли."""
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    duplicates: int = 0  # лишних строк прайса с тем же ключом, что у другой строки
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) else f
+
+
+def _as_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return str(value)
+
+
+# Приведение типа каждой колонки перед COPY и позиции полей описания (HASH_COLUMNS) в кортеже значений
+_CONVERTERS = tuple(_as_float if col in _FLOAT_COLUMNS else _as_str for col in PRODUCT_COLUMNS)
+_HASH_POSITIONS: Tuple[Tuple[int, bool], ...] = tuple(
+    (position, col in _FLOAT_COLUMNS) for position, col in enumerate(PRODUCT_COLUMNS) if col in HASH_COLUMNS
+)
+
+
+def content_hash(values: Sequence[Any]) -> str:
+    """
+    md5 от описания позиции (HASH_COLUMNS); values — значения в порядке PRODUCT_COLUMNS.
+    Числа округляются до 6 знаков, чтобы 10.0 и 10.000000001 из разных прогонов давали один и тот же ключ.
+    """
+    parts = []
+    for position, is_float in _HASH_POSITIONS:
+        value = values[position]
+        if value is None:
+            parts.append("")
+        elif is_float:
+            parts.append(repr(round(value, 6)))
+        else:
+            parts.append(value.strip())
+    return hashlib.md5("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _in_metres(scale: float):
+    def convert(value: Any) -> Optional[float]:
+        f = _as_float(value)
+        # Округление убирает хвосты вроде 1250 * 0.001 = 1.2500000000000002
+        return None if f is None else round(f * scale, 6)
+    return convert
+
+
+def _converters(length_unit: str) -> tuple:
+    """_CONVERTERS, в которых длина и ширина переводятся из единиц поставщика в метры."""
+    scale = METRES_PER_LENGTH_UNIT[length_unit]
+    if scale == 1.0:
+        return _CONVERTERS
+    return tuple(
+        _in_metres(scale) if col in _LENGTH_COLUMNS else convert
+        for convert, col in zip(_CONVERTERS, PRODUCT_COLUMNS)
+    )
+
+
+def _green_records(
+    products: Iterable[ProductRecord], warehouse_id: int, now: datetime, length_unit: str = LENGTH_UNIT_M
+) -> Iterator[tuple]:
+    """Превращает позиции парсеров в кортежи для COPY, без промежуточных словарей и ORM-объектов."""
+    converters = _converters(length_unit)
+    for p in products:
+        if not p.name:
+            continue
+        values = tuple(convert(getattr(p, col)) for convert, col in zip(converters, PRODUCT_COLUMNS))
+        yield values + (content_hash(values), now, warehouse_id)
+
+
+async def _driver_connection(session: AsyncSession):
+    """Сырое asyncpg-соединение текущей транзакции сессии."""
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def copy_green_products(
+    session: AsyncSession,
+    warehouse_id: int,
+    products: Iterable[ProductRecord],
+    *,
+    length_unit: str = LENGTH_UNIT_M,
+) -> int:
+    """
+    Заменяет позиции green-склада: DELETE + COPY одной пачкой через asyncpg copy_records_to_table.
+    Длина и ширина переводятся из length_unit поставщика в метры. Возвращает число загруженных строк.
+    """
+    # DELETE заодно открывает транзакцию на соединении — COPY пойдёт внутри неё
+    await session.execute(delete(MetalGreen).where(MetalGreen.warehouse_id == warehouse_id))
+    driver = await _driver_connection(session)
+    loaded = 0
+
+    def records() -> Iterator[tuple]:
+        nonlocal loaded
+        for record in _green_records(products, warehouse_id, datetime.now(), length_unit):
+            loaded += 1
+            yield record
+
+    # Строки уходят в COPY по мере генерации, список кортежей целиком не строится
+    await driver.copy_records_to_table(
+        MetalGreen.__tablename__,
+        records=records(),
+        columns=GREEN_COPY_COLUMNS,
+    )
+    return loaded
+
+
+async def promote_green_products(session: AsyncSession, *, green_warehouse_id: int, blue_warehouse_id: int) -> DiffStats:
+    """
+    Приводит позиции blue-склада к green-складу, трогая только изменившиеся строки:
+    - DELETE позиций, которых больше нет в прайсе (в т.ч. старых строк без content_hash);
+    - UPDATE цены и описания вне ключа (DETAIL_COLUMNS) там, где content_hash совпал, а они поменялись;
+    - INSERT ... SELECT новых content_hash.
+    Перед этим изменения дописываются в журнал цен (metal_price_history).
+    Из строк прайса с одинаковым ключом в каталог идёт самая дешёвая, остальные считаются
+    в stats.duplicates и перечисляются в duplicate_examples.
+    Всё выполняется на стороне БД в текущей транзакции.
+    """
+    cols = ", ".join(PRODUCT_COLUMNS + ("price_updated_at",))
+    params = {"blue_id": blue_warehouse_id, "green_id": green_warehouse_id}
+    green = (
+        "SELECT DISTINCT ON (content_hash) * FROM metal_green "
+        "WHERE warehouse_id = :green_id ORDER BY content_hash, price NULLS LAST, id"
+    )
+    stats = DiffStats()
+
+    await append_price_changes(session, green_sql=green, params=params, now=datetime.now())
+
+    result = await session.execute(
+        text(
+            "DELETE FROM metal m WHERE m.warehouse_id = :blue_id AND NOT EXISTS ("
+            "SELECT 1 FROM metal_green g WHERE g.warehouse_id = :green_id AND g.content_hash = m.content_hash)"
+        ),
+        params,
+    )
+    stats.deleted = result.rowcount
+
+    details = ", ".join(f"{col} = g.{col}" for col in DETAIL_COLUMNS)
+    details_changed = " OR ".join(f"m.{col} IS DISTINCT FROM g.{col}" for col in ("price",) + DETAIL_COLUMNS)
+    result = await session.execute(
+        text(
+            f"UPDATE metal m SET price = g.price, {details}, price_updated_at = CASE "
+            "WHEN m.price IS DISTINCT FROM g.price THEN g.price_updated_at ELSE m.price_updated_at END "
+            f"FROM ({green}) g "
+            "WHERE m.warehouse_id = :blue_id AND m.content_hash = g.content_hash "
+            f"AND ({details_changed})"
+        ),
+        params,
+    )
+    stats.updated = result.rowcount
+
+    result = await session.execute(
+        text(
+            f"INSERT INTO metal ({cols}, content_hash, warehouse_id) "
+            f"SELECT {cols}, content_hash, CAST(:blue_id AS integer) FROM ({green}) g "
+            "WHERE NOT EXISTS (SELECT 1 FROM metal m WHERE m.warehouse_id = :blue_id AND m.content_hash = g.content_hash)"
+        ),
+        params,
+    )
+    stats.inserted = result.rowcount
+
+    distinct, rows = (await session.execute(
+        text("SELECT COUNT(DISTINCT content_hash), COUNT(*) FROM metal_green WHERE warehouse_id = :green_id"),
+        {"green_id": green_warehouse_id},
+    )).one()
+    stats.unchanged = (distinct or 0) - stats.inserted - stats.updated
+    stats.duplicates = (rows or 0) - (distinct or 0)
+    return stats
+
+
+async def duplicate_examples(session: AsyncSession, green_warehouse_id: int, limit: int = 5) -> List[Tuple[str, int]]:
+    """Наименования позиций green-склада, встретившихся в прайсе несколько раз, и сколько раз."""
+    result = await session.execute(
+        text(
+            "SELECT min(name), COUNT(*) FROM metal_green WHERE warehouse_id = :green_id "
+            "GROUP BY content_hash HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC LIMIT :limit"
+        ),
+        {"green_id": green_warehouse_id, "limit": limit},
+    )
+    return [(name, count) for name, count in result.all()]
@@ -1,244 +1,64 @@
 # app/run.py
 import asyncio
+import json
 import os
-import sys
-from typing import Dict, List, Optional
-from datetime import datetime, timezone
-import aiofiles
+import time
+from uuid import uuid4
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+from datetime import date, datetime
 import httpx
 from playwright.async_api import async_playwright
-from sqlalchemy import delete, select, text
+from sqlalchemy import delete, func, select, text, update
 
 from app.db.session import create_tables, AsyncSessionLocal
-from app.parsers.excel_processor import process_excel_file
-from app.parsers.mc_ru_parser import process_mc_page_with_page
-from app.parsers.metallotorg_parser import parse_metallotorg_pdf
-from app.parsers.uralskaya_parser import process_uralskaya_metallobaza
+from app.parsers.browser_pool import BrowserPool
+from app.parsers.common import LENGTH_UNIT_M, ParsedPrice, ProductRecord
+from app.parsers.download_cache import CachedFile, DownloadCache
+from app.parsers.parse_cache import cached_parse
+from app.parsers.mc_ru_parser import BotProtectionError, create_mc_client, fetch_mc_html, fetch_mc_html_with_page
+from app.parsers.metallotorg_parser import shutdown_pdf_pool
+from app.parsers.registry import FetchStrategy, SupplierParser, Target, registered_parsers
+from app.parsers.resilience import CircuitOpenError, Resilience, RetryPolicy, retry_async
+import app.parsers.suppliers  # noqa: F401  регистрирует поставщиков в реестре
 from app.models.metal import Metal, MetalGreen
+from app.models.parser_run import ParserRun
 from app.models.warehouse import Warehouse, WarehouseGreen
-from app.parsers.parser import download_pricelist, select_moscow_if_needed
-
-EVRAZ_SUPPLIER = "ЕВРАЗ"
-MC_SUPPLIER = "Металлсервис"
-
-# ====== EVRAZ ======
-CITIES = {
-    "msk": "https://evraz.market/pricelist/?city=103",
-    "barnaul": "https://barnaul.evraz.market/pricelist/",
-    "belgorod": "https://belgorod.evraz.market/pricelist/",
-    "biisk": "https://biisk.evraz.market/pricelist/", 
-    "bryansk": "https://bryansk.evraz.market/pricelist/",
-    "vladivostok": "https://vladivostok.evraz.market/pricelist/", 
-    "vladimir": "https://vladimir.evraz.market/pricelist/",
-    "volgograd": "https://volgograd.evraz.market/pricelist/", 
-    "vrn": "https://vrn.evraz.market/pricelist/",
-    "ekb": "https://ekb.evraz.market/pricelist/", 
-    "irk": "https://irk.evraz.market/pricelist/",
-    "kzn": "https://kzn.evraz.market/pricelist/", 
-    "kirov": "https://kirov.evraz.market/pricelist/",
-    "krasnodar": "https://krasnodar.evraz.market/pricelist/", 
-    "krsk": "https://krsk.evraz.market/pricelist/",
-    "lipetsk": "https://lipetsk.evraz.market/pricelist/", 
-    "magnitogorsk": "https://magnitogorsk.evraz.market/pricelist/",
-    "minvody": "https://minvody.evraz.market/pricelist/", 
-    "chelny": "https://chelny.evraz.market/pricelist/",
-    "nn": "https://nn.evraz.market/pricelist/", 
-    "nizhniy-tagil": "https://nizhniy-tagil.evraz.market/pricelist/",
-    "novokuznetsk": "https://novokuznetsk.evraz.market/pricelist/", 
-    "nsk": "https://nsk.evraz.market/pricelist/",
-    "omsk": "https://omsk.evraz.market/pricelist/", 
-    "ornb": "https://ornb.evraz.market/pricelist/",
-    "penza": "https://penza.evraz.market/pricelist/", 
-    "prm": "https://prm.evraz.market/pricelist/",
-    "rostov": "https://rostov.evraz.market/pricelist/", 
-    "sam": "https://sam.evraz.market/pricelist/",
-    "spb": "https://spb.evraz.market/pricelist/", 
-    "saransk": "https://saransk.evraz.market/pricelist/",
-    "saratov": "https://saratov.evraz.market/pricelist/", 
-    "sochi": "https://sochi.evraz.market/pricelist/",
-    "oskol": "https://oskol.evraz.market/pricelist/", 
-    "taganrog": "https://taganrog.evraz.market/pricelist/",
-    "tula": "https://tula.evraz.market/pricelist/", 
-    "ulianovsk": "https://ulianovsk.evraz.market/pricelist/",
-    "ufa": "https://ufa.evraz.market/pricelist/", 
-    "khabarovsk": "https://khabarovsk.evraz.market/pricelist/",
-    "chel": "https://chel.evraz.market/pricelist/", 
-    "chita": "https://chita.evraz.market/pricelist/",
-    "sakhalinsk": "https://sakhalinsk.evraz.market/pricelist/",
-}
-
-CITY_CODES_TO_RUSSIAN = {
-    "msk": "Москва",
-    "barnaul": "Барнаул",
-    "belgorod": "Белгород",
-    "biisk": "Бийск",
-    "bryansk": "Брянск",
-    "vladivostok": "Владивосток",
-    "vladimir": "Владимир",
-    "volgograd": "Волгоград",
-    "vrn": "Воронеж",
-    "ekb": "Екатеринбург",
-    "irk": "Иркутск",
-    "kzn": "Казань",
-    "kirov": "Киров",
-    "krasnodar": "Краснодар",
-    "krsk": "Красноярск",
-    "lipetsk": "Липецк",
-    "magnitogorsk": "Магнитогорск",
-    "minvody": "Минеральные Воды",
-    "chelny": "Набережные Челны",
-    "nn": "Нижний Новгород",
-    "nizhniy-tagil": "Нижний Тагил",
-    "novokuznetsk": "Новокузнецк",
-    "nsk": "Новосибирск",
-    "omsk": "Омск",
-    "ornb": "Оренбург",
-    "penza": "Пенза",
-    "prm": "Пермь",
-    "rostov": "Ростов-на-Дону",
-    "sam": "Самара",
-    "spb": "Санкт-Петербург",
-    "saransk": "Саранск",
-    "saratov": "Саратов",
-    "sochi": "Сочи",
-    "oskol": "Старый Оскол",
-    "taganrog": "Таганрог",
-    "tula": "Тула",
-    "ulianovsk": "Ульяновск",
-    "ufa": "Уфа",
-    "khabarovsk": "Хабаровск",
-    "chel": "Челябинск",
-    "chita": "Чита",
-    "sakhalinsk": "Южно-Сахалинск",
-}
-
-MC_LINKS_BY_CITY: dict[str, list[str]] = {
-    #Москва и область (основные разделы MC + локальные страницы)
-    "Москва": [
-        "https://mc.ru/prices/kachestvst.htm?v=2",
-        "https://mc.ru/prices/sortovojprokat.htm?v=2",
-        "https://mc.ru/prices/listovojprokat.htm?v=2",
-        "https://mc.ru/prices/truby.htm?v=2",
-        "https://mc.ru/prices/metizy.htm?v=2",
-        "https://mc.ru/prices/cvetmet.htm?v=2",
-        "https://mc.ru/prices/engineering.htm?v=2",
-        "https://mc.ru/prices/krepezh.htm?v=2",
-        "https://mc.ru/prices/list_nerzh_sht.htm?v=2",
-        "https://mc.ru/prices/nerzhaveika.htm?v=2",
-        "https://mc.ru/prices/price_gaz.htm?v=2",
-        "https://mc.ru/prices/profnastil.htm?v=2",
-        "https://mc.ru/prices/price_noginsk.htm?v=2",
-        "https://mc.ru/prices/price_balash.htm?v=2",
-    ],
-
-    "Санкт-Петербург": [
-        "https://mc.ru/prices/filials/price_piter_ch.htm",
-        "https://mc.ru/prices/filials/price_piter_cvet.htm",
-    ],
-
-    "Нижний Новгород": [
-        "https://mc.ru/prices/filials/price_nnovgorod.htm",
-        "https://mc.ru/prices/filials/profnastil_nnovgorod.htm",
-        "https://mc.ru/prices/filials/price_nnovgorod_konovalova.htm",
-    ],
-
-    "Балаково": ["https://mc.ru/prices/filials/price_balakovo.htm"],
-    "Пенза": ["https://mc.ru/prices/filials/price_penza.htm"],
-    "Самара": ["https://mc.ru/prices/filials/price_samara.htm"],
-
-    "Чебоксары": [
-        "https://mc.ru/prices/filials/price_cheboksary.htm",
-        "https://mc.ru/prices/filials/price_cheboksary1.htm",
-    ],
-
-    "Брянск": ["https://mc.ru/prices/filials/price_br.htm"],
-    "Курск": ["https://mc.ru/prices/filials/price_kursk.htm"],
-    "Белгород": ["https://mc.ru/prices/filials/price_belgorod.htm"],
-    "Краснодар": ["https://mc.ru/prices/filials/price_krasnodar.htm"],
-    "Таганрог": ["https://mc.ru/prices/filials/price_taganrog.htm"],
-    "Юг": ["https://mc.ru/prices/filials/price_ug.htm"],
-
-    "Екатеринбург": [
-        "https://mc.ru/prices/filials/price_ekaterinburg.htm",
-        "https://mc.ru/prices/filials/price_ekat_prof.htm",
-    ],
-    "Пермь": ["https://mc.ru/prices/filials/price_perm.htm"],
-    "Челябинск": [
-        "https://mc.ru/prices/filials/price_chelyabinsk_pr.htm",
-        "https://mc.ru/prices/filials/price_chelyabinsk_prof.htm",
-    ],
-
-    "Кемерово": ["https://mc.ru/prices/filials/price_kemerovo.htm"],
-    "Барнаул": ["https://mc.ru/prices/filials/price_barnaul.htm"],
-    "Омск": ["https://mc.ru/prices/filials/price_omsk.htm"],
-    "Красноярск": ["https://mc.ru/prices/filials/price_krasnoyarsk.htm"],
-    "Сибирь": ["https://mc.ru/prices/filials/price_sib.htm"],
-
-    "Хабаровск": ["https://mc.ru/prices/filials/price_hab.htm"],
-}
-
-METALLOTORG_SUPPLIER = "Металлоторг"
-URALSKAYA_SUPPLIER = "Уральская металлобаза"
-
-METALLOTORG_LINKS_BY_CITY: dict[str, str] = {
-    "Белгород": "https://metallotorg.su/images/price/pdf/price-metall-belgorod-kreida.pdf",
-    "Брянск": "https://metallotorg.su/images/price/pdf/price-metall-bryansk.pdf",
-    "Владикавказ": "https://metallotorg.su/images/price/pdf/price-metall-vladikavkaz.pdf",
-    "Владимир": "https://metallotorg.su/images/price/pdf/price-metall-vladimir.pdf",
-    "Волгоград": "https://metallotorg.su/images/price/pdf/price-metall-volgograd.pdf",
-    "Воронеж": "https://metallotorg.su/images/price/pdf/price-metall-voronezh.pdf",
-    "Екатеринбург": "https://metallotorg.su/images/price/pdf/price-metall-ekaterinburg.pdf",
-    "Ижевск": "https://metallotorg.su/images/price/pdf/price-metall-izhevsk.pdf",
-    "Казань": "https://metallotorg.su/images/price/pdf/price-metall-kazan.pdf",
-    "Калуга": "https://metallotorg.su/images/price/pdf/price-metall-kaluga.pdf",
-    "Кемерово": "https://metallotorg.su/images/price/pdf/price-metall-kemerovo.pdf",
-    "Киров": "https://metallotorg.su/images/price/pdf/price-metall-kirov.pdf",
-    "Краснодар": "https://metallotorg.su/images/price/pdf/price-metall-titarovka.pdf",
-    "Курск": "https://metallotorg.su/images/price/pdf/price-metall-kursk.pdf",
-    "Липецк": "https://metallotorg.su/images/price/pdf/price-metall-lipeck.pdf",
-    "Лобня": "https://metallotorg.su/images/price/pdf/price-metall-lobnya.pdf",
-    "Махачкала": "https://metallotorg.su/images/price/pdf/price-metall-mahachkala.pdf",
-    "Набережные Челны": "https://metallotorg.su/images/price/pdf/price-metall-chelny.pdf",
-    "Нальчик": "https://metallotorg.su/images/price/pdf/price-metall-nalchik.pdf",
-    "Нижний Новгород": "https://metallotorg.su/images/price/pdf/price-metall-niznij-novgorod.pdf",
-    "Новокузнецк": "https://metallotorg.su/images/price/pdf/price-metall-novokuzneck.pdf",
-    "Новосибирск": "https://metallotorg.su/images/price/pdf/price-metall-novosibirsk.pdf",
-    "Новочеркасск": "https://metallotorg.su/images/price/pdf/price-metall-novocherkassk.pdf",
-    "Орел": "https://metallotorg.su/images/price/pdf/price-metall-orel.pdf",
-    "Оренбург": "https://metallotorg.su/images/price/pdf/price-metall-orenburg.pdf",
-    "Пенза": "https://metallotorg.su/images/price/pdf/price-metall-penza.pdf",
-    "Пермь": "https://metallotorg.su/images/price/pdf/price-metall-perm.pdf",
-    "Пятигорск": "https://metallotorg.su/images/price/pdf/price-metall-pyatigorsk.pdf",
-    "Ростов-на-Дону": "https://metallotorg.su/images/price/pdf/price-metall-rostov.pdf",
-    "Рязань": "https://metallotorg.su/images/price/pdf/price-metall-ryazan.pdf",
-    "Самара": "https://metallotorg.su/images/price/pdf/price-metall-samara.pdf",
-    "Санкт-Петербург": "https://metallotorg.su/images/price/pdf/price-metall-fornosovo-peterburg.pdf",
-    "Саранск": "https://metallotorg.su/images/price/pdf/price-metall-saransk.pdf",
-    "Саратов": "https://metallotorg.su/images/price/pdf/price-metall-saratov.pdf",
-    "Ставрополь": "https://metallotorg.su/images/price/pdf/price-metall-stavropol.pdf",
-    "Старый Оскол": "https://metallotorg.su/images/price/pdf/price-metall-staryi-oskol.pdf",
-    "Сызрань": "https://metallotorg.su/images/price/pdf/price-metall-syzran.pdf",
-    "Тверь": "https://metallotorg.su/images/price/pdf/price-metall-tver.pdf",
-    "Тула": "https://metallotorg.su/images/price/pdf/price-metall-tula-plehanovo.pdf",
-    "Тюмень": "https://metallotorg.su/images/price/pdf/price-metall-tumen.pdf",
-    "Ульяновск": "https://metallotorg.su/images/price/pdf/price-metall-ulyanovsk.pdf",
-    "Уфа": "https://metallotorg.su/images/price/pdf/price-metall-ufa.pdf",
-    "Чебоксары": "https://metallotorg.su/images/price/pdf/price-metall-cheboksary.pdf",
-    "Челябинск": "https://metallotorg.su/images/price/pdf/price-metall-chelyabinsk.pdf",
-    "Череповец": "https://metallotorg.su/images/price/pdf/price-metall-cherepovec.pdf",
-    "Чехов": "https://metallotorg.su/images/price/pdf/price-metall-chekhov.pdf",
-    "Электроугли": "https://metallotorg.su/images/price/pdf/price-metall-electrougli.pdf",
-    "Ярославль": "https://metallotorg.su/images/price/pdf/price-metall-yaroslavl.pdf",
-}
-
-
-
-async def finalize_green_to_blue(session, *, supplier: str, city: str) -> None:
+from app.parsers.parser import download_pricelist
+from app.parsers.scheduler import CityScheduler, print_report
+from app.parsers.telemetry import (
+    STATUS_EMPTY, STATUS_FAILED, STATUS_PARSED, STATUS_PENDING, STATUS_PROMOTED, STATUS_UNCHANGED,
+    RunTelemetry, TargetStats, write_prometheus,
+)
+from app.services.catalog_facets import rebuild_metal_facets
+from app.services.price_history import ensure_history_partitions, rollup_daily_prices, rollup_days
+from app.services.price_loader import (
+    LOADER_VERSION, DiffStats, copy_green_products, duplicate_examples, promote_green_products,
+)
+
+# После стольких задач браузерный контекст пересоздаётся (копится память вкладки и кэш страниц)
+BROWSER_CONTEXT_MAX_USES = 10
+# Каким способом (http/browser) удалось загрузить каждую страницу Металлсервиса в последний раз
+MC_FETCH_PATHS_FILE = os.path.join("downloads", "mc_fetch_paths.json")
+# Повторы скачивания файла по прямой ссылке и задачи города целиком (пауза растёт экспоненциально)
+DOWNLOAD_RETRY = RetryPolicy(attempts=3, base_delay=5.0)
+PAGE_RETRY = RetryPolicy(attempts=3, base_delay=2.0)
+TARGET_RETRY_DELAY = 5.0
+# Метрики последнего запуска в текстовом формате Prometheus (textfile collector node_exporter)
+PARSER_METRICS_FILE = os.path.join("downloads", "metrics", "parser_runs.prom")
+
+
+
+async def finalize_green_to_blue(session, *, supplier: str, city: str) -> Optional[DiffStats]:
     """
     Переносим данные из green -> blue по указанному поставщику и городу.
+    Вызывается внутри отдельной короткой транзакции на пару (поставщик, город):
+    поиск читает старый снимок склада до коммита и видит новый целиком после него.
     1) Берём WarehouseGreen (supplier, city)
     2) Находим/создаём Warehouse (blue) по city 
-    3) Переносим все MetalGreen -> Metal, проставляя warehouse_id синих таблиц
+    3) Применяем к Metal только разницу с MetalGreen (новые, изменившиеся, пропавшие позиции)
+       и возвращаем счётчики изменений (они попадают в parser_runs); если позиции поменялись,
+       увеличиваем Warehouse.data_version в той же транзакции (по нему сбрасывается кэш COUNT в /search)
     4) Очищаем green-таблицы по этому городу/поставщику
     """
     wg = await session.scalar(
@@ -264,8 +84,7 @@ async def finalize_green_to_blue(session, *, supplier: str, city: str) -> None:
                 WarehouseGreen.city == city, WarehouseGreen.supplier == supplier
             )
         )
-        await session.commit()
-        return
+        return None
 
     # Апсертим склад в синих таблицах. Ищем по паре (город, поставщик).
     wb = await session.scalar(
@@ -293,65 +112,76 @@ async def finalize_green_to_blue(session, *, supplier: str, city: str) -> None:
         wb.working_hours = wg.working_hours
         await session.flush()
 
-    # Переносим металл
-    mg_rows = (await session.scalars(
-        select(MetalGreen).where(MetalGreen.warehouse_id == wg.id)
-    )).all()
-
-    await session.execute(delete(Metal).where(Metal.warehouse_id == wb.id))
-
-    to_insert = []
-    for m in mg_rows:
-        to_insert.append(Metal(
-            name=m.name,
-            state_standard=m.state_standard,
-            category=m.category,
-            stamp=m.stamp,
-            diameter=m.diameter,
-            thickness=m.thickness,
-            width=m.width,
-            length=m.length,
-            material=m.material,
-            price=m.price,
-            unit=m.unit,
-            price_updated_at=m.price_updated_at,
-            comments=m.comments,
-            warehouse_id=wb.id,
-        ))
-    if to_insert:
-        session.add_all(to_insert)
-    await session.flush()
+    # Применяем разницу green -> blue на стороне БД
+    stats = await promote_green_products(session, green_warehouse_id=wg.id, blue_warehouse_id=wb.id)
+    if stats.inserted or stats.updated or stats.deleted:
+        await session.execute(
+            update(Warehouse).where(Warehouse.id == wb.id).values(data_version=Warehouse.data_version + 1)
+        )
+    print(
+        f"  - {supplier} / {city}: новых {stats.inserted}, изменено {stats.updated}, "
+        f"удалено {stats.deleted}, без изменений {stats.unchanged}."
+    )
+    if stats.duplicates:
+        examples = await duplicate_examples(session, wg.id)
+        print(
+            f"  - {supplier} / {city}: {stats.duplicates} строк прайса повторяют ключ другой позиции "
+            f"(в каталог взята самая дешёвая), например: "
+            + "; ".join(f"{name} ×{count}" for name, count in examples)
+        )
 
     # Очистка green-таблиц по данному городу/поставщику
     await session.execute(delete(MetalGreen).where(MetalGreen.warehouse_id == wg.id))
     await session.delete(wg)
-    # await session.commit()
+    return stats
 
 
-async def download_file(url: str, dest_path: str, retries: int = 3, delay: int = 5):
-    """Асинхронно скачивает файл по URL и сохраняет по указанному пути, с возможностью повторных попыток."""
-    # Используем httpx для асинхронных запросов
-    async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-        for attempt in range(retries):
-            try:
-                print(f"  - Попытка {attempt + 1}/{retries} скачать {url}")
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()  # Проверка на ошибки HTTP (4xx, 5xx)
-                async with aiofiles.open(dest_path, 'wb') as f:
-                    await f.write(response.content)
-                print(f"  - Файл успешно скачан: {dest_path}")
-                return dest_path
-            except (httpx.HTTPStatusError, httpx.RequestError) as e:
-                print(f"  - Ошибка при скачивании {url} (попытка {attempt + 1}): {e}")
-                if attempt + 1 == retries:
-                    print(f"  - Все {retries} попытки не удались. Пропускаю файл.")
-                    return None
-                print(f"  - Повторная попытка через {delay} секунд...")
-                await asyncio.sleep(delay)
-            except Exception as e:
-                print(f"  - Непредвиденная ошибка при скачивании файла {url}: {e}")
-                return None
-    return None
+def count_retry(stats: Optional[TargetStats]) -> Optional[Callable[[int, BaseException, float], None]]:
+    """on_retry для retry_async: каждая неудачная попытка — ошибка и повтор в телеметрии пары."""
+    if stats is None:
+        return None
+
+    def on_retry(attempt: int, exc: BaseException, delay: float) -> None:
+        stats.fail(exc)
+        stats.retries += 1
+    return on_retry
+
+
+async def download_file(
+    url: str,
+    key: str,
+    cache: DownloadCache,
+    client: httpx.AsyncClient,
+    resilience: Resilience,
+    policy: RetryPolicy = DOWNLOAD_RETRY,
+    stats: Optional[TargetStats] = None,
+) -> Optional[CachedFile]:
+    """
+    Условно скачивает файл по URL в постоянный кэш (ETag/Last-Modified).
+    Если файл не менялся, сервер отвечает 304 и тело не скачивается.
+    Сетевые ошибки и 5xx повторяются с растущей паузой; если сайт поставщика key уже признан недоступным,
+    запрос не отправляется вовсе. Повторы, ошибки и скачанные байты учитываются в stats.
+    """
+    print(f"  - Скачиваю {url}")
+    try:
+        cached = await resilience.call(key, lambda: cache.fetch(client, url), policy, on_retry=count_retry(stats))
+    except CircuitOpenError as e:
+        print(f"  - {e}. Пропускаю файл.")
+        if stats:
+            stats.fail(e)
+        return None
+    except Exception as e:
+        print(f"  - Не удалось скачать {url}: {e}. Пропускаю файл.")
+        if stats:
+            stats.fail(e)
+        return None
+    if cached.not_modified:
+        print(f"  - Файл не изменился на сервере (304): {cached.path}")
+    else:
+        print(f"  - Файл успешно скачан: {cached.path}")
+        if stats:
+            stats.bytes_downloaded += os.path.getsize(cached.path)
+    return cached
 
 async def get_or_create_green_warehouse(
     session,
@@ -407,136 +237,382 @@ async def clear_green_tables_for_supplier(session, supplier: str):
     await session.commit()
 
 
-async def replace_green_products_for_warehouse(session, warehouse_id: int, products: List[dict]) -> None:
-    await session.execute(delete(MetalGreen).where(MetalGreen.warehouse_id == warehouse_id))
-    to_insert = []
-    now = datetime.now()
-    for p in products:
-        if not p.get("name"):
-            continue
-        p["warehouse_id"] = warehouse_id
-        p["price_updated_at"] = now
-        to_insert.append(MetalGreen(**p))
-    if to_insert:
-        session.add_all(to_insert)
+async def replace_green_products_for_warehouse(
+    session, warehouse_id: int, products: List[ProductRecord], length_unit: str = LENGTH_UNIT_M
+) -> int:
+    return await copy_green_products(session, warehouse_id, products, length_unit=length_unit)
 
-async def process_evraz_city(session, context, city_code: str, url: str):
-    print(f"\n{'='*20}\nНачинаю обработку города: {city_code.upper()}\n{'='*20}")
-    page = await context.new_page()
-    file_path = None
+async def save_to_green(
+    *,
+    supplier: str,
+    city: str,
+    products: List[ProductRecord],
+    length_unit: str = LENGTH_UNIT_M,
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    legal_entity: Optional[str] = None,
+    working_hours: Optional[str] = None,
+) -> None:
+    """
+    Записывает позиции одной пары (поставщик, город) в green-таблицы
+    своей сессией и своей транзакцией: ошибка в другом городе эту запись не откатит.
+    """
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            wh_g = await get_or_create_green_warehouse(
+                session,
+                city=city,
+                supplier=supplier,
+                phone=phone,
+                email=email,
+                legal_entity=legal_entity,
+                working_hours=working_hours,
+            )
+            await replace_green_products_for_warehouse(session, wh_g.id, products, length_unit)
 
-    try:
-        if city_code == "msk":
-            print("  - Перехожу на https://evraz.market/pricelist/ и выбираю Москву вручную")
-            await page.goto("https://evraz.market/pricelist/", wait_until="load", timeout=45_000)
-            await select_moscow_if_needed(page)
 
-        print(f"  - Перехожу на страницу: {url}")
-        await page.goto(url, wait_until="load", timeout=45_000)
+async def promote_green_to_blue(telemetry: RunTelemetry, on_promoted: Optional[Callable[[str, str], None]] = None) -> None:
+    """
+    Переносит каждую пару (поставщик, город) из green в blue отдельной транзакцией.
+    Пары, у которых в этом запуске были ошибки (например, пропущенные страницы), не переносятся:
+    их green неполон, и перенос удалил бы из blue всё, что не скачалось. blue такой пары остаётся прежним.
+    on_promoted(supplier, city) вызывается после коммита каждой пары.
+    Время переноса, счётчики изменений и статус пары записываются в telemetry.
+    После переноса пересобираются дневная свёртка цен и фасеты фильтров (metal_facets).
+    """
+    # Секции журнала нужны на все даты цен из green и на дни свёртки (запуск может перейти через полночь)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            days = await rollup_days(session, date.today())
+            first, last = (await session.execute(
+                select(func.min(MetalGreen.price_updated_at), func.max(MetalGreen.price_updated_at))
+            )).one()
+            await ensure_history_partitions(
+                session,
+                min(days[0], first.date()) if first else days[0],
+                max(date.today(), last.date()) if last else date.today(),
+            )
+        stmt = select(WarehouseGreen.supplier, WarehouseGreen.city).distinct()
+        all_parsed_pairs = (await session.execute(stmt)).all()
 
-        file_path = await download_pricelist(page, city_code)
+    for supplier, city in all_parsed_pairs:
+        stats = telemetry.target(supplier, city)
+        if stats.errors:
+            print(f"  - {supplier} / {city}: ошибок при загрузке {stats.errors}, blue не трогаю.")
+            continue
+        try:
+            with stats.stage("promote"):
+                async with AsyncSessionLocal() as session:
+                    async with session.begin():
+                        diff = await finalize_green_to_blue(session, supplier=supplier, city=city)
+            if diff:
+                stats.inserted, stats.updated = diff.inserted, diff.updated
+                stats.deleted, stats.unchanged = diff.deleted, diff.unchanged
+                stats.duplicates = diff.duplicates
+            stats.status = STATUS_PROMOTED
+            print(f"  - {supplier} / {city}: blue обновлён.")
+            if on_promoted:
+                on_promoted(supplier, city)
+        except Exception as e:
+            stats.fail(e)
+            stats.status = STATUS_FAILED
+            print(f"!!! ОШИБКА при переносе {supplier} / {city} в blue: {e}. Склад остаётся в прежнем состоянии.")
 
-        products, warehouse_contacts = process_excel_file(file_path)
-        print(f"  - Найдено {len(products)} позиций в прайс-листе.")
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            for day in days:
+                rows = await rollup_daily_prices(session, day)
+                print(f"  - Дневная свёртка цен за {day}: {rows} позиций.")
 
-        city_name = CITY_CODES_TO_RUSSIAN.get(city_code, city_code.capitalize())
-        phone = (warehouse_contacts or {}).get("phone")
-        email = (warehouse_contacts or {}).get("email")
+    # Выпадающие списки /filters/* переключаются на новый набор сочетаний одним коммитом
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            rows = await rebuild_metal_facets(session)
+    print(f"  - Фасеты фильтров пересобраны: {rows} сочетаний.")
 
-        wh_g = await get_or_create_green_warehouse(
-            session,
-            city=city_name,
-            supplier=EVRAZ_SUPPLIER,
-            phone=phone,
-            email=email,
-        )
-        await replace_green_products_for_warehouse(session, wh_g.id, products)
 
-        print(f"  - Данные для города {city_name} сохранены в green-таблицы.")
+async def save_run_telemetry(telemetry: RunTelemetry) -> None:
+    """Одна строка parser_runs на каждую пару (поставщик, город) запуска, включая упавшие и пропущенные."""
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            session.add_all(
+                ParserRun(run_id=telemetry.run_id, **stats.as_row())
+                for stats in telemetry.targets()
+            )
 
-    finally:
-        try:
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"  - Временный файл {file_path} удален.")
-        except Exception:
-            pass
 
-        await page.close()
+def print_stage_report(telemetry: RunTelemetry) -> None:
+    """Суммарное время этапов по поставщикам: где ушла ночь — в загрузке, разборе или записи в БД."""
+    totals: Dict[str, Dict[str, float]] = {}
+    for stats in telemetry.targets():
+        row = totals.setdefault(stats.supplier, dict.fromkeys(("fetch", "parse", "green", "promote", "mb"), 0.0))
+        row["fetch"] += stats.fetch_seconds
+        row["parse"] += stats.parse_seconds
+        row["green"] += stats.green_seconds
+        row["promote"] += stats.promote_seconds
+        row["mb"] += stats.bytes_downloaded / (1024 * 1024)
+    print("Время этапов по поставщикам (сумма по городам):")
+    for supplier, row in totals.items():
+        print(
+            f"  {supplier}: загрузка {row['fetch']:.1f} c ({row['mb']:.1f} МБ), разбор {row['parse']:.1f} c, "
+            f"green {row['green']:.1f} c, blue {row['promote']:.1f} c"
+        )
+
+
+def load_mc_fetch_paths(path: str = MC_FETCH_PATHS_FILE) -> Dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_mc_fetch_paths(fetch_paths: Dict[str, dict], path: str = MC_FETCH_PATHS_FILE) -> None:
+    """Сохраняет, каким способом (http/browser) в последний раз удалось получить каждую страницу МС."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fetch_paths, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    counts: Dict[str, int] = {}
+    for entry in fetch_paths.values():
+        counts[entry["path"]] = counts.get(entry["path"], 0) + 1
+    print(f"[MC] Способ загрузки страниц: {counts}")
+
+
+@dataclass
+class FetchContext:
+    """Общие для всех поставщиков клиенты, кэш и пулы браузера одного запуска."""
+    client: httpx.AsyncClient  # файлы по прямым ссылкам
+    pages_client: httpx.AsyncClient  # HTML-страницы (HTTP/2)
+    cache: DownloadCache
+    pools: Dict[str, BrowserPool]  # пул вкладок по поставщику
+    fetch_paths: Dict[str, dict]  # каким способом (http/browser) получена каждая страница
+    telemetry: RunTelemetry
+    resilience: Resilience  # выключатели и ограничители запросов по поставщикам
+
+
+@dataclass
+class Source:
+    """Один полученный источник прайса: путь к файлу или HTML страницы."""
+    url: str
+    path: Optional[str] = None
+    html: Optional[str] = None
+    cached: Optional[CachedFile] = None
+    temporary: bool = False
+
+
+async def fetch_browser_download(parser: SupplierParser, target: Target, ctx: FetchContext) -> List[Source]:
+    pages = ctx.pools[parser.supplier]
+    sources: List[Source] = []
+    async with pages.page() as page:
+        if parser.prepare:
+            await parser.prepare(page, target)
+        for url in target.urls:
+            print(f"  - Перехожу на страницу: {url}")
+
+            async def open_and_download(url=url):
+                # Ждать load незачем: кнопку скачивания download_pricelist ждёт сама
+                await page.goto(url, wait_until="domcontentloaded", timeout=45_000)
+                return await download_pricelist(page, target.key, metrics=pages.metrics)
+
+            # Повторяет город целиком process_target_with_retries; здесь — выключатель и лимит поставщика
+            file_path = await ctx.resilience.call(parser.key, open_and_download)
+            ctx.telemetry.target(parser.supplier, target.city).bytes_downloaded += os.path.getsize(file_path)
+            sources.append(Source(url=url, path=file_path, temporary=True))
+    return sources
+
+
+async def blue_has_rows(supplier: str, city: str) -> bool:
+    """Есть ли в blue позиции склада (поставщик, город)."""
+    async with AsyncSessionLocal() as session:
+        return bool(await session.scalar(
+            select(
+                select(Metal.id)
+                .join(Warehouse, Metal.warehouse_id == Warehouse.id)
+                .where(Warehouse.supplier == supplier, Warehouse.city == city)
+                .exists()
+            )
+        ))
 
 
-async def process_mc_city_with_browser(session, context, city_name: str, urls: List[str]) -> None:
+async def fetch_http_files(parser: SupplierParser, target: Target, ctx: FetchContext) -> List[Source]:
     """
-    Парсинг Металлсервиса через Playwright: надёжнее, чем httpx.
-    Складываем в GREEN, затем finalization в BLUE и очистка GREEN.
+    Файлы цели через кэш загрузок. Если ни один не изменился с последней успешной загрузки
+    и blue склада не пуст, разбор пропускается и blue остаётся как есть. Отметка загрузки хранится
+    на диске, поэтому после сброса или восстановления базы склад проверяется по самой базе.
+    Если какой-то файл не скачался, город считается упавшим.
     """
-    print(f"\n--- Металлсервис: {city_name} ---")
-    all_products: List[dict] = []
-
-    page = await context.new_page()
+    stats = ctx.telemetry.target(parser.supplier, target.city)
+    downloads = [await download_file(url, parser.key, ctx.cache, ctx.client, ctx.resilience, stats=stats) for url in target.urls]
+    if not all(downloads):
+        stats.status = STATUS_FAILED
+        return []
+    if not any(cached.changed for cached in downloads) and await blue_has_rows(parser.supplier, target.city):
+        print(f"  - Прайс {target.city} ({parser.supplier}) не изменился, разбор пропущен.")
+        stats.status = STATUS_UNCHANGED
+        return []
+    return [Source(url=cached.url, path=cached.path, cached=cached) for cached in downloads]
+
+
+async def fetch_page_html(parser: SupplierParser, city: str, url: str, ctx: FetchContext) -> str:
+    """
+    Сначала обычный HTTP/2-запрос, браузер — только если сработала антибот-защита.
+    Успешный способ записывается в ctx.fetch_paths.
+    """
+    on_retry = count_retry(ctx.telemetry.target(parser.supplier, city))
     try:
-        await page.route(
-            "**/*",
-            lambda route: route.abort()
-            if route.request.resource_type in {"image", "stylesheet", "font", "media"}
-            else route.continue_(),
-        )
-
-        for url in urls:
-            try:
-                products, _ = await process_mc_page_with_page(page, url)
-                all_products.extend(products)
-                print(f"[MC] {city_name}: {len(products)} позиций ({url})")
-            except Exception as e:
-                print(f"[MC] FAIL {city_name}: {e} ({url})")
-    finally:
-        await page.close()
+        html = await ctx.resilience.call(parser.key, lambda: fetch_mc_html(ctx.pages_client, url), PAGE_RETRY, on_retry=on_retry)
+        path = "http"
+    except BotProtectionError as e:
+        print(f"[{parser.supplier}] Антибот-защита ({e}), открываю в браузере: {url}")
+
+        async def fetch_with_browser():
+            async with ctx.pools[parser.supplier].page() as page:
+                return await fetch_mc_html_with_page(page, url)
+
+        # Таймауты повторяет сам fetch_mc_html_with_page
+        html = await ctx.resilience.call(parser.key, fetch_with_browser)
+        path = "browser"
+    ctx.fetch_paths[url] = {"path": path, "at": datetime.now().isoformat(timespec="seconds")}
+    return html
+
+
+async def fetch_html_pages(parser: SupplierParser, target: Target, ctx: FetchContext) -> List[Source]:
+    stats = ctx.telemetry.target(parser.supplier, target.city)
+    sources: List[Source] = []
+    for url in target.urls:
+        try:
+            html = await fetch_page_html(parser, target.city, url, ctx)
+        except CircuitOpenError:
+            # Поставщик недоступен: остальные страницы города упадут так же, город целиком считается упавшим
+            raise
+        except Exception as e:
+            if not parser.skip_failed_sources:
+                raise
+            stats.fail(e)
+            print(f"[{parser.supplier}] FAIL {target.city}: {e} ({url})")
+            continue
+        stats.bytes_downloaded += len(html.encode("utf-8"))
+        sources.append(Source(url=url, html=html))
+    return sources
 
-    if not all_products:
-        print(f"[MC] {city_name}: ничего не распарсили")
-        return
 
-    wh_g = await get_or_create_green_warehouse(
-        session,
-        city=city_name,
-        supplier=MC_SUPPLIER,
-    )
-    await replace_green_products_for_warehouse(session, wh_g.id, all_products)
-    print(f"[MC] {city_name}: сохранено {len(all_products)} позиций в green-таблицы.")
+FETCHERS: Dict[FetchStrategy, Callable[[SupplierParser, Target, FetchContext], Awaitable[List[Source]]]] = {
+    FetchStrategy.BROWSER_DOWNLOAD: fetch_browser_download,
+    FetchStrategy.HTTP_FILE: fetch_http_files,
+    FetchStrategy.HTTP_PAGES: fetch_html_pages,
+}
 
 
-async def process_metallotorg_city(session, city_name: str, url: str):
+async def parse_source(parser: SupplierParser, source: Source) -> ParsedPrice:
     """
-    Скачивает PDF прайс-лист Металлоторга, парсит его и сохраняет данные.
+    Разбор — чистый CPU, уводим из event loop, чтобы не тормозить остальные задачи.
+    Байт-в-байт тот же файл, что уже разбирался этой версией парсера, берётся из кэша.
     """
-    print(f"\n--- Металлоторг: {city_name} ---")
-    DOWNLOADS_DIR = "downloads"
-    os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+    if source.html is not None:
+        return await asyncio.to_thread(lambda: parser.parse(source.html).materialize())
+    sha256 = source.cached.sha256 if source.cached else None
+    return await asyncio.to_thread(cached_parse, parser.parse, source.path, sha256=sha256)
 
-    file_name = url.split('/')[-1]
-    file_path = os.path.join(DOWNLOADS_DIR, f"metallotorg_{city_name.replace(' ', '_')}_{file_name}")
 
+async def process_target(parser: SupplierParser, target: Target, ctx: FetchContext) -> int:
+    """
+    Одна задача поставщика: получает источники способом parser.fetch, разбирает их parser.parse
+    и складывает все позиции города в GREEN своей транзакцией. Возвращает число позиций.
+    Время загрузки, разбора и записи в green копится в ctx.telemetry.
+    """
+    print(f"\n--- {parser.supplier}: {target.city} ---")
+    stats = ctx.telemetry.target(parser.supplier, target.city)
+    with stats.stage("fetch"):
+        sources = await FETCHERS[parser.fetch](parser, target, ctx)
+    if not sources:
+        if stats.status == STATUS_PENDING:
+            # Все страницы цели упали (skip_failed_sources) или ссылок нет
+            stats.status = STATUS_FAILED if stats.errors else STATUS_EMPTY
+        return 0
+    records: List[ProductRecord] = []
+    contacts: Dict[str, Optional[str]] = {}
     try:
-        downloaded_path = await download_file(url, file_path, retries=3)
-        if not downloaded_path:
-            return
-
-        products = parse_metallotorg_pdf(downloaded_path)
-        print(f"  - Найдено {len(products)} позиций в прайс-листе.")
+        for source in sources:
+            try:
+                with stats.stage("parse"):
+                    parsed = await parse_source(parser, source)
+            except Exception as e:
+                if not parser.skip_failed_sources:
+                    raise
+                stats.fail(e)
+                print(f"[{parser.supplier}] FAIL {target.city}: {e} ({source.url})")
+                continue
+            records.extend(parsed.records)
+            contacts.update({key: value for key, value in parsed.contacts.items() if value})
+            print(f"  - {target.city}: {len(parsed.records)} позиций ({source.url})")
+    finally:
+        for source in sources:
+            if source.temporary and source.path and os.path.exists(source.path):
+                try:
+                    os.remove(source.path)
+                    print(f"  - Временный файл {source.path} удален.")
+                except OSError:
+                    pass
+
+    if not records:
+        print(f"  - {parser.supplier} / {target.city}: ничего не распарсили")
+        stats.status = STATUS_EMPTY
+        return 0
+
+    with stats.stage("green"):
+        await save_to_green(
+            supplier=parser.supplier,
+            city=target.city,
+            products=records,
+            length_unit=parser.length_unit,
+            phone=contacts.get("phone"),
+            email=contacts.get("email"),
+            legal_entity=contacts.get("legal_entity"),
+            working_hours=contacts.get("working_hours"),
+        )
+    stats.rows_parsed = len(records)
+    stats.status = STATUS_PARSED
+    for source in sources:
+        if source.cached:
+            ctx.cache.mark_pending(parser.supplier, target.city, source.cached)
+    print(f"  - Данные для города {target.city} ({parser.supplier}) сохранены в green-таблицы: {len(records)} позиций.")
+    return len(records)
 
-        if not products:
-            return
 
-        wh_g = await get_or_create_green_warehouse(
-            session, city=city_name, supplier=METALLOTORG_SUPPLIER
+async def process_target_with_retries(parser: SupplierParser, target: Target, ctx: FetchContext) -> int:
+    """
+    Повторяет задачу города до parser.attempts раз с растущей паузой.
+    Если хост поставщика признан недоступным (CircuitOpenError), город сразу считается упавшим.
+    """
+    stats = ctx.telemetry.target(parser.supplier, target.city)
+    try:
+        return await retry_async(
+            lambda: process_target(parser, target, ctx),
+            RetryPolicy(attempts=parser.attempts, base_delay=TARGET_RETRY_DELAY),
+            retryable=lambda e: True,
+            on_retry=count_retry(stats),
+            label=f"{parser.supplier} / {target.city}",
         )
-        await replace_green_products_for_warehouse(session, wh_g.id, products)
-        print(f"  - Данные для города {city_name} ({METALLOTORG_SUPPLIER}) сохранены в green-таблицы.")
+    except Exception as e:
+        print(f"!!! ОШИБКА {parser.supplier} / {target.city}: {e}")
+        stats.fail(e)
+        stats.status = STATUS_FAILED
+        raise
+
+
+def build_scheduler(parsers: List[SupplierParser], ctx: FetchContext) -> CityScheduler:
+    """Собирает задачи всех зарегистрированных поставщиков в один планировщик."""
+    scheduler = CityScheduler({parser.supplier: parser.concurrency for parser in parsers})
+    for parser in parsers:
+        for target in parser.targets:
+            scheduler.add(
+                parser.supplier, target.city,
+                lambda parser=parser, target=target: process_target_with_retries(parser, target, ctx),
+            )
+    return scheduler
 
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"  - Временный файл {file_path} удален.")
 
 async def main():
     print("Creating sequence for request display_id...")
@@ -549,85 +625,87 @@ async def main():
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
+        parsers = registered_parsers()
+        # Свой пул вкладок каждому поставщику, которому нужен браузер (параметры пула — из реестра)
+        pools = {
+            parser.supplier: BrowserPool(
+                browser,
+                parser.concurrency,
+                max_uses=BROWSER_CONTEXT_MAX_USES,
+                **parser.browser,
             )
+            for parser in parsers
+            if parser.uses_browser
+        }
+        await asyncio.gather(*(pool.start() for pool in pools.values()))
+        client = httpx.AsyncClient(
+            timeout=120.0,
+            verify=False,
+            limits=httpx.Limits(max_connections=max(
+                [p.concurrency for p in parsers if p.fetch is FetchStrategy.HTTP_FILE], default=1,
+            )),
+        )
+        pages_client = create_mc_client(max(
+            [p.concurrency for p in parsers if p.fetch is FetchStrategy.HTTP_PAGES], default=1,
+        ))
+        download_cache = DownloadCache(loader_version=LOADER_VERSION)
+        resilience = Resilience()
+        for parser in parsers:
+            resilience.set_rate_limit(parser.key, parser.rate_limit)
+        ctx = FetchContext(
+            client=client,
+            pages_client=pages_client,
+            cache=download_cache,
+            pools=pools,
+            fetch_paths=load_mc_fetch_paths(),
+            telemetry=RunTelemetry(uuid4().hex),
+            resilience=resilience,
         )
 
-        # Используем одну сессию для всего процесса
-        async with AsyncSessionLocal() as session:
-            try:
-                # 1. Очищаем зеленые таблицы в начале транзакции
-                print("="*50)
-                print("ШАГ 1: Очистка green-таблиц перед запуском...")
-                await clear_green_tables_for_supplier(session, EVRAZ_SUPPLIER)
-                await clear_green_tables_for_supplier(session, MC_SUPPLIER)
-                await clear_green_tables_for_supplier(session, METALLOTORG_SUPPLIER)
-                await clear_green_tables_for_supplier(session, URALSKAYA_SUPPLIER)
-                print("Green-таблицы очищены.")
-                print("="*50)
-
-                # 2. Запускаем все парсеры, которые наполняют зеленые таблицы
-                print("\nШАГ 2: Запуск парсеров для наполнения green-таблиц...")
-                # EVRAZ
-                MAX_RETRIES_EVRAZ = 2
-                for city_code, url in CITIES.items():
-                    for attempt in range(MAX_RETRIES_EVRAZ):
-                        try:
-                            await process_evraz_city(session, context, city_code, url)
-                            break
-                        except Exception as e:
-                            print(f"!!! ОШИБКА при обработке города ЕВРАЗ '{city_code.upper()}' (попытка {attempt + 1}/{MAX_RETRIES_EVRAZ}): {e}")
-                            if attempt + 1 >= MAX_RETRIES_EVRAZ:
-                                print(f"!!! Все попытки для города '{city_code.upper()}' провалились. Пропускаю.")
-                            else:
-                                print("--- Повторная попытка через 5 секунд...")
-                                await asyncio.sleep(5)
-
-                # MC — тем же контекстом, город за городом
-                for city_name, urls in MC_LINKS_BY_CITY.items():
-                    try:
-                        await process_mc_city_with_browser(session, context, city_name, urls)
-                    except Exception as e:
-                        print(f"!!! ОШИБКА при обработке города Металлсервис '{city_name}': {e}")
-
-                # Metallotorg
-                for city_name, url in METALLOTORG_LINKS_BY_CITY.items():
-                    try:
-                        await process_metallotorg_city(session, city_name, url)
-                    except Exception as e:
-                        print(f"!!! ОШИБКА при обработке города Металлоторг '{city_name}': {e}")
-
-                # Уральская металлобаза
-                try:
-                    await process_uralskaya_metallobaza(session, "Екатеринбург")
-                except Exception as e:
-                    print(f"!!! ОШИБКА при обработке Уральской металлобазы: {e}")
-
-                # 3. Финализируем все данные из green в blue таблицы
-                print("\nШАГ 3: Перенос всех данных из green в blue таблицы...")
-                stmt = select(WarehouseGreen.supplier, WarehouseGreen.city).distinct()
-                all_parsed_pairs = (await session.execute(stmt)).all()
-
-                for supplier, city in all_parsed_pairs:
-                    await finalize_green_to_blue(session, supplier=supplier, city=city)
-
-                # 4. Коммитим всю транзакцию
-                await session.commit()
-                print("\n" + "="*50)
-                print("Парсинг и обновление завершены успешно.")
-                print("="*50)
-
-            except Exception as e:
-                print(f"\n!!! КРИТИЧЕСКАЯ ОШИБКА В ОСНОВНОМ БЛОКЕ: {e}. Откат транзакции.")
-                await session.rollback()
-            finally:
-                await context.close()
-                await browser.close()
-
+        try:
+            # 1. Очищаем зеленые таблицы (своя короткая транзакция)
+            print("="*50)
+            print("ШАГ 1: Очистка green-таблиц перед запуском...")
+            async with AsyncSessionLocal() as session:
+                for parser in parsers:
+                    await clear_green_tables_for_supplier(session, parser.supplier)
+            print("Green-таблицы очищены.")
+            print("="*50)
+
+            # 2. Запускаем все парсеры одновременно; каждый город коммитится в green сам
+            print("\nШАГ 2: Запуск парсеров для наполнения green-таблиц...")
+            scheduler = build_scheduler(parsers, ctx)
+            started = time.perf_counter()
+            results = await scheduler.run()
+            print_report(results)
+            print_stage_report(ctx.telemetry)
+            resilience.report()
+            save_mc_fetch_paths(ctx.fetch_paths)
+            for supplier, pool in pools.items():
+                pool.metrics.report(supplier)
+            print(f"Парсинг занял {time.perf_counter() - started:.1f} c")
+
+            # 3. Переносим green -> blue: по одной транзакции на склад
+            print("\nШАГ 3: Перенос всех данных из green в blue таблицы...")
+            await promote_green_to_blue(ctx.telemetry, on_promoted=download_cache.confirm)
+            await save_run_telemetry(ctx.telemetry)
+
+            print("\n" + "="*50)
+            print("Парсинг и обновление завершены успешно.")
+            print("="*50)
+
+        except Exception as e:
+            print(f"\n!!! КРИТИЧЕСКАЯ ОШИБКА В ОСНОВНОМ БЛОКЕ: {e}.")
+        finally:
+            # Файл метрик пишется и после аварии: по нему видно, на каком этапе всё встало
+            write_prometheus(ctx.telemetry.to_prometheus(), PARSER_METRICS_FILE)
+            print(f"Метрики запуска: {PARSER_METRICS_FILE}")
+            shutdown_pdf_pool()
+            await client.aclose()
+            await pages_client.aclose()
+            for pool in pools.values():
+                await pool.close()
+            await browser.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Сравнение построчного (iterrows) и колоночного разбора прайсов ЕВРАЗ.
+
+Запуск из каталога backend:
+    python -m scripts.bench_evraz_excel downloads/evraz/*.xlsx
+    python -m scripts.bench_evraz_excel --generate 40     # синтетические прайсы, если реальных под рукой нет
+
+Для каждого файла проверяется, что оба варианта дают одинаковый результат, и печатается ускорение —
+общее и в итоге без учёта чтения xlsx (оно одинаково в обоих вариантах и занимает львиную долю времени).
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parsers import excel_processor  # noqa: E402
+from app.parsers.common import ProductRecord  # noqa: E402
+from app.parsers.excel_processor import parse_dimension, parse_price, parse_thickness_from_name  # noqa: E402
+
+
+def legacy_find_header_row(df, title='Номенклатура'):
+    for i in range(len(df)):
+        if title in df.iloc[i].astype(str).values:
+            return i
+    return -1
+
+
+def legacy_sheet_products(data_df, final_col_map, price_col, category_name):
+    """Прежний построчный цикл из process_excel_file (словари переводятся в ProductRecord для сравнения)."""
+    products = []
+    for _, row in data_df.iterrows():
+        name_val = row.iloc[final_col_map['name']]
+        if pd.isna(name_val):
+            continue
+        if pd.notna(row.iloc[0]) and pd.isna(row.iloc[1]):
+            continue
+
+        product_data = {'category': category_name, 'material': None}
+        for field, position in final_col_map.items():
+            raw_value = row.iloc[position]
+            if field in ['name', 'state_standard', 'stamp']:
+                value = str(raw_value).strip() if pd.notna(raw_value) else None
+                product_data[field] = value if value else None
+            else:
+                product_data[field] = parse_dimension(raw_value)
+
+        product_data['price'] = parse_price(row.iloc[price_col]) if price_col is not None else None
+        product_data['thickness'] = parse_thickness_from_name(product_data.get('name'))
+        product_data['comments'] = None
+        products.append(ProductRecord.from_dict(product_data))
+    return products
+
+
+def run(file_path, legacy):
+    """Разбирает файл одним из вариантов; печать парсера глушится."""
+    originals = excel_processor.find_header_row, excel_processor.sheet_products
+    if legacy:
+        excel_processor.find_header_row = legacy_find_header_row
+        excel_processor.sheet_products = legacy_sheet_products
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = excel_processor.process_excel_file(file_path)
+            return result, time.perf_counter() - started
+    finally:
+        excel_processor.find_header_row, excel_processor.sheet_products = originals
+
+
+def read_time(file_path):
+    started = time.perf_counter()
+    pd.read_excel(file_path, sheet_name=None, header=None)
+    return time.perf_counter() - started
+
+
+def generate_price_list(path, sheets=6, rows=800, seed=0):
+    """Прайс в разметке ЕВРАЗ: контакты в C1, двухстрочная шапка, блоки цен по объёму."""
+    rnd = random.Random(seed)
+    prices = ['', '12 500', '98 400 за 1 т', '1 234,5 за 1 т\n12,3 за 1 м', 'по запросу', '87 650 за 1т', 64250.0]
+    sizes = ['', '6', '11,7', '6.0 м', '12 мм', 'н/д', 2.5]
+    with pd.ExcelWriter(path) as writer:
+        for s in range(sheets):
+            data = [
+                [None, None, 'Телефон: +7 (343) 000-00-00, e-mail: sales@example.ru', None, None, None, None],
+                [None] * 7,
+                ['№', 'Номенклатура', 'ГОСТ/ТУ', 'Марка стали', 'Длина, м', 'до 0,1 т', '0,1 - 0,25 т'],
+                [None, None, None, None, None, 'Цена за 1 т', 'Цена за 1 т'],
+            ]
+            for i in range(rows):
+                if i % 50 == 0:
+                    data.append([f'Раздел {i // 50}', None, None, None, None, None, None])
+                    continue
+                name = rnd.choice(['Лист г/к {}х1500х6000', 'Труба {},5х3', 'Арматура А500С {}', '  Круг {}  ', 'Уголок 50х50х{}'])
+                data.append([
+                    i,
+                    name.format(rnd.randint(1, 40)) if rnd.random() > 0.02 else None,
+                    rnd.choice(['ГОСТ 19903-2015', 'ТУ 14-1-5254', None, '  ']),
+                    rnd.choice(['Ст3сп', '09Г2С', None, 345]),
+                    rnd.choice(sizes),
+                    rnd.choice(prices),
+                    rnd.choice(prices),
+                ])
+            pd.DataFrame(data).to_excel(writer, sheet_name=f'Сортовой прокат {s}', header=False, index=False)
+
+
+def speedup(old, new):
+    return max(old, 0.0) / max(new, 1e-3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='прайсы ЕВРАЗ (xlsx/xls)')
+    parser.add_argument('--generate', type=int, default=0, help='сколько синтетических прайсов создать')
+    parser.add_argument('--rows', type=int, default=800, help='строк на лист в синтетических прайсах')
+    args = parser.parse_args()
+
+    files = list(args.files)
+    tmp_dir = None
+    if args.generate:
+        tmp_dir = tempfile.TemporaryDirectory()
+        for n in range(args.generate):
+            path = os.path.join(tmp_dir.name, f'evraz_{n}.xlsx')
+            generate_price_list(path, rows=args.rows, seed=n)
+            files.append(path)
+    if not files:
+        parser.error('укажите файлы прайсов или --generate N')
+
+    total_old = total_new = total_read = 0.0
+    mismatches = 0
+    for path in files:
+        old, t_old = run(path, legacy=True)
+        new, t_new = run(path, legacy=False)
+        t_read = read_time(path)
+        total_old += t_old
+        total_new += t_new
+        total_read += t_read
+        same = old == new
+        mismatches += not same
+        print(f"{os.path.basename(path):40s} {len(new[0]):6d} поз.  iterrows {t_old:7.3f} c  колонки {t_new:7.3f} c  "
+              f"x{t_old / max(t_new, 1e-9):5.1f}  "
+              f"{'OK' if same else 'РАЗЛИЧИЕ'}")
+
+    print(f"\nИтого: {len(files)} файлов, iterrows {total_old:.2f} c, колонки {total_new:.2f} c, "
+          f"чтение xlsx {total_read:.2f} c, ускорение x{total_old / max(total_new, 1e-9):.1f} "
+          f"(разбор без чтения x{speedup(total_old - total_read, total_new - total_read):.1f}), расхождений {mismatches}")
+    if tmp_dir:
+        tmp_dir.cleanup()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Сверка и бенчмарк разбора страниц Металлсервиса: прежний BeautifulSoup против lxml (iter_mc_html).
+
+Запуск из каталога backend:
+    python -m scripts.bench_mc_parser save --limit 30          # сохранить страницы mc.ru в downloads/mc_html
+    python -m scripts.bench_mc_parser                          # сверить и замерить на сохранённых страницах
+    python -m scripts.bench_mc_parser page1.html page2.html    # на своих файлах
+    python -m scripts.bench_mc_parser --generate 5             # на синтетических страницах
+
+Без файлов берутся страницы из downloads/mc_html, фикстуры scripts/fixtures/mc (есть в репозитории)
+и --generate синтетических страниц (по умолчанию 2), так что сверка работает и без сети.
+Любое расхождение в результатах, как и страница, где не нашлось ни одной позиции, — код возврата 1.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parsers.mc_ru_parser import (  # noqa: E402
+    COL_MAP,
+    GOST_RE,
+    _split_diameters,
+    create_mc_client,
+    fetch_mc_html,
+    parse_mc_html,
+)
+from app.parsers.common import (  # noqa: E402
+    ProductRecord,
+    capitalize_category,
+    clean_text as _clean_text,
+    parse_float as _parse_dimension,
+    parse_price as _parse_price,
+)
+
+FIXTURES_DIR = os.path.join("downloads", "mc_html")
+REPO_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mc")
+
+
+def legacy_parse_mc_html(html: str, category_hint: Optional[str] = None) -> Tuple[List[dict], Optional[Dict[str, str]]]:
+    """Прежний разбор на BeautifulSoup (find_all/get_text по каждой ячейке), для сравнения."""
+    soup = BeautifulSoup(html, "lxml")
+
+    # Категория — из <th colspan> или из заголовка блока, можно взять первый <th colspan> в таблице
+    products: List[dict] = []
+    contacts: Optional[Dict[str, str]] = None
+
+    # На страницах МС часто много секций таблиц. Берём все <table> и ищем в них thead/tbody.
+    for tbl in soup.find_all("table"):
+        thead = tbl.find("thead")
+        tbody = tbl.find("tbody")
+        if not tbody:
+            continue
+
+        # Заголовок категории — ближайший предыдущий <tr><th colspan>
+        category = None
+        # иногда в tbody первой строкой идёт <tr><th colspan=...>НАЗВАНИЕ</th></tr>
+        first_row = tbody.find("tr")
+        if first_row:
+            ths = first_row.find_all("th")
+            if len(ths) == 1:
+                category = _clean_text(ths[0].get_text(" "))
+        if not category:
+            # Фолбэк: из параметра вызова
+            category = category_hint
+        
+        # Приводим категорию к единому виду
+        capitalized_category = capitalize_category(category)
+
+        # Построим карту колонок
+        headers = []
+        if thead:
+            for th in thead.find_all("th"):
+                headers.append(_clean_text(th.get_text(" ")))
+        else:
+            # Иногда заголовок таблицы хранится во второй строке tbody (первая — название категории)
+            rows = tbody.find_all("tr")
+            if len(rows) > 1 and rows[1].find_all("th"):
+                headers = [_clean_text(th.get_text(" ")) for th in rows[1].find_all("th")]
+            elif len(rows) > 0 and rows[0].find_all("th"):
+                headers = [_clean_text(th.get_text(" ")) for th in rows[0].find_all("th")]
+
+        if not headers:
+            continue
+
+        # Индексы полезных колонок
+        cols_norm = [h.lower() for h in headers]
+
+        # Перебираем строки данных
+        for tr in tbody.find_all("tr"):
+            # пропустим строки, где только TH (заголовок/категория)
+            if tr.find("th") and not tr.find("td"):
+                continue
+
+            tds = tr.find_all("td")
+            if not tds:
+                continue
+
+            row: dict = {
+                "category": capitalized_category,
+                "name": None,
+                "stamp": None,
+                "diameter": None,
+                "thickness": None,
+                "width": None,
+                "length": None,
+                "material": None,
+                "unit": None,
+                "price": None,
+                "comments": None,
+                "state_standard": None,
+            }
+
+            extras: Dict[str, str] = {}
+
+            for idx, td in enumerate(tds):
+                val = _clean_text(td.get_text(" "))
+                hdr = cols_norm[idx] if idx < len(cols_norm) else f"col{idx}"
+                key = COL_MAP.get(hdr, None)
+
+                if key == "price":
+                    row["price"] = _parse_price(val)
+                elif key == "diameter":
+                    row["diameter"] = val
+                elif key in {"thickness", "width", "length"}:
+                    row[key] = _parse_dimension(val)
+                elif key in {"stamp", "name", "unit", "material", "state_standard"}:
+                    row[key] = val
+                else:
+                    if val:
+                        extras[headers[idx] if idx < len(headers) else f"col{idx}"] = val
+
+            # Если в строке нет явного наименования, используем категорию (название таблицы) как имя
+            if not row["name"]:
+                row["name"] = capitalized_category
+
+            # Ищем ГОСТ/ТУ в наименовании, переносим в отдельное поле и очищаем наименование
+            if row.get("name") and isinstance(row["name"], str):
+                match = GOST_RE.search(row["name"])
+                if match:
+                    gost_or_tu = match.group(1).strip()
+                    if not row.get("state_standard"):
+                        row["state_standard"] = gost_or_tu
+                    row["name"] = GOST_RE.sub("", row["name"]).strip()
+
+            # Склей комментарий
+            if extras:
+                row["comments"] = "; ".join(f"{k}: {v}" for k, v in extras.items())
+
+            # Если в ячейке диаметров было несколько значений — разнесём
+            diams = _split_diameters(row["diameter"]) if row.get("diameter") else [None]
+            for d in diams:
+                new_row = dict(row)
+                new_row["diameter"] = _parse_dimension(d)
+                products.append(new_row)
+
+    return products, contacts
+
+
+async def save_pages(limit: int, fixtures_dir: str) -> None:
+    """Скачивает страницы из MC_LINKS_BY_CITY (не больше limit) как фикстуры."""
+    from app.parsers.suppliers import MC_LINKS_BY_CITY
+
+    urls = list(dict.fromkeys(url for urls in MC_LINKS_BY_CITY.values() for url in urls))[:limit]
+    os.makedirs(fixtures_dir, exist_ok=True)
+    async with create_mc_client(4) as client:
+        for url in urls:
+            try:
+                html = await fetch_mc_html(client, url)
+            except Exception as e:
+                print(f"FAIL {url}: {e}")
+                continue
+            path = os.path.join(fixtures_dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12] + ".html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(html)
+            print(f"{path}  {len(html) // 1024} КБ  {url}")
+
+
+def generate_page(rows: int, seed: int) -> str:
+    """Страница в разметке mc.ru: секции-таблицы с категорией в первой строке tbody."""
+    rnd = random.Random(seed)
+    parts = ['<html><head><meta charset="windows-1251"><script>var t = "<td>x</td>";</script></head><body>']
+    for section in range(max(1, rows // 200)):
+        parts.append('<table class="catalog"><thead><tr><th>Наименование</th><th>Марка</th><th>Диаметр</th>'
+                     '<th>Длина</th><th>Ед.изм</th><th>Цена, руб</th><th>Наличие</th></tr></thead><tbody>')
+        parts.append(f'<tr><th colspan="7">Арматура  {section}</th></tr>')
+        for _ in range(200):
+            parts.append(
+                "<tr><td><a href='#'>{}</a> {}</td><td>{}</td><td>{}</td><td>{}</td><td>т</td><td>{}</td><td>{}<!-- note --></td></tr>".format(
+                    rnd.choice(["Арматура", "Круг", "Труба эл/св", ""]),
+                    rnd.choice(["ГОСТ 34028-2016", "ТУ 14-1-5254", "", "А500С"]),
+                    rnd.choice(["А500С", "Ст3сп", "&nbsp;"]),
+                    rnd.choice(["10; 12", "14 ; 18; 20", "8", "", "6,5"]),
+                    rnd.choice(["11,7", "6", "н/д", ""]),
+                    rnd.choice(["65 990", "71&nbsp;200,50", "по запросу", ""]),
+                    rnd.choice(["<b>Да</b>", "", "под заказ"]),
+                )
+            )
+        parts.append("</tbody></table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def timed(func, html: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(html)[0]
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="сохранённые HTML-страницы или команда save")
+    parser.add_argument("--dir", default=FIXTURES_DIR, help="каталог фикстур")
+    parser.add_argument("--limit", type=int, default=30, help="сколько страниц сохранить (save)")
+    parser.add_argument("--generate", type=int, default=2, help="сколько синтетических страниц проверить")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов, берётся лучшее время")
+    args = parser.parse_args()
+
+    if args.files[:1] == ["save"]:
+        asyncio.run(save_pages(args.limit, args.dir))
+        return
+
+    pages: List[Tuple[str, str]] = []
+    saved = sorted(glob.glob(os.path.join(args.dir, "*.html")) + glob.glob(os.path.join(REPO_FIXTURES_DIR, "*.html")))
+    for path in args.files or saved:
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    for n in range(args.generate):
+        pages.append((f"synthetic_{n}.html", generate_page(2000, n)))
+    if not pages:
+        parser.error("нет страниц: сохраните их командой save, укажите файлы или --generate N")
+
+    total_old = total_new = 0.0
+    mismatches = 0
+    for name, html in pages:
+        old, t_old = timed(legacy_parse_mc_html, html, args.repeat)
+        new, t_new = timed(parse_mc_html, html, args.repeat)
+        # Прежний разбор отдавал словари, новый — ProductRecord
+        old = [ProductRecord.from_dict(p) for p in old]
+        total_old += t_old
+        total_new += t_new
+        same = old == new
+        # Пустой разбор у обоих совпадает, но это тоже поломка: страница без позиций ничего не проверяет
+        empty = not new
+        mismatches += not same or empty
+        verdict = "РАЗЛИЧИЕ" if not same else "НЕТ ПОЗИЦИЙ" if empty else "OK"
+        print(f"{name:30s} {len(new):6d} поз.  bs4 {t_old * 1000:8.1f} мс  lxml {t_new * 1000:8.1f} мс  "
+              f"x{t_old / max(t_new, 1e-9):5.1f}  {verdict}")
+        if not same:
+            for a, b in zip(old, new):
+                if a != b:
+                    print(f"    bs4:  {a}\n    lxml: {b}")
+                    break
+            else:
+                print(f"    разное число позиций: {len(old)} против {len(new)}")
+
+    print(f"\nИтого: {len(pages)} страниц, bs4 {total_old:.2f} c, lxml {total_new:.2f} c, "
+          f"ускорение x{total_old / max(total_new, 1e-9):.1f}, расхождений {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Микробенчмарк разбора ячейки "Наименование" прайса Металлоторга:
+прежняя функция (линейный перебор категорий, сборка regex на каждый вызов) против NameClassifier.
+
+Запуск из каталога backend:
+    python -m scripts.bench_metallotorg_names downloads/cache/<хэш>.pdf   # сохранённый прайс
+    python -m scripts.bench_metallotorg_names names.txt                    # по одной ячейке на строку
+    python -m scripts.bench_metallotorg_names                              # встроенная выборка
+
+Проверяется, что результаты совпадают на всех ячейках.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parsers.metallotorg_parser import (  # noqa: E402
+    JUNK_WORDS,
+    KNOWN_CATEGORIES,
+    NameClassifier,
+    _find_header_indexes,
+    _iter_page_tables,
+)
+from app.parsers.common import capitalize_category, clean_text as _clean_text  # noqa: E402
+
+SAMPLE_NAMES = [
+    "Лист г/к Ст3сп ГОСТ 19903-2015 ММК",
+    "Лист г/к 09Г2С-12 ГОСТ 19281-2014 НЛМК",
+    "Лист рифл РОМБ Ст3 ГОСТ 8568-77",
+    "Труба проф 09Г2С ГОСТ 30245-2003 Китай",
+    "Труба ЭС Ст2пс ГОСТ 10705-80 / ГОСТ 10704-91",
+    "Круг калиброванный 45 ГОСТ 7417-75 УЗК",
+    "Арматура А500С 34028-2016 Северсталь",
+    "Сетка 100*100",
+    "Уголок Ст3сп/пс5 ГОСТ 8509-93",
+    "Швеллер гнутый Ст3 ТУ 14-2-1234",
+    "Проволока ВР-1 ГОСТ 6727-80 отож.",
+    "Поковка 40Х ОСТ 24.030-2019 уценка",
+]
+
+
+def legacy_parse_name_and_category(name_cell):
+    """Прежняя реализация _parse_name_and_category, для сравнения."""
+    if not name_cell:
+        return "", "", None, None
+
+    full_name = _clean_text(name_cell).replace('ё', 'е')
+    category = None
+    details_string = full_name
+    for cat in KNOWN_CATEGORIES:
+        if full_name.lower().startswith(cat.lower()):
+            category = full_name[:len(cat)]
+            details_string = full_name[len(cat):].strip()
+            break
+    if not category:
+        parts = full_name.split(maxsplit=1)
+        category = parts[0]
+        details_string = parts[1] if len(parts) > 1 else ""
+
+    gost_block_start_match = re.search(r'\b((?:ГОСТ|ТУ|ТС|ОСТ)|(?:\d{2,}-\d{2,}))', details_string, re.IGNORECASE)
+    stamp_string = details_string
+    gost_string = None
+    if gost_block_start_match:
+        split_point = gost_block_start_match.start()
+        stamp_string = details_string[:split_point].strip()
+        gost_string = details_string[split_point:].strip()
+
+    junk_re = r'(?<![a-zA-Zа-яА-Я])(' + '|'.join(re.escape(w) for w in JUNK_WORDS) + r')\b'
+    cleaned_stamp = re.sub(junk_re, '', stamp_string, flags=re.IGNORECASE)
+    cleaned_stamp = re.sub(r'^[,\-~./\s_()\[\]]+|[,\-~./\s_()\[\]]+$', '', cleaned_stamp)
+    cleaned_stamp = re.sub(r'\s{2,}', ' ', cleaned_stamp).strip()
+    if cleaned_stamp:
+        cleaned_stamp = re.sub(r'\s*/\s*', '/', cleaned_stamp)
+    stamp = cleaned_stamp if cleaned_stamp else None
+
+    cleaned_gost = gost_string
+    if cleaned_gost:
+        cleaned_gost = re.sub(junk_re, '', cleaned_gost, flags=re.IGNORECASE)
+        cleaned_gost = re.sub(r'^[,\-~./\s_()\[\]]+|[,\-~./\s_()\[\]]+$', '', cleaned_gost)
+        cleaned_gost = re.sub(r'\s{2,}', ' ', cleaned_gost).strip()
+    gost = cleaned_gost if cleaned_gost else None
+
+    if stamp and not re.search(r'[a-zA-Zа-яА-Я]', stamp):
+        category = f"{category} {stamp}".strip()
+        stamp = None
+
+    return full_name, capitalize_category(category), stamp, gost
+
+
+def names_from_pdf(file_path):
+    """Ячейки "Наименование" всех страниц прайса, в порядке следования."""
+    tables = [t for t in _iter_page_tables(file_path, workers=0) if t]
+    indexes = next((idx for idx in map(_find_header_indexes, tables) if idx), None)
+    if indexes is None:
+        return []
+    names = []
+    for table in tables:
+        for row in table:
+            if row and len(row) > max(indexes):
+                cell = row[indexes[0]]
+                if cell and "---" not in cell and "Наименование" not in cell:
+                    names.append(cell)
+    return names
+
+
+def load_names(path):
+    if not path:
+        return SAMPLE_NAMES * 500
+    if path.lower().endswith(".pdf"):
+        return names_from_pdf(path)
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def timed(func, names, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = [func(n) for n in names]
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="PDF прайса или текстовый файл с наименованиями")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов, берётся лучшее время")
+    args = parser.parse_args()
+
+    names = load_names(args.source)
+    if not names:
+        parser.error("не удалось получить наименования из источника")
+
+    legacy, t_legacy = timed(legacy_parse_name_and_category, names, args.repeat)
+    uncached, t_uncached = timed(NameClassifier(KNOWN_CATEGORIES)._classify, names, args.repeat)
+    # Холодный кэш: новый классификатор на каждый повтор
+    t_cold = float("inf")
+    for _ in range(args.repeat):
+        classifier = NameClassifier(KNOWN_CATEGORIES)
+        started = time.perf_counter()
+        cold = [classifier.classify(n) for n in names]
+        t_cold = min(t_cold, time.perf_counter() - started)
+    warm, t_warm = timed(classifier.classify, names, args.repeat)
+
+    mismatches = sum(1 for a, b, c in zip(legacy, uncached, cold) if not a == b == c)
+    print(f"Ячеек: {len(names)}, уникальных: {len(set(names))}")
+    print(f"прежняя функция             {t_legacy * 1000:9.1f} мс")
+    print(f"классификатор без LRU       {t_uncached * 1000:9.1f} мс  x{t_legacy / max(t_uncached, 1e-9):.1f}")
+    print(f"классификатор, холодный кэш {t_cold * 1000:9.1f} мс  x{t_legacy / max(t_cold, 1e-9):.1f}")
+    print(f"классификатор, тёплый кэш   {t_warm * 1000:9.1f} мс  x{t_legacy / max(t_warm, 1e-9):.1f}")
+    print(f"Расхождений: {mismatches}")
+    sys.exit(1 if mismatches or warm != cold else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Бенчмарк парсеров всех поставщиков из реестра на сохранённых прайсах, без сети.
+
+Фикстуры лежат в scripts/fixtures/<код поставщика>/ (evraz, mc, metallotorg, uralskaya — SupplierParser.key),
+прайс Уральской металлобазы parser/test.xls подключается всегда. В репозитории лежат небольшие образцы
+(*-sample.*) в формате прайсов поставщиков, чтобы бенчмарк запускался сразу после клонирования;
+командой record к ним можно добавить полные прайсы. У каждого зарегистрированного поставщика
+должна быть хотя бы одна фикстура — иначе запуск завершается ошибкой, а не пропускает его.
+
+Запуск из каталога backend:
+    python -m scripts.bench_parsers record --per-supplier 2      # сохранить реальные прайсы в фикстуры (нужна сеть)
+    python -m scripts.bench_parsers                              # позиций в секунду и пик памяти по каждому файлу
+    python -m scripts.bench_parsers --save-baseline              # записать результат как эталон
+    python -m scripts.bench_parsers --compare --threshold 0.15   # код 1, если скорость упала больше чем на 15%
+    python -m scripts.bench_parsers --only mc evraz              # только эти поставщики
+    python -m scripts.bench_parsers --check                      # код 1, если разбор фикстуры изменился
+    python -m scripts.bench_parsers --save-expected              # записать текущий разбор как ожидаемый
+
+--check сверяет число позиций и хэш всех полей каждой позиции с scripts/fixtures/expected.json
+(в репозитории, от машины не зависит) — так ловятся регрессии разбора. Если парсер изменён намеренно,
+ожидаемый результат перезаписывается --save-expected в том же коммите.
+
+Эталон (scripts/fixtures/baseline.json) имеет смысл только на той машине, где он снят.
+Пик памяти меряет tracemalloc в текущем процессе; страницы PDF Металлоторга разбираются в пуле процессов,
+и их память в замер не попадает.
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.parsers.metallotorg_parser import shutdown_pdf_pool  # noqa: E402
+from app.parsers.registry import FetchStrategy, SupplierParser, registered_parsers  # noqa: E402
+import app.parsers.suppliers  # noqa: E402,F401  регистрирует поставщиков в реестре
+
+FIXTURES_DIR = os.path.join(BACKEND_DIR, "scripts", "fixtures")
+BASELINE_FILE = os.path.join(FIXTURES_DIR, "baseline.json")
+EXPECTED_FILE = os.path.join(FIXTURES_DIR, "expected.json")
+# Прайсы, которые уже хранятся в репозитории
+REPO_FIXTURES: Dict[str, List[str]] = {
+    "uralskaya": [os.path.join(BACKEND_DIR, "..", "parser", "test.xls")],
+}
+MB = 1024 * 1024
+
+
+def selected_parsers(only: List[str]) -> List[SupplierParser]:
+    parsers = registered_parsers()
+    unknown = set(only) - {p.key for p in parsers}
+    if unknown:
+        raise SystemExit(f"Неизвестные поставщики: {', '.join(sorted(unknown))}")
+    return [p for p in parsers if not only or p.key in only]
+
+
+def discover(parsers: List[SupplierParser]) -> List[Tuple[SupplierParser, str]]:
+    fixtures = []
+    for parser in parsers:
+        paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, parser.key, "*")))
+        paths += [p for p in REPO_FIXTURES.get(parser.key, []) if os.path.exists(p)]
+        fixtures.extend((parser, path) for path in paths)
+    return fixtures
+
+
+def fixture_id(parser: SupplierParser, path: str) -> str:
+    return f"{parser.key}/{os.path.basename(path)}"
+
+
+def parse_records(parser: SupplierParser, source: str) -> list:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parser.parse(source).materialize().records
+
+
+def parse_rows(parser: SupplierParser, source: str) -> int:
+    return len(parse_records(parser, source))
+
+
+def records_digest(records: list) -> str:
+    """sha256 всех полей всех позиций по порядку: любое изменение разбора меняет хэш."""
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(json.dumps(record.to_dict(), ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def measure(parser: SupplierParser, path: str, repeat: int) -> Dict[str, float]:
+    """Лучшее из repeat время разбора (после прогрева) и отдельный прогон под tracemalloc для пика памяти."""
+    if parser.fetch is FetchStrategy.HTTP_PAGES:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+    else:
+        source = path
+
+    records = parse_records(parser, source)
+    rows = len(records)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse_rows(parser, source)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        parse_rows(parser, source)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "sha256": records_digest(records),
+        "seconds": round(best, 6),
+        "rows_per_sec": round(rows / max(best, 1e-9), 1),
+        "peak_mb": round(peak / MB, 2),
+    }
+
+
+def check_expected(results: Dict[str, dict], expected: Dict[str, dict]) -> int:
+    """Сверяет разбор с ожидаемым; возвращает число фикстур, где он изменился или не записан."""
+    failures = 0
+    print("\nСверка разбора с ожидаемым:")
+    for name, current in results.items():
+        want = expected.get(name)
+        if want is None:
+            problem = "нет ожидаемого результата (--save-expected)"
+        elif current["rows"] != want["rows"]:
+            problem = f"позиций {want['rows']} -> {current['rows']}"
+        elif current["sha256"] != want["sha256"]:
+            problem = "изменились поля позиций"
+        else:
+            problem = None
+        failures += problem is not None
+        print(f"  {name:45s} {'OK' if problem is None else 'РЕГРЕССИЯ: ' + problem}")
+    return failures
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> int:
+    """Печатает сравнение с эталоном и возвращает число фикстур, где скорость просела больше порога."""
+    regressions = 0
+    print(f"\nСравнение с эталоном (порог {threshold:.0%}):")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:45s} нет в эталоне")
+            continue
+        speed = current["rows_per_sec"] / max(base["rows_per_sec"], 1e-9)
+        memory = current["peak_mb"] / max(base["peak_mb"], 1e-9)
+        regressed = speed < 1 - threshold
+        regressions += regressed
+        notes = []
+        if current["rows"] != base["rows"]:
+            notes.append(f"позиций {base['rows']} -> {current['rows']}")
+        if memory > 1 + threshold:
+            notes.append("память выросла")
+        print(f"  {name:45s} скорость x{speed:5.2f}  память x{memory:5.2f}  "
+              f"{'РЕГРЕССИЯ' if regressed else 'OK'}{'  (' + ', '.join(notes) + ')' if notes else ''}")
+    for name in baseline.keys() - results.keys():
+        print(f"  {name:45s} фикстуры больше нет")
+    return regressions
+
+
+async def record(parsers: List[SupplierParser], per_supplier: int) -> None:
+    """Скачивает прайсы первых per_supplier городов каждого поставщика тем же способом, что и run_parsers.py."""
+    import httpx
+
+    from app.parsers.mc_ru_parser import create_mc_client, fetch_mc_html
+
+    async with httpx.AsyncClient(timeout=120.0, verify=False, follow_redirects=True) as client, \
+            create_mc_client(4) as pages_client:
+        for parser in parsers:
+            folder = os.path.join(FIXTURES_DIR, parser.key)
+            os.makedirs(folder, exist_ok=True)
+            for target in parser.targets[:per_supplier]:
+                for url in target.urls:
+                    name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+                    try:
+                        if parser.fetch is FetchStrategy.HTTP_FILE:
+                            response = await client.get(url)
+                            response.raise_for_status()
+                            path = os.path.join(folder, name + os.path.splitext(urlsplit(url).path)[1])
+                            with open(path, "wb") as f:
+                                f.write(response.content)
+                        elif parser.fetch is FetchStrategy.HTTP_PAGES:
+                            path = os.path.join(folder, name + ".html")
+                            with open(path, "w", encoding="utf-8") as f:
+                                f.write(await fetch_mc_html(pages_client, url))
+                        else:
+                            path = await record_browser_download(parser, target, url, folder, name)
+                        print(f"{parser.supplier} / {target.city}: {path}")
+                    except Exception as e:
+                        print(f"FAIL {parser.supplier} / {target.city}: {e} ({url})")
+
+
+async def record_browser_download(parser: SupplierParser, target, url: str, folder: str, name: str) -> str:
+    from playwright.async_api import async_playwright
+
+    from app.parsers.browser_pool import BrowserPool
+    from app.parsers.parser import download_pricelist
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        pages = BrowserPool(browser, 1, **parser.browser)
+        try:
+            async with pages.page() as page:
+                if parser.prepare:
+                    await parser.prepare(page, target)
+                await page.goto(url, wait_until="domcontentloaded", timeout=45_000)
+                file_path = await download_pricelist(page, target.key)
+        finally:
+            await pages.close()
+            await browser.close()
+    path = os.path.join(folder, name + os.path.splitext(file_path)[1])
+    shutil.move(file_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["run", "record"], default="run")
+    parser.add_argument("--only", nargs="*", default=[], help="коды поставщиков (evraz, mc, metallotorg, uralskaya)")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов разбора, берётся лучшее время")
+    parser.add_argument("--per-supplier", type=int, default=2, help="record: сколько городов каждого поставщика сохранить")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл эталона")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результат как эталон")
+    parser.add_argument("--compare", action="store_true", help="сравнить с эталоном и вернуть код 1 при регрессии")
+    parser.add_argument("--threshold", type=float, default=0.15, help="допустимое падение скорости (доля)")
+    parser.add_argument("--check", action="store_true", help="сверить разбор с expected.json и вернуть код 1 при отличии")
+    parser.add_argument("--save-expected", action="store_true", help="записать текущий разбор в expected.json")
+    args = parser.parse_args()
+
+    parsers = selected_parsers(args.only)
+    if args.command == "record":
+        asyncio.run(record(parsers, args.per_supplier))
+        return
+
+    fixtures = discover(parsers)
+    missing = sorted({p.key for p in parsers} - {p.key for p, _ in fixtures})
+    if missing:
+        parser.error(f"нет фикстур для {', '.join(missing)} в {FIXTURES_DIR}: сохраните их командой record")
+
+    results: Dict[str, dict] = {}
+    try:
+        for supplier_parser, path in fixtures:
+            name = fixture_id(supplier_parser, path)
+            results[name] = stats = measure(supplier_parser, path, args.repeat)
+            print(f"{name:45s} {stats['rows']:7d} поз.  {stats['seconds'] * 1000:9.1f} мс  "
+                  f"{stats['rows_per_sec']:10.0f} поз./с  пик {stats['peak_mb']:7.1f} МБ")
+    finally:
+        shutdown_pdf_pool()
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except OSError:
+        baseline = None
+    regressions = 0
+    if args.compare:
+        if baseline is None:
+            parser.error(f"эталон {args.baseline} не найден: снимите его с --save-baseline")
+        keys = {p.key for p in parsers}
+        selected = {name: stats for name, stats in baseline.items() if name.split("/", 1)[0] in keys}
+        regressions = compare(results, selected, args.threshold)
+    if args.save_baseline:
+        # Замер части поставщиков (--only) обновляет в эталоне только их фикстуры
+        merged = {**(baseline or {}), **results}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"\nЭталон записан: {args.baseline}")
+    try:
+        with open(EXPECTED_FILE, encoding="utf-8") as f:
+            expected = json.load(f)
+    except OSError:
+        expected = {}
+    if args.check:
+        regressions += check_expected(results, expected)
+    if args.save_expected:
+        merged = {**expected, **{name: {"rows": r["rows"], "sha256": r["sha256"]} for name, r in results.items()}}
+        with open(EXPECTED_FILE, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"\nОжидаемый разбор записан: {EXPECTED_FILE}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
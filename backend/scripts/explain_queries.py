@@ -0,0 +1,283 @@
+"""
+Проверка планов запросов /search и /filters/* по индексам каталога (app/models/metal.py)
+и таблицы фасетов фильтров (app/models/metal_facet.py).
+
+Для каждого вида запроса строится EXPLAIN с выключенным последовательным сканированием
+(SET LOCAL enable_seqscan = off): если индекса под фильтр нет или он перестал подходить,
+в плане остаётся Seq Scan по metal, либо не используется ожидаемый индекс — скрипт
+печатает план и завершается с кодом 1. Значения фильтров берутся из самых частых в базе;
+если какого-то значения нет (проверка вышла бы без фильтра), это тоже код 1.
+
+Запуск из каталога backend (нужна база с данными парсеров):
+    python -m scripts.explain_queries              # проверка, код 1 при регрессии
+    python -m scripts.explain_queries --seed       # пустая база (CI): схема и каталог из scripts/fixtures
+    python -m scripts.explain_queries --analyze    # плюс EXPLAIN ANALYZE с обычным планировщиком
+    python -m scripts.explain_queries --verbose    # печатать планы целиком
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Select, func, select, text  # noqa: E402
+
+from app.api.v1.endpoints.filters import build_facet_values_query  # noqa: E402
+from app.api.v1.endpoints.search import (  # noqa: E402
+    PHASE_NULLS,
+    PHASE_VALUES,
+    _after_cursor,
+    build_search_query,
+    order_search_query,
+)
+from app.db.session import AsyncSessionLocal, create_tables  # noqa: E402
+from app.models.metal import Metal  # noqa: E402
+from app.models.metal_facet import MetalFacet  # noqa: E402
+from app.models.warehouse import Warehouse  # noqa: E402
+
+PAGE = 11  # limit + 1, как в /search
+
+
+@dataclass
+class Case:
+    name: str
+    query: Select
+    # Индексы, хотя бы один из которых должен быть в плане
+    expect: Tuple[str, ...] = ()
+    # Запрос не должен читать metal вовсе (фильтры отвечают из metal_facets)
+    facets_only: bool = False
+
+
+def to_sql(query: Select, dialect) -> str:
+    return str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def walk(node: dict) -> List[dict]:
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(walk(child))
+    return nodes
+
+
+async def most_common(session, column, *where) -> Optional[str]:
+    query = (
+        select(column)
+        .select_from(Metal)
+        .join(Warehouse, Metal.warehouse_id == Warehouse.id)
+        .where(column.isnot(None), *where)
+        .group_by(column)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    return (await session.execute(query)).scalar_one_or_none()
+
+
+async def build_cases(session) -> List[Case]:
+    supplier = await most_common(session, Warehouse.supplier)
+    city = await most_common(session, Warehouse.city)
+    category = await most_common(session, Metal.category)
+    stamp = await most_common(session, Metal.stamp, Metal.category == category)
+    gost = await most_common(session, Metal.state_standard)
+    thickness = await most_common(session, Metal.thickness, Metal.category == category)
+    price = await most_common(session, Metal.price)
+    if category is None:
+        raise SystemExit("В таблице metal нет позиций: заполните её через run_parsers.py или запустите с --seed")
+    values = {"поставщик": supplier, "город": city, "марка": stamp, "ГОСТ": gost, "толщина": thickness, "цена": price}
+    missing = [name for name, value in values.items() if value is None]
+    if missing:
+        # Без значения запрос строится без фильтра и проверяет не тот план
+        raise SystemExit(f"В каталоге нет значений для фильтров: {', '.join(missing)}")
+    print(f"Значения фильтров: поставщик={supplier!r}, город={city!r}, категория={category!r}, "
+          f"марка={stamp!r}, ГОСТ={gost!r}, толщина={thickness!r}\n")
+
+    def page(sort: str = "id", **filters) -> Select:
+        return order_search_query(build_search_query(**filters), sort).limit(PAGE)
+
+    def count(**filters) -> Select:
+        return select(func.count()).select_from(build_search_query(**filters).subquery())
+
+    category_index = ("ix_metal_category_stamp_search", "ix_metal_warehouse_category_stamp")
+    return [
+        Case("search: без фильтров", page(), ("metal_pkey",)),
+        Case("search: sort=price", page("price"), ("ix_metal_price_id",)),
+        Case(
+            "search: sort=price, курсор",
+            page("price").where(_after_cursor("price", PHASE_VALUES, price, 0)),
+            ("ix_metal_price_id",),
+        ),
+        Case(
+            "search: sort=price, курсор в хвосте NULL",
+            page("price").where(_after_cursor("price", PHASE_NULLS, None, 0)),
+            ("ix_metal_price_id",),
+        ),
+        Case("search: категория", page(category=category), category_index),
+        Case("search: категория + марка", page(category=category, stamp=stamp), category_index),
+        Case("search: ГОСТ", page(state_standard=gost), ("ix_metal_state_standard",)),
+        Case("search: поставщик", page(supplier=supplier), ("ix_metal_warehouse_category_stamp", "ix_warehouse_supplier")),
+        Case("search: город + категория", page(city=city, category=category), category_index),
+        Case("search: count по категории", count(category=category), category_index),
+        Case("search: подстрока наименования", page().where(Metal.name.ilike("%ст3%")), ("ix_metal_name_trgm",)),
+        Case(
+            "search: q (полнотекстовый + триграммы)",
+            page("relevance", q=f"{category} г/к"),
+            ("ix_metal_search_vector", "ix_metal_name_trgm"),
+        ),
+        Case("search: толщина", page(thickness=thickness), ("ix_metal_thickness_um",)),
+        Case(
+            "search: категория + толщина с допуском",
+            page(category=category, thickness=thickness, ranges={"thickness": (None, None, 0.05)}),
+            ("ix_metal_thickness_um",) + category_index,
+        ),
+        Case(
+            "search: диапазон длины",
+            page(ranges={"length": (5.9, 6.1, None)}),
+            ("ix_metal_length_um",),
+        ),
+        Case(
+            "filters/categories: поставщик",
+            build_facet_values_query(MetalFacet.category, supplier=supplier),
+            ("ix_metal_facets_supplier_city",),
+            facets_only=True,
+        ),
+        Case(
+            "filters/stamps: категория",
+            build_facet_values_query(MetalFacet.stamp, category=category),
+            ("ix_metal_facets_category_stamp",),
+            facets_only=True,
+        ),
+        Case(
+            "filters/gosts: категория",
+            build_facet_values_query(MetalFacet.state_standard, category=category),
+            ("ix_metal_facets_category_stamp",),
+            facets_only=True,
+        ),
+        Case(
+            "filters/suppliers: категория",
+            build_facet_values_query(MetalFacet.supplier, category=category),
+            ("ix_metal_facets_category_stamp",),
+            facets_only=True,
+        ),
+        Case(
+            "filters/cities: поставщик",
+            build_facet_values_query(MetalFacet.city, supplier=supplier),
+            ("ix_metal_facets_supplier_city",),
+            facets_only=True,
+        ),
+    ]
+
+
+async def seed() -> None:
+    """
+    Заполняет пустую базу для CI: схема (create_tables) и каталог из фикстур бенчмарка парсеров
+    (scripts/fixtures, parser/test.xls) тем же путём, что run_parsers.py: green, перенос в blue, фасеты.
+    """
+    import run_parsers
+    from app.parsers.registry import FetchStrategy, registered_parsers
+    from app.services.catalog_facets import rebuild_metal_facets
+    from app.services.price_history import ensure_history_partition
+    from scripts.bench_parsers import discover, parse_records
+
+    await create_tables()
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await ensure_history_partition(session, date.today())
+    fixtures = discover(registered_parsers())
+    for n, (parser, path) in enumerate(fixtures):
+        if parser.fetch is FetchStrategy.HTTP_PAGES:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+        else:
+            source = path
+        # Фикстуры одного поставщика раскладываются по его городам, чтобы фильтр по городу было с чем сравнить
+        city = parser.targets[n % len(parser.targets)].city
+        records = parse_records(parser, source)
+        await run_parsers.save_to_green(
+            supplier=parser.supplier, city=city, products=records, length_unit=parser.length_unit,
+        )
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await run_parsers.finalize_green_to_blue(session, supplier=parser.supplier, city=city)
+        print(f"Загружено {len(records)} позиций: {parser.supplier} / {city} ({os.path.basename(path)})")
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await rebuild_metal_facets(session)
+    async with AsyncSessionLocal() as session:
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+    print()
+
+
+async def explain(session, sql: str, *, analyze: bool) -> dict:
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    conn = await session.connection()
+    # exec_driver_sql: в литералах фильтров не ищутся :параметры
+    plan = (await conn.exec_driver_sql(f"EXPLAIN ({options}) {sql}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def check(case: Case, plan: dict) -> List[str]:
+    nodes = walk(plan["Plan"])
+    problems = []
+    seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "metal"]
+    if seq_scans:
+        problems.append("Seq Scan по metal")
+    if case.facets_only and any(n.get("Relation Name") == "metal" for n in nodes):
+        problems.append("читается metal вместо metal_facets")
+    used = {n["Index Name"] for n in nodes if "Index Name" in n}
+    if case.expect and not used & set(case.expect):
+        problems.append(f"не используется ни один из индексов {', '.join(case.expect)}")
+    return problems
+
+
+async def run(analyze: bool, verbose: bool, seed_fixtures: bool) -> int:
+    if seed_fixtures:
+        await seed()
+    failures = 0
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            cases = await build_cases(session)
+        dialect = session.bind.dialect
+        for case in cases:
+            sql = to_sql(case.query, dialect)
+            async with session.begin():
+                await session.execute(text("SET LOCAL enable_seqscan = off"))
+                plan = await explain(session, sql, analyze=False)
+            problems = check(case, plan)
+            used = sorted({n["Index Name"] for n in walk(plan["Plan"]) if "Index Name" in n})
+            status = "FAIL" if problems else "OK  "
+            failures += bool(problems)
+            print(f"{status} {case.name:40s} индексы: {', '.join(used) or '-'}")
+            for problem in problems:
+                print(f"       {problem}")
+            if problems or verbose:
+                print(json.dumps(plan["Plan"], ensure_ascii=False, indent=1))
+
+            if analyze:
+                async with session.begin():
+                    actual = await explain(session, sql, analyze=True)
+                chosen = sorted({n["Index Name"] for n in walk(actual["Plan"]) if "Index Name" in n})
+                print(f"       ANALYZE: {actual['Execution Time']:.2f} мс, планировщик выбрал: {', '.join(chosen) or 'Seq Scan'}")
+
+    print(f"\nЗапросов: {len(cases)}, регрессий: {failures}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyze", action="store_true", help="дополнительно EXPLAIN ANALYZE с обычными настройками")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы целиком")
+    parser.add_argument("--seed", action="store_true", help="сначала заполнить пустую базу каталогом из фикстур")
+    args = parser.parse_args()
+    failures = asyncio.run(run(args.analyze, args.verbose, args.seed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
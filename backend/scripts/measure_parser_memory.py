@@ -0,0 +1,125 @@
+"""
+Память разбора прайсов под tracemalloc: позиции ProductRecord против прежних словарей на позицию.
+
+Запуск из каталога backend:
+    python -m scripts.measure_parser_memory --generate 40        # синтетический прогон: прайсы ЕВРАЗ и страницы МС
+    python -m scripts.measure_parser_memory \
+        --evraz downloads/evraz/*.xlsx --mc downloads/mc_html/*.html \
+        --metallotorg downloads/cache/*.pdf --uralskaya ../parser/test.xls
+
+Источники разбираются парсерами из реестра подряд, и позиции всех городов держатся в памяти одновременно
+(как списки словарей в прежнем полном прогоне, копившиеся до записи в БД). Для каждого варианта печатается
+пик tracemalloc и сколько памяти занимают сами позиции после разбора.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parsers.metallotorg_parser import shutdown_pdf_pool  # noqa: E402
+from app.parsers.registry import get_parser  # noqa: E402
+from app.parsers.suppliers import EVRAZ_SUPPLIER, MC_SUPPLIER, METALLOTORG_SUPPLIER, URALSKAYA_SUPPLIER  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def parse_source(supplier, path):
+    parser = get_parser(supplier)
+    if supplier == MC_SUPPLIER:
+        with open(path, encoding="utf-8") as f:
+            return parser.parse(f.read()).materialize().records
+    return parser.parse(path).materialize().records
+
+
+def run(sources, as_dicts):
+    """Разбирает все источники, держа позиции в памяти; словари строятся сразу после разбора каждого источника."""
+    gc.collect()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    kept = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for supplier, path in sources:
+            records = parse_source(supplier, path)
+            kept.append([r.to_dict() for r in records] if as_dicts else records)
+            del records
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    count = sum(len(items) for items in kept)
+    del kept
+    return count, peak - base, current - base, elapsed
+
+
+def generated_sources(count, tmp_dir):
+    from scripts.bench_evraz_excel import generate_price_list
+    from scripts.bench_mc_parser import generate_page
+
+    sources = []
+    for n in range(count):
+        xlsx = os.path.join(tmp_dir, f"evraz_{n}.xlsx")
+        generate_price_list(xlsx, seed=n)
+        sources.append((EVRAZ_SUPPLIER, xlsx))
+        page = os.path.join(tmp_dir, f"mc_{n}.html")
+        with open(page, "w", encoding="utf-8") as f:
+            f.write(generate_page(400, n))
+        sources.append((MC_SUPPLIER, page))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evraz", nargs="*", default=[], help="прайсы ЕВРАЗ (xlsx/xls)")
+    parser.add_argument("--mc", nargs="*", default=[], help="сохранённые страницы Металлсервиса (html)")
+    parser.add_argument("--metallotorg", nargs="*", default=[], help="PDF-прайсы Металлоторга")
+    parser.add_argument("--uralskaya", nargs="*", default=[], help="прайсы Уральской металлобазы (xls)")
+    parser.add_argument("--generate", type=int, default=0, help="сколько синтетических пар (прайс ЕВРАЗ + страница МС) создать")
+    args = parser.parse_args()
+
+    sources = (
+        [(EVRAZ_SUPPLIER, p) for p in args.evraz]
+        + [(MC_SUPPLIER, p) for p in args.mc]
+        + [(METALLOTORG_SUPPLIER, p) for p in args.metallotorg]
+        + [(URALSKAYA_SUPPLIER, p) for p in args.uralskaya]
+    )
+    tmp_dir = tempfile.TemporaryDirectory()
+    if args.generate:
+        sources += generated_sources(args.generate, tmp_dir.name)
+    if not sources:
+        parser.error("укажите файлы прайсов или --generate N")
+
+    try:
+        # Прогрев: импорты, кэши классификатора и пул процессов PDF не должны попасть в замер
+        with contextlib.redirect_stdout(io.StringIO()):
+            for supplier, path in sources:
+                parse_source(supplier, path)
+
+        tracemalloc.start()
+        results = {
+            "словари": run(sources, as_dicts=True),
+            "ProductRecord": run(sources, as_dicts=False),
+        }
+        tracemalloc.stop()
+    finally:
+        shutdown_pdf_pool()
+        tmp_dir.cleanup()
+
+    count = results["ProductRecord"][0]
+    print(f"Источников: {len(sources)}, позиций: {count}")
+    for title, (_, peak, kept, elapsed) in results.items():
+        per_row = kept / count if count else 0
+        print(f"{title:14s} пик {peak / MB:8.1f} МБ, позиции {kept / MB:8.1f} МБ ({per_row:6.0f} Б на позицию), {elapsed:6.2f} c")
+    (_, dict_peak, dict_kept, _), (_, rec_peak, rec_kept, _) = results.values()
+    print(f"Экономия: пик {100 * (1 - rec_peak / max(dict_peak, 1)):.0f}%, "
+          f"позиции {100 * (1 - rec_kept / max(dict_kept, 1)):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,30 @@
+import os
+import sys
+
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app.parsers.uralskaya_parser import label_uralskaya_rows  # noqa: E402
+
 def parse_metals_file(filename):
     df = pd.read_excel(filename, header=None)
-    
-    non_empty_rows: pd.DataFrame = df[df.notna().any(axis=1)]
-        
-    contacts = None
-    
-    header_rows = []
-    for idx, row in non_empty_rows.iterrows():
-        if idx == 10:
-            contacts = str(row.iloc[1])
-        if idx == 11:
-            contacts += str(row.iloc[1]) 
-        if 'М/ст' in str(row.iloc[1]) and 'Размер' in str(row.iloc[2]):
-            header_rows.append(idx)
-    
-    contacts = contacts.split(",")[0].strip()
-    
-    print(f"Найдено заголовков таблиц: {header_rows}")
-    
-    current_category = None
-    current_gost = None
-    current_unit = None
-    metals_data = []
-    
-    for idx, row in non_empty_rows.iterrows():
-        
-        if pd.notna(row.iloc[1]) and 'ГОСТ' in str(row.iloc[1]):
-            splitted = str(row.iloc[1]).split('ГОСТ', maxsplit=1)
-            current_category = splitted[0].strip()
-            current_gost = ('ГОСТ ' + splitted[1].strip()) if len(splitted) > 1 else None
-            print(f"Найден ГОСТ: {current_gost}")
-            continue
-        
-        if idx in header_rows:
-            print(f"Найден заголовок таблицы в строке {idx}")
-            current_unit = str(row.iloc[4]).split(',')[1].strip()
-            continue
-        
-        if (pd.notna(row.iloc[1]) and pd.notna(row.iloc[2]) and pd.notna(row.iloc[4]) and
-            any(idx > header_row for header_row in header_rows)):
-            try:
-                quantity_str = str(row.iloc[4]).replace(',', '.').strip()
-                quantity = float(quantity_str)
-                
-                if quantity > 0:                    
-                    metal_info = {
-                        'Категория': current_category,
-                        'ГОСТ': current_gost,
-                        'Марка стали': str(row.iloc[1]).strip(),
-                        'Размер': str(row.iloc[2]).strip(),
-                        'Примечания': str(row.iloc[3]).strip() if pd.notna(row.iloc[3]) else '',
-                        'Склад': quantity,
-                        'Един. измер.': current_unit,
-                        'Цена руб. с НДС': str(row.iloc[5]).strip() if pd.notna(row.iloc[5]) else '', # т.е. цена за единицу измерения (тонну например)
-                        'Контактная информация': contacts
-                    }
-                    
-                    metals_data.append(metal_info)
-            except (ValueError, TypeError):
-                continue
-    
-    if metals_data:
-        result_df = pd.DataFrame(metals_data)
-         
+
+    # Разметка строк — общий движок парсера Уральской металлобазы из backend
+    items, contacts = label_uralskaya_rows(df)
+    result_df = pd.DataFrame({
+        'Категория': items['category'],
+        'ГОСТ': items['state_standard'],
+        'Марка стали': items['mark'],
+        'Размер': items['size'],
+        'Примечания': items['comments'],
+        'Склад': items['quantity'],
+        'Един. измер.': items['unit'],
+        'Цена руб. с НДС': items['price_text'], # т.е. цена за единицу измерения (тонну например)
+        'Контактная информация': contacts,
+    }).reset_index(drop=True)
+
+    if not result_df.empty:
         result_df = result_df[result_df['Категория'].notna() & (result_df['Категория'] != 'None')]
         
         output_filename = 'filtered_metals.xlsx'